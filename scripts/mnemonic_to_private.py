@@ -1,17 +1,22 @@
-from mnemonic import Mnemonic
-from solders.keypair import Keypair
+import sys
 import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from solders.keypair import Keypair
 from dotenv import load_dotenv
 
+# Misma derivación (Phantom) y misma cache opcional (KEY_CACHE=true) que usa el bot
+from src.keys import private_key_from_mnemonic
+
 load_dotenv()
 
 MNEMONIC = os.getenv("MNEMONIC", "")
 
 if MNEMONIC:
-    mnemo = Mnemonic("english")
-    seed = mnemo.to_seed(MNEMONIC)
-    # Solana uses the first 32 bytes of the seed for the private key
-    keypair = Keypair.from_seed(seed[:32])
+    private_key = private_key_from_mnemonic(MNEMONIC)
+    if private_key is None:
+        sys.exit("No se pudo derivar la clave privada del MNEMONIC.")
+    keypair = Keypair.from_bytes(bytes(private_key))
     PRIVATE_KEY_ARRAY = list(keypair.to_bytes())
     print(f"Clave privada derivada (array): {PRIVATE_KEY_ARRAY}")
     # Si quieres en hex:
@@ -8,9 +8,12 @@ import sys
 import os
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from src.data.data_manager import data_manager
+from src.data.data_manager import data_manager, write_json
 from src.utils.data_analytics import print_quick_stats, generate_trading_report, export_data_for_analysis
-import json
+from datetime import datetime
+
+# Respuestas aceptadas como confirmación
+_YES = frozenset({'s', 'si', 'sí', 'y', 'yes'})
 
 
 def main():
@@ -33,24 +36,19 @@ def main():
         if choice == "0":
             print("👋 ¡Hasta luego!")
             break
-        elif choice == "1":
-            show_quick_stats()
-        elif choice == "2":
-            show_price_history()
-        elif choice == "3":
-            show_trade_history()
-        elif choice == "4":
-            show_portfolio_history()
-        elif choice == "5":
-            generate_report()
-        elif choice == "6":
-            export_data()
-        elif choice == "7":
-            cleanup_data()
+        handler = _DISPATCH.get(choice)
+        if handler:
+            handler()
         else:
             print("❌ Opción inválida. Intenta de nuevo.")
 
 
+def _write_lines(lines):
+    """Escribe todas las filas de una tabla con una sola llamada a stdout"""
+    if lines:
+        sys.stdout.write("\n".join(lines) + "\n")
+
+
 def show_quick_stats():
     """Muestra estadísticas rápidas"""
     print("\n" + "="*50)
@@ -62,39 +60,40 @@ def show_price_history(hours=24):
     print(f"\n💰 HISTORIAL DE PRECIOS (Últimas {hours}h)")
     print("=" * 50)
     
-    price_history = data_manager.get_price_history(hours=hours)
+    stats = data_manager.get_price_stats(hours=hours)
     
-    if not price_history:
+    if not stats["count"]:
         print("❌ No hay datos de precios disponibles")
         return
     
-    print(f"📊 {len(price_history)} registros de precios encontrados")
+    print(f"📊 {stats['count']} registros de precios encontrados")
     print()
     
-    # Mostrar los últimos 10 registros
-    recent_prices = price_history[-10:] if len(price_history) > 10 else price_history
+    # Mostrar los últimos 10 registros (la DB devuelve los más recientes primero)
+    recent_prices = data_manager.get_price_history(hours=hours, limit=10, order="desc")[::-1]
     
     print("Últimos precios registrados:")
     print("-" * 70)
     print(f"{'Timestamp':<20} {'Precio':<12} {'Fuente':<15} {'Volumen 24h':<15}")
     print("-" * 70)
     
+    lines = []
     for price_data in recent_prices:
         timestamp = price_data["datetime"][:19]  # Remove timezone info for display
         price = f"${price_data['price']:.2f}"
         source = price_data["source"]
         volume = f"${price_data['volume_24h']:,.0f}" if price_data['volume_24h'] else "N/A"
         
-        print(f"{timestamp:<20} {price:<12} {source:<15} {volume:<15}")
+        lines.append(f"{timestamp:<20} {price:<12} {source:<15} {volume:<15}")
+    _write_lines(lines)
     
-    if len(price_history) > 10:
-        print(f"\n... y {len(price_history) - 10} registros más")
+    if stats["count"] > 10:
+        print(f"\n... y {stats['count'] - 10} registros más")
     
-    # Estadísticas básicas
-    prices = [p["price"] for p in price_history]
-    min_price = min(prices)
-    max_price = max(prices)
-    avg_price = sum(prices) / len(prices)
+    # Estadísticas básicas (agregadas en SQL)
+    min_price = stats["min_price"]
+    max_price = stats["max_price"]
+    avg_price = stats["avg_price"]
     
     print(f"\n📊 Estadísticas del período:")
     print(f"   Precio mínimo: ${min_price:.2f}")
@@ -108,41 +107,43 @@ def show_trade_history(hours=24):
     print(f"\n🔄 HISTORIAL DE TRADES (Últimas {hours}h)")
     print("=" * 50)
     
-    trade_history = data_manager.get_trade_history(hours=hours)
+    stats = data_manager.get_trade_stats(hours=hours)
     
-    if not trade_history:
+    if not stats["count"]:
         print("❌ No hay trades disponibles")
         return
     
-    print(f"📊 {len(trade_history)} trades encontrados")
+    print(f"📊 {stats['count']} trades encontrados")
     print()
     
+    # Mostrar los últimos 10 trades (la DB devuelve los más recientes primero)
+    recent_trades = data_manager.get_trade_history(hours=hours, limit=10, order="desc")[::-1]
+    
     print("-" * 90)
     print(f"{'Timestamp':<20} {'Tipo':<6} {'Cantidad':<12} {'Precio':<12} {'Valor USD':<12} {'Modo':<8}")
     print("-" * 90)
     
-    for trade in trade_history:
-        from datetime import datetime
-        timestamp = datetime.fromtimestamp(trade["timestamp"]).strftime("%Y-%m-%d %H:%M:%S")
+    lines = []
+    for trade in recent_trades:
+        timestamp = datetime.fromtimestamp(trade["timestamp"]).isoformat(sep=" ", timespec="seconds")
         side = trade["side"]
         amount = f"{trade['amount_sol']:.4f} SOL"
         price = f"${trade['price']:.2f}"
         value = f"${trade['value_usd']:.2f}"
         mode = "SIM" if trade["simulation"] else "REAL"
         
-        print(f"{timestamp:<20} {side:<6} {amount:<12} {price:<12} {value:<12} {mode:<8}")
+        lines.append(f"{timestamp:<20} {side:<6} {amount:<12} {price:<12} {value:<12} {mode:<8}")
+    _write_lines(lines)
     
-    # Estadísticas de trading
-    sim_trades = [t for t in trade_history if t["simulation"]]
-    real_trades = [t for t in trade_history if not t["simulation"]]
-    
-    total_volume = sum(t["value_usd"] for t in trade_history)
+    if stats["count"] > 10:
+        print(f"\n... y {stats['count'] - 10} trades más")
     
+    # Estadísticas de trading (agregadas en SQL)
     print(f"\n📊 Estadísticas de trading:")
-    print(f"   Total trades: {len(trade_history)}")
-    print(f"   Trades simulados: {len(sim_trades)}")
-    print(f"   Trades reales: {len(real_trades)}")
-    print(f"   Volumen total: ${total_volume:.2f}")
+    print(f"   Total trades: {stats['count']}")
+    print(f"   Trades simulados: {stats['simulation_count']}")
+    print(f"   Trades reales: {stats['real_count']}")
+    print(f"   Volumen total: ${stats['total_volume_usd']:.2f}")
 
 
 def show_portfolio_history(hours=24):
@@ -150,42 +151,40 @@ def show_portfolio_history(hours=24):
     print(f"\n📊 HISTORIAL DEL PORTFOLIO (Últimas {hours}h)")
     print("=" * 50)
     
-    portfolio_history = data_manager.get_portfolio_history(hours=hours)
+    stats = data_manager.get_portfolio_stats(hours=hours)
     
-    if not portfolio_history:
+    if not stats["count"]:
         print("❌ No hay snapshots del portfolio disponibles")
         return
     
-    print(f"📊 {len(portfolio_history)} snapshots encontrados")
+    print(f"📊 {stats['count']} snapshots encontrados")
     print()
     
-    # Mostrar los últimos 10 snapshots
-    recent_snapshots = portfolio_history[-10:] if len(portfolio_history) > 10 else portfolio_history
+    # Mostrar los últimos 10 snapshots (la DB devuelve los más recientes primero)
+    recent_snapshots = data_manager.get_portfolio_history(hours=hours, limit=10, order="desc")[::-1]
     
     print("-" * 100)
     print(f"{'Timestamp':<20} {'SOL':<12} {'USD':<12} {'Valor Total':<12} {'P&L Real':<12} {'P&L No Real':<12}")
     print("-" * 100)
     
+    lines = []
     for snapshot in recent_snapshots:
-        from datetime import datetime
-        timestamp = datetime.fromtimestamp(snapshot["timestamp"]).strftime("%Y-%m-%d %H:%M:%S")
+        timestamp = datetime.fromtimestamp(snapshot["timestamp"]).isoformat(sep=" ", timespec="seconds")
         sol_balance = f"{snapshot['sol_balance']:.4f}"
         usd_balance = f"${snapshot['usd_balance']:.2f}"
         total_value = f"${snapshot['total_value_usd']:.2f}"
         realized_pnl = f"${snapshot['realized_pnl']:.2f}"
         unrealized_pnl = f"${snapshot['unrealized_pnl']:.2f}"
         
-        print(f"{timestamp:<20} {sol_balance:<12} {usd_balance:<12} {total_value:<12} {realized_pnl:<12} {unrealized_pnl:<12}")
-    
-    if len(portfolio_history) > 10:
-        print(f"\n... y {len(portfolio_history) - 10} snapshots más")
+        lines.append(f"{timestamp:<20} {sol_balance:<12} {usd_balance:<12} {total_value:<12} {realized_pnl:<12} {unrealized_pnl:<12}")
+    _write_lines(lines)
     
-    # Estadísticas del portfolio
-    first_snapshot = portfolio_history[0]
-    last_snapshot = portfolio_history[-1]
+    if stats["count"] > 10:
+        print(f"\n... y {stats['count'] - 10} snapshots más")
     
-    initial_value = first_snapshot["total_value_usd"]
-    final_value = last_snapshot["total_value_usd"]
+    # Estadísticas del portfolio (agregadas en SQL)
+    initial_value = stats["initial_value"]
+    final_value = stats["final_value"]
     total_return = final_value - initial_value
     total_return_pct = (total_return / initial_value * 100) if initial_value > 0 else 0
     
@@ -193,8 +192,9 @@ def show_portfolio_history(hours=24):
     print(f"   Valor inicial: ${initial_value:.2f}")
     print(f"   Valor final: ${final_value:.2f}")
     print(f"   Retorno total: ${total_return:.2f} ({total_return_pct:.2f}%)")
-    print(f"   P&L realizado: ${last_snapshot['realized_pnl']:.2f}")
-    print(f"   P&L no realizado: ${last_snapshot['unrealized_pnl']:.2f}")
+    print(f"   P&L realizado: ${stats['realized_pnl']:.2f}")
+    print(f"   P&L no realizado: ${stats['unrealized_pnl']:.2f}")
+    print(f"   Rango de valor: ${stats['min_value']:.2f} - ${stats['max_value']:.2f}")
 
 
 def generate_report():
@@ -237,13 +237,11 @@ def generate_report():
     
     # Preguntar si guardar el reporte
     save = input("\n¿Guardar reporte completo en archivo? (s/N): ").strip().lower()
-    if save in ['s', 'si', 'sí', 'y', 'yes']:
-        from datetime import datetime
+    if save in _YES:
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
         filepath = f"data/exports/reporte_{timestamp}.json"
         
-        with open(filepath, 'w') as f:
-            json.dump(report, f, indent=2, default=str)
+        write_json(report, filepath)
         
         print(f"📤 Reporte guardado en: {filepath}")
 
@@ -270,7 +268,7 @@ def cleanup_data():
     
     confirm = input(f"\n⚠️  ¿Estás seguro de eliminar datos más antiguos de {days} días? (s/N): ").strip().lower()
     
-    if confirm in ['s', 'si', 'sí', 'y', 'yes']:
+    if confirm in _YES:
         print(f"\n🔄 Limpiando datos más antiguos de {days} días...")
         success = data_manager.cleanup_old_data(days=days)
         
@@ -282,6 +280,18 @@ def cleanup_data():
         print("❌ Limpieza cancelada")
 
 
+# Opciones del menú principal
+_DISPATCH = {
+    "1": show_quick_stats,
+    "2": show_price_history,
+    "3": show_trade_history,
+    "4": show_portfolio_history,
+    "5": generate_report,
+    "6": export_data,
+    "7": cleanup_data,
+}
+
+
 if __name__ == "__main__":
     try:
         main()
@@ -1,24 +1,61 @@
 import asyncio
-from typing import List, Optional
+import json
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
 
+import aiohttp
+import numpy as np
+
+from src.data import http
 from src.data.aggregated_feed import AggregatedPriceFeed
-from src.data.data_manager import data_manager
-from src.strategy.simple_strategy import generate_signal
-from src.strategy.indicators import compute_indicators
+from src.data.data_manager import data_manager, PriceData, TradeData, PortfolioSnapshot
+from src.strategy.simple_strategy import signal_from_indicators
+from src.strategy.indicators import IncrementalIndicators
 from src.execution.portfolio import Portfolio
-from src.execution.jupiter_client import execute_trade
-from src.execution.simulation_client import simulator
-from src.utils.logger import setup_logger, log_trade
+from src.execution.jupiter_client import execute_trade, request_quote, swap_mints
+from src.utils.logger import setup_logger, log_trade, flush_trade_log
 from src.strategy.risk import exceed_max_drawdown
 from src.config import settings
 
+# orjson es opcional: el registro "tick" se serializa en cada iteración
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+
+def _tick_json(record: Dict) -> str:
+    """Compact JSON for the per-tick log line (non-serializable values as ``str``)."""
+    if ORJSON_AVAILABLE:
+        return orjson.dumps(record, default=str, option=orjson.OPT_SERIALIZE_NUMPY).decode()
+    return json.dumps(record, separators=(",", ":"), default=str)
+
+
+# Longest indicator window is EMA50; keep a few multiples so the EMA warms up
+PRICE_WINDOW = 200
+
+# Persistencia por lotes: volcar a la DB cada BATCH_SIZE precios o FLUSH_INTERVAL_SEC
+BATCH_SIZE = 100
+FLUSH_INTERVAL_SEC = 5.0
+
+# No guardar precio/snapshot si el precio no cambió más de PERSIST_EPS (1 bp),
+# salvo que hayan pasado PERSIST_MAX_GAP_SEC desde la última fila guardada
+PERSIST_EPS = 1e-4
+PERSIST_MAX_GAP_SEC = 60.0
+
 
 class TradingBot:
     """Orchestrates price feed, strategy and portfolio."""
 
-    def __init__(self, starting_cash: float = None):
+    def __init__(self, starting_cash: float = None, max_window: int = PRICE_WINDOW,
+                 request_quotes: bool = False, persist: bool = True):
         # Siempre usar feeds reales - no se permite mock
         self.feed = AggregatedPriceFeed()
+        self.request_quotes = request_quotes  # pedir quote a Jupiter en trades simulados
+        self.persist = persist  # guardar precios/trades/snapshots en la DB
         
         # Use configured trading capital instead of arbitrary starting_cash
         if starting_cash is None:
@@ -26,53 +63,158 @@ class TradingBot:
         
         self.portfolio = Portfolio()  # Will auto-initialize with trading capital
         self.logger = setup_logger()
-        self.prices: List[float] = []
+
+        # Ring buffer de precios: memoria acotada y vista contigua para indicadores
+        self.max_window = max_window
+        self._buf = np.empty(self.max_window, dtype=np.float64)
+        self._head = 0
+        self._count = 0
+        self.indicators = IncrementalIndicators()
+        self._seen = 0  # precios vistos por los indicadores
+
+        # Un solo worker: el estado de la estrategia (buffer, indicadores) sigue siendo single-thread
+        self._exec = ThreadPoolExecutor(max_workers=1, thread_name_prefix="strategy")
+
+        # Filas pendientes de guardar en la base de datos
+        self._pending_prices: List[PriceData] = []
+        self._pending_trades: List[TradeData] = []
+        self._pending_snapshots: List[PortfolioSnapshot] = []
+        self._last_flush = time.monotonic()
+        self._last_persisted_price: Optional[float] = None
+        self._last_persist_ts = 0.0
+
         
         # Log trading capital configuration
         if settings.simulation_mode:
-            self.logger.info(f"🎮 MODO SIMULACIÓN ACTIVADO - NO SE EJECUTARÁN TRANSACCIONES REALES")
-            self.logger.info(f"💰 Balance inicial simulado: {settings.simulation_initial_balance:.4f} SOL")
+            self.logger.info("🎮 MODO SIMULACIÓN ACTIVADO - NO SE EJECUTARÁN TRANSACCIONES REALES")
+            self.logger.info("💰 Balance inicial simulado: %.4f SOL", settings.simulation_initial_balance)
         else:
-            self.logger.info(f"⚠️  MODO REAL - SE EJECUTARÁN TRANSACCIONES REALES")
+            self.logger.info("⚠️  MODO REAL - SE EJECUTARÁN TRANSACCIONES REALES")
         
-        self.logger.info(f"Trading Capital Configuration:")
-        self.logger.info(f"  Trading Capital: {self.portfolio.trading_capital:.4f} SOL")
-        self.logger.info(f"  Max Position: {settings.max_position_size_pct}% = {self.portfolio.calculate_max_trade_size():.4f} SOL")
-        self.logger.info(f"  Reserve Balance: {settings.reserve_balance_sol:.4f} SOL")
+        self.logger.info("Trading Capital Configuration:")
+        self.logger.info("  Trading Capital: %.4f SOL", self.portfolio.trading_capital)
+        self.logger.info("  Max Position: %s%% = %.4f SOL", settings.max_position_size_pct, self.portfolio.calculate_max_trade_size())
+        self.logger.info("  Reserve Balance: %.4f SOL", settings.reserve_balance_sol)
+
+    def _push_price(self, price: float) -> None:
+        """Write a price into the ring buffer, overwriting the oldest one."""
+        self._buf[self._head] = price
+        self._head = (self._head + 1) % self.max_window
+        if self._count < self.max_window:
+            self._count += 1
+
+    def prices_view(self) -> np.ndarray:
+        """Return buffered prices in chronological order.
+
+        A slice (no copy) is returned until the buffer wraps; afterwards the
+        two halves are concatenated.
+        """
+        if self._count < self.max_window:
+            return self._buf[: self._count]
+        return np.concatenate((self._buf[self._head:], self._buf[: self._head]))
+
+    @property
+    def prices(self) -> np.ndarray:
+        return self.prices_view()
+
+    async def _session(self) -> aiohttp.ClientSession:
+        """Return the shared keep-alive HTTP session used for prices and quotes."""
+        return await http.get_session()
+
+    async def aclose(self) -> None:
+        """Flush pending rows, close the HTTP session and stop the strategy worker."""
+        await self._flush()
+        flush_trade_log()
+        await http.close_session()
+        self._exec.shutdown(wait=True)
+
+    def _decide(self, price: float) -> Tuple[Dict[str, float], str]:
+        """CPU-bound part of a tick: update buffer/indicators and compute the signal.
+
+        Runs in ``self._exec`` so the event loop keeps serving I/O meanwhile.
+        """
+        self._push_price(price)
+        # O(1) por tick: la señal sale del estado incremental, sin recorrer el buffer
+        indicators = self.indicators.update(price)
+        self._seen += 1
+        return indicators, signal_from_indicators(price, indicators, self._seen)
 
     async def step(self) -> None:
-        price = await self.feed.get_price()
+        # Fase 1: I/O - obtener precio
+        price = await self.feed.get_price(session=await self._session())
         if price is None:
             self.logger.warning("Price feed unavailable")
             return
         
-        # Guardar precio en base de datos (siempre de fuente real)
-        data_manager.save_price_data(price, "aggregated")
-
-        self.prices.append(price)
-        self.logger.info(f"Price: {price} USD")
+        # Guardar precio en base de datos (siempre de fuente real), salvo si no cambió
+        persist_tick = self.persist and self._price_changed(price)
+        if persist_tick:
+            self._pending_prices.append(PriceData(timestamp=time.time(), price=price, source="aggregated"))
 
-        indicators = compute_indicators(self.prices)
-        if indicators:
-            self.logger.info(
-                "Indicadores => EMA12:{ema12:.2f} EMA50:{ema50:.2f} SMA20:{sma20:.2f} RSI:{rsi:.2f} BB:[{lower_bb:.2f}, {upper_bb:.2f}]".format(**indicators)
-            )
+        # Fase 2: CPU - indicadores y señal en el worker, luego riesgo y tamaño de la orden
+        indicators, signal = await asyncio.get_running_loop().run_in_executor(self._exec, self._decide, price)
 
         # Actualizar precio actual en simulador
-        if settings.simulation_mode and simulator:
-            simulator.update_current_price(price)
+        self.portfolio.update_price(price)
 
-        # Check risk limits before generating new signal
+        # Check risk limits before acting on the signal
         if exceed_max_drawdown(self.portfolio, price) and self.portfolio.base_balance > 0:
             self.logger.warning("Max drawdown exceeded - liquidating position")
             self.portfolio.update_from_trade("SELL", self.portfolio.base_balance, price)
             log_trade({"side": "STOP_SELL", "price": price})
-            self.logger.info(f"Balances: {self.portfolio.as_dict()}")
+            self.logger.info("Balances: %s", self.portfolio.snapshot)
             return
 
-        signal = generate_signal(self.prices)
-        self.logger.info(f"Previsión de acción: {signal}")
+        order = self._size_order(signal, price)
 
+        # Fase 3: I/O concurrente - volcado a la DB y ejecución del trade
+        await asyncio.gather(self._persist_tick(), self._maybe_execute_trade(order, price))
+
+        # Guardar snapshot del portfolio (siempre tras un trade)
+        portfolio_data = self.portfolio.snapshot
+        if persist_tick or (self.persist and order is not None):
+            self._pending_snapshots.append(PortfolioSnapshot(
+                timestamp=time.time(),
+                sol_balance=portfolio_data.get("SOL", 0),
+                usd_balance=portfolio_data.get("USDC", 0),
+                total_value_usd=price * portfolio_data.get("SOL", 0) + portfolio_data.get("USDC", 0),
+                realized_pnl=portfolio_data.get("realized_pnl", 0),
+                unrealized_pnl=portfolio_data.get("unrealized_pnl", 0),
+                simulation=settings.simulation_mode,
+                metadata={"current_price": price}
+            ))
+        
+        # Un solo registro estructurado por tick (precio, indicadores, señal, trade y estado)
+        if self.logger.isEnabledFor(logging.INFO):
+            record = {
+                "price": price,
+                "signal": signal,
+                "indicators": indicators,
+                "portfolio": {
+                    "SOL": portfolio_data.get("SOL", 0),
+                    "USDC": portfolio_data.get("USDC", 0),
+                    "unrealized_pnl": portfolio_data.get("unrealized_pnl", 0),
+                    "realized_pnl": portfolio_data.get("realized_pnl", 0),
+                },
+                "trade": {"side": order[0], "size_sol": order[1]} if order else None,
+            }
+            self.logger.info("tick %s", _tick_json(record), extra={"tick": record})
+        if self.logger.isEnabledFor(logging.DEBUG):
+            self.logger.debug("Balances: %s", portfolio_data)
+
+    def _price_changed(self, price: float) -> bool:
+        """Return True (and remember the price) if this tick is worth persisting."""
+        now = time.monotonic()
+        last = self._last_persisted_price
+        if (last is None or abs(price - last) / last > PERSIST_EPS
+                or now - self._last_persist_ts > PERSIST_MAX_GAP_SEC):
+            self._last_persisted_price = price
+            self._last_persist_ts = now
+            return True
+        return False
+
+    def _size_order(self, signal: str, price: float) -> Optional[Tuple[str, float]]:
+        """Turn a signal into a ``(side, size_sol)`` order, or ``None`` if nothing should trade."""
         if signal == "BUY":
             # Calculate position size based on available capital
             max_trade_size = self.portfolio.calculate_max_trade_size()
@@ -84,60 +226,46 @@ class TradingBot:
             # Validate trade size
             validation = self.portfolio.validate_trade_size(trade_size_sol)
             
-            if validation["valid"] and trade_size_sol > 0 and self.portfolio.quote_balance >= trade_size_sol * price:
-                # Capturar valor del portfolio antes del trade
-                portfolio_before = self.portfolio.as_dict()
-                portfolio_value_before = portfolio_before.get("trading_capital", 0)
-                
-                self.portfolio.update_from_trade("BUY", trade_size_sol, price)
-                log_trade({"side": "BUY", "price": price, "quantity": trade_size_sol})
-                
-                # Capturar valor del portfolio después del trade
-                portfolio_after = self.portfolio.as_dict()
-                portfolio_value_after = portfolio_after.get("trading_capital", 0)
+            if validation.valid and trade_size_sol > 0 and self.portfolio.quote_balance >= trade_size_sol * price:
+                return "BUY", trade_size_sol
+            reason = validation.reason if not validation.valid else "Insufficient capital"
+            self.logger.info("BUY signal but cannot trade: %s", reason)
+            return None
                 
-                # Guardar trade en base de datos
-                data_manager.save_trade_data(
-                    side="BUY",
-                    amount_sol=trade_size_sol,
-                    price=price,
-                    value_usd=trade_size_sol * price,
-                    fees_sol=0.0,  # Simplificado por ahora
-                    simulation=settings.simulation_mode,
-                    portfolio_value_before=portfolio_value_before,
-                    portfolio_value_after=portfolio_value_after
-                )
-                
-                if settings.simulation_mode:
-                    self.logger.info(f"🎮 SIMULADO: BUY {trade_size_sol:.4f} SOL @ ${price}")
-                else:
-                    success = await execute_trade("BUY", trade_size_sol, price)
-                    if success:
-                        self.logger.info(f"⚠️  REAL: BUY {trade_size_sol:.4f} SOL @ ${price}")
-                    else:
-                        self.logger.warning("Real BUY failed")
-            else:
-                reason = validation.get("reason", "Insufficient capital")
-                self.logger.info(f"BUY signal but cannot trade: {reason}")
-                
-        elif signal == "SELL" and self.portfolio.base_balance > 0:
+        if signal == "SELL" and self.portfolio.base_balance > 0:
             # Sell current position (or part of it)
-            trade_size_sol = self.portfolio.base_balance
-            
-            # Capturar valor del portfolio antes del trade
-            portfolio_before = self.portfolio.as_dict()
-            portfolio_value_before = portfolio_before.get("trading_capital", 0)
-            
-            self.portfolio.update_from_trade("SELL", trade_size_sol, price)
-            log_trade({"side": "SELL", "price": price, "quantity": trade_size_sol})
-            
-            # Capturar valor del portfolio después del trade
-            portfolio_after = self.portfolio.as_dict()
-            portfolio_value_after = portfolio_after.get("trading_capital", 0)
-            
-            # Guardar trade en base de datos
-            data_manager.save_trade_data(
-                side="SELL",
+            return "SELL", self.portfolio.base_balance
+
+        return None
+
+    async def _maybe_execute_trade(self, order: Optional[Tuple[str, float]], price: float) -> None:
+        if order is not None:
+            side, trade_size_sol = order
+            await self._execute_trade(side, trade_size_sol, price)
+
+    async def _persist_tick(self) -> None:
+        """Flush buffered rows from previous ticks while the trade is in flight."""
+        if self.persist:
+            await self._maybe_flush()
+
+    async def _execute_trade(self, side: str, trade_size_sol: float, price: float) -> None:
+        """Apply a BUY/SELL to the portfolio, record it and send it on-chain in real mode."""
+        # Capturar valor del portfolio antes del trade
+        portfolio_before = self.portfolio.snapshot
+        portfolio_value_before = portfolio_before.get("trading_capital", 0)
+        
+        self.portfolio.update_from_trade(side, trade_size_sol, price)
+        log_trade({"side": side, "price": price, "quantity": trade_size_sol})
+        
+        # Capturar valor del portfolio después del trade
+        portfolio_after = self.portfolio.snapshot
+        portfolio_value_after = portfolio_after.get("trading_capital", 0)
+        
+        # Guardar trade en base de datos
+        if self.persist:
+            self._pending_trades.append(TradeData(
+                timestamp=time.time(),
+                side=side,
                 amount_sol=trade_size_sol,
                 price=price,
                 value_usd=trade_size_sol * price,
@@ -145,42 +273,65 @@ class TradingBot:
                 simulation=settings.simulation_mode,
                 portfolio_value_before=portfolio_value_before,
                 portfolio_value_after=portfolio_value_after
-            )
-            
-            if settings.simulation_mode:
-                self.logger.info(f"🎮 SIMULADO: SELL {trade_size_sol:.4f} SOL @ ${price}")
-            else:
-                success = await execute_trade("SELL", trade_size_sol, price)
-                if success:
-                    self.logger.info(f"⚠️  REAL: SELL {trade_size_sol:.4f} SOL @ ${price}")
-                else:
-                    self.logger.warning("Real SELL failed")
-        else:
-            self.logger.info("No trade executed")
-
-        # Guardar snapshot del portfolio
-        portfolio_data = self.portfolio.as_dict()
-        data_manager.save_portfolio_snapshot(
-            sol_balance=portfolio_data.get("SOL", 0),
-            usd_balance=portfolio_data.get("USDC", 0),
-            total_value_usd=price * portfolio_data.get("SOL", 0) + portfolio_data.get("USDC", 0),
-            realized_pnl=portfolio_data.get("realized_pnl", 0),
-            unrealized_pnl=portfolio_data.get("unrealized_pnl", 0),
-            simulation=settings.simulation_mode,
-            metadata={"current_price": price}
-        )
+            ))
         
-        self.logger.info(f"Balances: {portfolio_data}")
-        self.logger.info(
-            "Estado actual => SOL:{sol:.4f} USDC:{usdc:.2f} UnrealizedPnL:{upnl:.2f} RealizedPnL:{rpnl:.2f}".format(
-                sol=portfolio_data.get("SOL", 0),
-                usdc=portfolio_data.get("USDC", 0),
-                upnl=portfolio_data.get("unrealized_pnl", 0),
-                rpnl=portfolio_data.get("realized_pnl", 0),
-            )
+        if settings.simulation_mode:
+            self.logger.info("🎮 SIMULADO: %s %.4f SOL @ $%s", side, trade_size_sol, price)
+            await self._post_trade_quote(side, trade_size_sol)
+        else:
+            success = await execute_trade(side, trade_size_sol, price, session=await self._session())
+            if success:
+                self.logger.info("⚠️  REAL: %s %.4f SOL @ $%s", side, trade_size_sol, price)
+            else:
+                self.logger.warning("Real %s failed", side)
+
+    async def _post_trade_quote(self, side: str, amount_sol: float) -> Optional[Dict]:
+        """Ask Jupiter for a reference quote of a simulated trade (no-op unless ``request_quotes``)."""
+        if not self.request_quotes:
+            return None
+        input_mint, output_mint = swap_mints(side)
+        quote = await request_quote(
+            input_mint=input_mint,
+            output_mint=output_mint,
+            amount=int(amount_sol * 1_000_000_000),
+            slippage_bps=settings.slippage_bps,
+            session=await self._session(),
         )
+        if quote:
+            self.logger.info("Jupiter quote %s: outAmount=%s priceImpact=%s", side, quote.get("outAmount"), quote.get("priceImpactPct"))
+        else:
+            self.logger.warning("Jupiter quote unavailable")
+        return quote
+
+    async def _flush(self) -> None:
+        """Write all pending rows to the database in a single transaction.
+
+        The SQLite write runs in a worker thread so it can overlap with network
+        I/O; the pending lists are swapped out first, so rows appended while
+        the write is in progress go to the next batch. If the write fails the
+        rows are put back in front of them and retried on the next flush.
+        """
+        prices, trades, snapshots = self._pending_prices, self._pending_trades, self._pending_snapshots
+        self._pending_prices, self._pending_trades, self._pending_snapshots = [], [], []
+        self._last_flush = time.monotonic()
+        if not (prices or trades or snapshots):
+            return
+        if not await asyncio.to_thread(data_manager.save_batch, prices, trades, snapshots):
+            self._pending_prices[:0] = prices
+            self._pending_trades[:0] = trades
+            self._pending_snapshots[:0] = snapshots
+
+    async def _maybe_flush(self) -> None:
+        """Flush when the batch is full or the flush interval has elapsed."""
+        if (len(self._pending_prices) >= BATCH_SIZE
+                or time.monotonic() - self._last_flush > FLUSH_INTERVAL_SEC):
+            await self._flush()
 
     async def run(self, steps: int = 50, interval: float = 1.0) -> None:
-        for _ in range(steps):
-            await self.step()
-            await asyncio.sleep(interval)
+        try:
+            for _ in range(steps):
+                await self.step()
+                await asyncio.sleep(interval)
+        finally:
+            # Also reached on KeyboardInterrupt/cancellation: nothing buffered is lost
+            await self.aclose()
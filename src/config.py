@@ -1,71 +1,19 @@
 
-from dataclasses import dataclass
+from dataclasses import dataclass, field
+from typing import Optional
+import functools
+import json
 import os
 from dotenv import load_dotenv
 
-load_dotenv()
-
-def derive_private_key_from_mnemonic(mnemonic: str):
-    """
-    Derive private key from mnemonic using Phantom-compatible ED25519 derivation.
-    Uses path m/44'/501'/0'/0' which is Phantom's default.
-    """
-    try:
-        import hashlib
-        import hmac
-        import struct
-        from mnemonic import Mnemonic
-        from solders.keypair import Keypair
+# Re-exportado: la derivación vive en src.keys y solo se ejecuta al leer private_key
+from src.keys import derive_private_key_from_mnemonic, private_key_from_mnemonic
 
-        def hmac_sha512(key, data):
-            return hmac.new(key, data, hashlib.sha512).digest()
+load_dotenv()
 
-        def derive_ed25519_path(seed, path):
-            """ED25519 HD key derivation compatible with Phantom wallet"""
-            if not path.startswith('m/'):
-                raise ValueError("Path must start with 'm/'")
-            path_parts = path[2:].split('/')
-            indices = []
-            for part in path_parts:
-                if part.endswith("'"):
-                    index = int(part[:-1]) + 2**31
-                else:
-                    index = int(part)
-                indices.append(index)
-            master_secret = hmac_sha512(b"ed25519 seed", seed)
-            master_private_key = master_secret[:32]
-            master_chain_code = master_secret[32:]
-            private_key = master_private_key
-            chain_code = master_chain_code
-            for index in indices:
-                if index < 2**31:
-                    index += 2**31
-                data = b'\x00' + private_key + struct.pack('>I', index)
-                derived = hmac_sha512(chain_code, data)
-                private_key = derived[:32]
-                chain_code = derived[32:]
-            return private_key
-
-        mnemo = Mnemonic("english")
-        seed = mnemo.to_seed(mnemonic)
-        path = "m/44'/501'/0'/0'"
-        private_key_32 = derive_ed25519_path(seed, path)
-        keypair = Keypair.from_seed(private_key_32)
-        return list(keypair.to_bytes())
-    except Exception as e:
-        from src.utils.logger import setup_logger
-        logger = setup_logger()
-        logger.error(f"Error derivando clave privada del mnemonic: {e}")
-        return None
-    except Exception as e:
-        from src.utils.logger import setup_logger
-        logger = setup_logger()
-        logger.error(f"Error derivando clave privada del mnemonic: {e}")
-        return None
 
 @dataclass
 class Settings:
-    private_key: str = ""
     rpc_endpoint: str = os.getenv("RPC_ENDPOINT", "https://api.mainnet-beta.solana.com")
     base_mint: str = os.getenv("BASE_MINT", "So11111111111111111111111111111111111111112")
     quote_mint: str = os.getenv("QUOTE_MINT", "EPjFWdd5AufqSSqeM2qN1xzybapC8G4wEGGkZwyTDt1v")
@@ -83,22 +31,46 @@ class Settings:
     simulation_mode: bool = os.getenv("SIMULATION_MODE", "true").lower() == "true"
     simulation_initial_balance: float = float(os.getenv("SIMULATION_INITIAL_BALANCE", 1.0))
 
+    _private_key: Optional[str] = field(default=None, init=False, repr=False)
+
     def __post_init__(self):
         from src.utils.logger import setup_logger
         logger = setup_logger()
-        
-        pk = os.getenv("PRIVATE_KEY", "")
-        if pk and pk != "CHANGE_ME":
-            self.private_key = pk
-        else:
-            mnemonic = os.getenv("MNEMONIC", "")
-            if mnemonic:
-                derived = derive_private_key_from_mnemonic(mnemonic)
-                if derived:
-                    self.private_key = str(derived)
-                else:
-                    logger.error("No se pudo derivar la clave privada del MNEMONIC.")
-            else:
-                logger.warning("No se encontró PRIVATE_KEY ni MNEMONIC en el entorno.")
 
-settings = Settings()
+        # Aviso inmediato; la clave en sí se resuelve la primera vez que se pide
+        self._pk_env = os.getenv("PRIVATE_KEY", "")
+        self._mnemonic = os.getenv("MNEMONIC", "")
+        if not (self._pk_env and self._pk_env != "CHANGE_ME") and not self._mnemonic:
+            logger.warning("No se encontró PRIVATE_KEY ni MNEMONIC en el entorno.")
+
+    @property
+    def private_key(self) -> str:
+        """PRIVATE_KEY from the environment, or the key derived from MNEMONIC."""
+        if self._private_key is None:
+            self._private_key = self._resolve_private_key()
+        return self._private_key
+
+    @private_key.setter
+    def private_key(self, value: str) -> None:
+        self._private_key = value
+
+    def _resolve_private_key(self) -> str:
+        if self._pk_env and self._pk_env != "CHANGE_ME":
+            return self._pk_env
+        if not self._mnemonic:
+            return ""
+        derived = private_key_from_mnemonic(self._mnemonic)
+        if derived:
+            return json.dumps(derived)  # lista JSON, como PRIVATE_KEY en el .env
+        from src.utils.logger import setup_logger
+        setup_logger().error("No se pudo derivar la clave privada del MNEMONIC.")
+        return ""
+
+
+@functools.lru_cache(maxsize=None)
+def get_settings() -> Settings:
+    """Return the process-wide :class:`Settings` instance."""
+    return Settings()
+
+
+settings = get_settings()
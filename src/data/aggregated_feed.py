@@ -1,22 +1,62 @@
 import asyncio
-from typing import Optional
+from typing import Dict, List, Optional
+
+import aiohttp
 
 from .jupiter_quote import fetch_sol_price
 from .pyth_feed import fetch_pyth_sol_price
 
+# Tras el primer precio válido, esperar como mucho esto al resto de fuentes
+GRACE_WINDOW_SEC = 0.05
+
 
 class AggregatedPriceFeed:
     """Retrieve SOL price using both Pyth and Jupiter as sources."""
 
-    async def get_price(self) -> Optional[float]:
-        """Return the average price from available feeds."""
-        try:
-            pyth_task = asyncio.create_task(fetch_pyth_sol_price())
-            jupiter_task = asyncio.create_task(fetch_sol_price())
-            pyth_price, jupiter_price = await asyncio.gather(pyth_task, jupiter_task)
-        except Exception:
+    def __init__(self, grace_window: float = GRACE_WINDOW_SEC):
+        self.grace_window = grace_window
+        # Peticiones que llegaron tarde: se reutilizan en el siguiente tick en vez de descartarse
+        self._inflight: Dict[str, asyncio.Task] = {}
+
+    def _task(self, name: str, coro) -> asyncio.Task:
+        task = self._inflight.get(name)
+        if task is not None and task.get_loop() is asyncio.get_running_loop():
+            if not task.done():
+                coro.close()  # la petición anterior sigue en vuelo: esperar a esa
+                return task
+            _task_price(task)  # ya terminó entre ticks: valor viejo, solo recoger el resultado
+        task = asyncio.create_task(coro)
+        self._inflight[name] = task
+        return task
+
+    async def get_price(self, session: Optional[aiohttp.ClientSession] = None) -> Optional[float]:
+        """Return the average price from available feeds.
+
+        Returns as soon as one feed has a price and the others have had
+        ``grace_window`` seconds to catch up; slower requests keep running and
+        are picked up by the next call. ``session`` is used for both requests
+        when given; otherwise the shared keep-alive session is reused.
+        """
+        tasks = {
+            self._task("pyth", fetch_pyth_sol_price(session)),
+            self._task("jupiter", fetch_sol_price(session)),
+        }
+        pending = tasks
+        prices: List[float] = []
+        # Esperar al primer precio válido (una fuente caída devuelve None enseguida)
+        while pending and not prices:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            prices.extend(p for p in map(_task_price, done) if p)
+        if pending:
+            done, pending = await asyncio.wait(pending, timeout=self.grace_window)
+            prices.extend(p for p in map(_task_price, done) if p)
+
+        if not prices:
             return None
+        return sum(prices) / len(prices)
+
 
-        if pyth_price and jupiter_price:
-            return (pyth_price + jupiter_price) / 2
-        return pyth_price or jupiter_price
+def _task_price(task: asyncio.Task) -> Optional[float]:
+    if task.cancelled() or task.exception() is not None:
+        return None
+    return task.result()
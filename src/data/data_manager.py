@@ -4,16 +4,96 @@ Guarda toda la información localmente para análisis histórico.
 """
 
 import sqlite3
+import atexit
 import json
+import logging
 import os
+import threading
 import time
+import weakref
+from collections import deque
+from contextlib import contextmanager
 from datetime import datetime, timezone
-from typing import Dict, List, Optional, Any
+from itertools import count, groupby, islice
+from operator import itemgetter
+from typing import Dict, Iterator, List, Optional, Any, Sequence, Union
 from dataclasses import dataclass, asdict
 from pathlib import Path
 
+import pandas as pd
+
 from ..config import settings
 
+# Hijo del logger "bot": las rutas de escritura encolan en su QueueHandler en vez de hacer print
+logger = logging.getLogger("bot.data")
+
+# orjson es opcional: serializa mucho más rápido y escribe bytes directamente
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+# zstandard es opcional: comprime la metadata grande de price_data (se guarda como BLOB)
+try:
+    import zstandard
+    _zstd_compressor = zstandard.ZstdCompressor(level=3)
+    _zstd_decompressor = zstandard.ZstdDecompressor()
+    ZSTD_AVAILABLE = True
+except ImportError:
+    ZSTD_AVAILABLE = False
+
+# Por debajo de este tamaño la cabecera de zstd no compensa
+ZSTD_MIN_BYTES = 256
+
+# ``DataManager(":memory:")``: base de datos en memoria (tests), sin fichero ni fsync
+IN_MEMORY = ":memory:"
+_memory_db_ids = count()
+
+
+def _dumps(data: Any) -> str:
+    """Serializa metadata a texto JSON para las columnas TEXT de SQLite."""
+    if ORJSON_AVAILABLE:
+        return orjson.dumps(data, option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS).decode()
+    return json.dumps(data)
+
+
+def _loads(text: Union[str, bytes]) -> Any:
+    """Deserializa metadata; los BLOB son JSON comprimido con zstd."""
+    if isinstance(text, bytes):
+        if not ZSTD_AVAILABLE:
+            raise RuntimeError("Metadata comprimida con zstd: instala 'zstandard' para leerla")
+        text = _zstd_decompressor.decompress(text)
+    return orjson.loads(text) if ORJSON_AVAILABLE else json.loads(text)
+
+
+def _dump_bytes(data: Any) -> bytes:
+    """JSON compacto en bytes (para escribir en streaming)."""
+    if ORJSON_AVAILABLE:
+        return orjson.dumps(data, option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS)
+    return json.dumps(data, separators=(',', ':')).encode()
+
+
+def _pack_metadata(data: Any) -> Union[str, bytes]:
+    """JSON de metadata; los payloads grandes se comprimen con zstd si está disponible."""
+    text = _dumps(data)
+    if ZSTD_AVAILABLE and len(text) >= ZSTD_MIN_BYTES:
+        return _zstd_compressor.compress(text.encode())
+    return text
+
+
+def write_json(data: Any, filepath: str) -> None:
+    """Escribe ``data`` como JSON; los timestamps deben venir ya como ISO strings o números.
+
+    Con orjson se indenta (es barato); el fallback de ``json`` escribe compacto.
+    """
+    if ORJSON_AVAILABLE:
+        with open(filepath, 'wb') as f:
+            f.write(orjson.dumps(data, option=orjson.OPT_INDENT_2 | orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS))
+    else:
+        with open(filepath, 'w') as f:
+            json.dump(data, f, separators=(',', ':'))
+
 
 @dataclass
 class PriceData:
@@ -55,27 +135,174 @@ class PortfolioSnapshot:
     metadata: Optional[Dict] = None
 
 
+# Buffer de escritura de save_price_data/save_trade_data/save_portfolio_snapshot
+FLUSH_INTERVAL_SEC = 1.0
+FLUSH_MAX_ROWS = 500
+# Filas por llamada al serializador JSON en export_data
+EXPORT_CHUNK_ROWS = 1000
+# Retención por defecto de cleanup_old_data: ticks crudos 24 h, velas de 5m hasta 7 días
+RAW_RETENTION_HOURS = 24
+HOURLY_AFTER_HOURS = 24 * 7
+
+_instances: "weakref.WeakSet[DataManager]" = weakref.WeakSet()
+
+
+@atexit.register
+def _close_all() -> None:
+    # El hilo de volcado es daemon: vaciar lo pendiente (y optimizar) antes de salir
+    for dm in list(_instances):
+        if not dm._stop.is_set():
+            dm.close()
+
+
 class DataManager:
     """
     Gestor de persistencia de datos para el bot de trading.
     Guarda precios, trades y snapshots del portfolio en SQLite.
+    Las llamadas ``save_*`` individuales se acumulan en memoria y se vuelcan en lote
+    cada ``FLUSH_INTERVAL_SEC`` (o al llegar a ``FLUSH_MAX_ROWS``); las lecturas
+    vuelcan antes de consultar.
     """
     
     def __init__(self, db_path: str = None):
         if db_path is None:
-            # Crear directorio data si no existe
-            data_dir = Path("data/storage")
+            # Crear directorio data si no existe (DATA_DIR lo cambia, p. ej. en los tests)
+            data_dir = Path(os.getenv("DATA_DIR", "data/storage"))
             data_dir.mkdir(parents=True, exist_ok=True)
             db_path = data_dir / "trading_data.db"
         
         self.db_path = str(db_path)
+        self.in_memory = self.db_path == IN_MEMORY
+        # En memoria se usa una URI con nombre y cache compartida: así el lector de
+        # _read_connection ve la misma base de datos que la conexión principal
+        self._uri = f"file:dm-{next(_memory_db_ids)}?mode=memory&cache=shared" if self.in_memory else None
+        # Una conexión persistente compartida entre hilos (el bot escribe desde un worker)
+        self._lock = threading.Lock()
+        self._conn = self._connect()
         self._init_database()
+
+        # Filas pendientes de volcar: (sentencia INSERT, fila)
+        self._pending: deque = deque()
+        self._buf_lock = threading.Lock()
+        # Un volcado a la vez: las filas en curso siguen en la cola hasta el commit
+        self._flush_lock = threading.Lock()
+        self._stop = threading.Event()
+        threading.Thread(target=self._flush_loop, args=(weakref.ref(self), self._stop),
+                         name="DataManagerFlush", daemon=True).start()
+        _instances.add(self)
         
         print(f"📊 DataManager inicializado - DB: {self.db_path}")
     
+    def _connect(self) -> sqlite3.Connection:
+        """Abre la conexión persistente en modo autocommit con los ajustes de WAL."""
+        # Las sentencias se preparan una vez y se reutilizan desde la cache del módulo sqlite3
+        # (clave = texto SQL, por eso los INSERT son constantes de clase); 256 cubre todas
+        # las variantes de historial/estadísticas sin desalojar los INSERT
+        conn = sqlite3.connect(self._uri or self.db_path, isolation_level=None, check_same_thread=False,
+                               cached_statements=256, uri=self.in_memory)
+        if not self.in_memory:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")  # con WAL no pierde consistencia
+            conn.execute("PRAGMA mmap_size=268435456")
+        else:
+            conn.execute("PRAGMA synchronous=OFF")  # no hay fichero que sincronizar
+        conn.execute("PRAGMA temp_store=MEMORY")
+        conn.execute("PRAGMA cache_size=-65536")
+        return conn
+
+    @property
+    def change_count(self) -> int:
+        """Filas escritas por este gestor hasta ahora (vuelca antes las pendientes)."""
+        self.flush()
+        with self._lock:
+            return self._conn.total_changes
+
+    @contextmanager
+    def _transaction(self) -> Iterator[sqlite3.Connection]:
+        """Ejecuta un bloque en una única transacción explícita sobre la conexión compartida."""
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                yield self._conn
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+
+    @staticmethod
+    def _flush_loop(ref: "weakref.ref[DataManager]", stop: threading.Event) -> None:
+        # Solo una referencia débil: el hilo no mantiene vivo al DataManager
+        while not stop.wait(FLUSH_INTERVAL_SEC):
+            dm = ref()
+            if dm is None:
+                return
+            dm.flush()
+            del dm
+
+    def _enqueue(self, sql: str, row: tuple) -> None:
+        with self._buf_lock:
+            self._pending.append((sql, row))
+            full = len(self._pending) >= FLUSH_MAX_ROWS
+        if full:
+            self.flush()
+
+    def flush(self) -> bool:
+        """Vuelca las filas pendientes en una transacción; ``False`` si la escritura falló.
+
+        Las filas solo salen de la cola tras el commit: si falla (p. ej. "database
+        is locked") siguen pendientes y se reintentan en el siguiente volcado.
+        """
+        with self._flush_lock:
+            with self._buf_lock:
+                if not self._pending:
+                    return True
+                # Solo se añade por la derecha mientras tanto: los n primeros son estos
+                pending = list(self._pending)
+            try:
+                with self._transaction() as conn:
+                    # Un executemany por tramo de filas con la misma sentencia (conserva el orden)
+                    for sql, group in groupby(pending, key=itemgetter(0)):
+                        conn.executemany(sql, [row for _, row in group])
+            except Exception as e:
+                logger.error("❌ Error volcando %d filas pendientes (se reintentarán): %s", len(pending), e)
+                return False
+            with self._buf_lock:
+                for _ in range(len(pending)):
+                    self._pending.popleft()
+            return True
+
+    def optimize(self) -> None:
+        """Ejecuta ``PRAGMA optimize`` para que las estadísticas del planificador sigan el crecimiento de las tablas."""
+        try:
+            with self._lock:
+                self._conn.execute("PRAGMA optimize")
+        except sqlite3.Error as e:
+            logger.error("❌ Error optimizando la base de datos: %s", e)
+
+    def backup(self, path: str) -> None:
+        """Copia la base de datos completa (con las filas pendientes) al fichero ``path``.
+
+        Usa la API de backup en caliente de SQLite, así que también sirve para ``:memory:``.
+        """
+        self.flush()
+        dest = sqlite3.connect(str(path))
+        try:
+            with self._lock:
+                self._conn.backup(dest)
+        finally:
+            dest.close()
+
+    def close(self) -> None:
+        """Vuelca las filas pendientes, actualiza las estadísticas del planificador y cierra la conexión."""
+        self._stop.set()
+        self.flush()
+        self.optimize()
+        with self._lock:
+            self._conn.close()
+
     def _init_database(self):
         """Inicializa las tablas de la base de datos"""
-        with sqlite3.connect(self.db_path) as conn:
+        with self._transaction() as conn:
             # Tabla de precios
             conn.execute("""
                 CREATE TABLE IF NOT EXISTS price_data (
@@ -125,193 +352,362 @@ class DataManager:
                 )
             """)
             
+            # Precios agregados (OHLC) para historial antiguo: 5 minutos y 1 hora
+            for table in ("price_history_5m", "price_history_1h"):
+                conn.execute(f"""
+                    CREATE TABLE IF NOT EXISTS {table} (
+                        bucket_start REAL NOT NULL,
+                        source TEXT NOT NULL,
+                        open REAL NOT NULL,
+                        high REAL NOT NULL,
+                        low REAL NOT NULL,
+                        close REAL NOT NULL,
+                        avg_price REAL NOT NULL,
+                        tick_count INTEGER NOT NULL,
+                        PRIMARY KEY (bucket_start, source)
+                    )
+                """)
+            
             # Índices para consultas rápidas
             conn.execute("CREATE INDEX IF NOT EXISTS idx_price_timestamp ON price_data(timestamp)")
+            # Índice cubriente: MIN/MAX/AVG(price) por rango de tiempo sin leer la tabla
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_price_timestamp_price ON price_data(timestamp, price)")
             conn.execute("CREATE INDEX IF NOT EXISTS idx_trade_timestamp ON trade_data(timestamp)")
             conn.execute("CREATE INDEX IF NOT EXISTS idx_portfolio_timestamp ON portfolio_snapshots(timestamp)")
-            conn.execute("CREATE INDEX IF NOT EXISTS idx_price_source ON price_data(source)")
-            conn.execute("CREATE INDEX IF NOT EXISTS idx_trade_simulation ON trade_data(simulation)")
+            # Filtro por fuente/modo + rango de tiempo ordenado, servido desde el índice
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_price_source_ts ON price_data(source, timestamp)")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_trade_sim_ts ON trade_data(simulation, timestamp)")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_portfolio_sim_ts ON portfolio_snapshots(simulation, timestamp)")
+            # Sustituidos por los compuestos anteriores (mismo prefijo)
+            conn.execute("DROP INDEX IF EXISTS idx_price_source")
+            conn.execute("DROP INDEX IF EXISTS idx_trade_simulation")
             
-            conn.commit()
     
+    _PRICE_INSERT = """
+        INSERT INTO price_data
+        (timestamp, price, source, volume_24h, market_cap, metadata)
+        VALUES (?, ?, ?, ?, ?, ?)
+    """
+    _TRADE_INSERT = """
+        INSERT INTO trade_data
+        (timestamp, side, amount_sol, price, value_usd, fees_sol, simulation,
+         slippage_pct, portfolio_value_before, portfolio_value_after, metadata)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    """
+    _SNAPSHOT_INSERT = """
+        INSERT INTO portfolio_snapshots
+        (timestamp, sol_balance, usd_balance, total_value_usd,
+         realized_pnl, unrealized_pnl, simulation, metadata)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+    """
+
+    @staticmethod
+    def _price_row(price_data: PriceData) -> tuple:
+        return (
+            price_data.timestamp,
+            price_data.price,
+            price_data.source,
+            price_data.volume_24h,
+            price_data.market_cap,
+            _pack_metadata(price_data.metadata) if price_data.metadata else None
+        )
+
+    @staticmethod
+    def _trade_row(trade_data: TradeData) -> tuple:
+        return (
+            trade_data.timestamp,
+            trade_data.side,
+            trade_data.amount_sol,
+            trade_data.price,
+            trade_data.value_usd,
+            trade_data.fees_sol,
+            trade_data.simulation,
+            trade_data.slippage_pct,
+            trade_data.portfolio_value_before,
+            trade_data.portfolio_value_after,
+            _dumps(trade_data.metadata) if trade_data.metadata else None
+        )
+
+    @staticmethod
+    def _snapshot_row(snapshot: PortfolioSnapshot) -> tuple:
+        return (
+            snapshot.timestamp,
+            snapshot.sol_balance,
+            snapshot.usd_balance,
+            snapshot.total_value_usd,
+            snapshot.realized_pnl,
+            snapshot.unrealized_pnl,
+            snapshot.simulation,
+            _dumps(snapshot.metadata) if snapshot.metadata else None
+        )
+
     def save_price_data(self, price: float, source: str, volume_24h: float = None, 
-                       market_cap: float = None, metadata: Dict = None) -> bool:
-        """Guarda datos de precio"""
+                       market_cap: float = None, metadata: Dict = None,
+                       timestamp: float = None) -> bool:
+        """Guarda datos de precio (``timestamp`` por defecto: ahora)"""
         try:
-            price_data = PriceData(
-                timestamp=time.time(),
-                price=price,
-                source=source,
-                volume_24h=volume_24h,
-                market_cap=market_cap,
-                metadata=metadata
-            )
-            
-            with sqlite3.connect(self.db_path) as conn:
-                conn.execute("""
-                    INSERT INTO price_data 
-                    (timestamp, price, source, volume_24h, market_cap, metadata)
-                    VALUES (?, ?, ?, ?, ?, ?)
-                """, (
-                    price_data.timestamp,
-                    price_data.price,
-                    price_data.source,
-                    price_data.volume_24h,
-                    price_data.market_cap,
-                    json.dumps(price_data.metadata) if price_data.metadata else None
-                ))
-                conn.commit()
+            # Fila construida directamente (mismo orden que _price_row), sin dataclass intermedio
+            self._enqueue(self._PRICE_INSERT, (
+                time.time() if timestamp is None else timestamp, price, source, volume_24h, market_cap,
+                _pack_metadata(metadata) if metadata else None
+            ))
             
             return True
         except Exception as e:
-            print(f"❌ Error guardando precio: {e}")
+            logger.error("❌ Error guardando precio: %s", e)
             return False
     
     def save_trade_data(self, side: str, amount_sol: float, price: float, 
                        value_usd: float, fees_sol: float, simulation: bool,
                        slippage_pct: float = None, portfolio_value_before: float = None,
-                       portfolio_value_after: float = None, metadata: Dict = None) -> bool:
-        """Guarda datos de trade"""
+                       portfolio_value_after: float = None, metadata: Dict = None,
+                       timestamp: float = None) -> bool:
+        """Guarda datos de trade (``timestamp`` por defecto: ahora)"""
         try:
-            trade_data = TradeData(
-                timestamp=time.time(),
-                side=side,
-                amount_sol=amount_sol,
-                price=price,
-                value_usd=value_usd,
-                fees_sol=fees_sol,
-                simulation=simulation,
-                slippage_pct=slippage_pct,
-                portfolio_value_before=portfolio_value_before,
-                portfolio_value_after=portfolio_value_after,
-                metadata=metadata
-            )
+            self._enqueue(self._TRADE_INSERT, (
+                time.time() if timestamp is None else timestamp, side, amount_sol, price, value_usd, fees_sol, simulation,
+                slippage_pct, portfolio_value_before, portfolio_value_after,
+                _dumps(metadata) if metadata else None
+            ))
             
-            with sqlite3.connect(self.db_path) as conn:
-                conn.execute("""
-                    INSERT INTO trade_data 
-                    (timestamp, side, amount_sol, price, value_usd, fees_sol, simulation,
-                     slippage_pct, portfolio_value_before, portfolio_value_after, metadata)
-                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                """, (
-                    trade_data.timestamp,
-                    trade_data.side,
-                    trade_data.amount_sol,
-                    trade_data.price,
-                    trade_data.value_usd,
-                    trade_data.fees_sol,
-                    trade_data.simulation,
-                    trade_data.slippage_pct,
-                    trade_data.portfolio_value_before,
-                    trade_data.portfolio_value_after,
-                    json.dumps(trade_data.metadata) if trade_data.metadata else None
-                ))
-                conn.commit()
-            
-            print(f"💾 Trade guardado: {side} {amount_sol:.4f} SOL @ ${price} ({'SIM' if simulation else 'REAL'})")
+            if logger.isEnabledFor(logging.INFO):
+                logger.info("💾 Trade guardado: %s %.4f SOL @ $%s (%s)", side, amount_sol, price, "SIM" if simulation else "REAL")
             return True
         except Exception as e:
-            print(f"❌ Error guardando trade: {e}")
+            logger.error("❌ Error guardando trade: %s", e)
             return False
     
     def save_portfolio_snapshot(self, sol_balance: float, usd_balance: float,
                               total_value_usd: float, realized_pnl: float,
                               unrealized_pnl: float, simulation: bool,
-                              metadata: Dict = None) -> bool:
-        """Guarda snapshot del portfolio"""
+                              metadata: Dict = None, timestamp: float = None) -> bool:
+        """Guarda snapshot del portfolio (``timestamp`` por defecto: ahora)"""
         try:
-            snapshot = PortfolioSnapshot(
-                timestamp=time.time(),
-                sol_balance=sol_balance,
-                usd_balance=usd_balance,
-                total_value_usd=total_value_usd,
-                realized_pnl=realized_pnl,
-                unrealized_pnl=unrealized_pnl,
-                simulation=simulation,
-                metadata=metadata
-            )
-            
-            with sqlite3.connect(self.db_path) as conn:
-                conn.execute("""
-                    INSERT INTO portfolio_snapshots 
-                    (timestamp, sol_balance, usd_balance, total_value_usd, 
-                     realized_pnl, unrealized_pnl, simulation, metadata)
-                    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-                """, (
-                    snapshot.timestamp,
-                    snapshot.sol_balance,
-                    snapshot.usd_balance,
-                    snapshot.total_value_usd,
-                    snapshot.realized_pnl,
-                    snapshot.unrealized_pnl,
-                    snapshot.simulation,
-                    json.dumps(snapshot.metadata) if snapshot.metadata else None
-                ))
-                conn.commit()
+            self._enqueue(self._SNAPSHOT_INSERT, (
+                time.time() if timestamp is None else timestamp, sol_balance, usd_balance, total_value_usd,
+                realized_pnl, unrealized_pnl, simulation,
+                _dumps(metadata) if metadata else None
+            ))
             
             return True
         except Exception as e:
-            print(f"❌ Error guardando snapshot del portfolio: {e}")
+            logger.error("❌ Error guardando snapshot del portfolio: %s", e)
+            return False
+
+    def save_many_prices(self, rows: Sequence[tuple]) -> bool:
+        """
+        Inserta filas de precio ya construidas en una transacción
+        ``(timestamp, price, source, volume_24h, market_cap, metadata)``.
+        """
+        if not rows:
+            return True
+        try:
+            with self._transaction() as conn:
+                conn.executemany(self._PRICE_INSERT, rows)
+            return True
+        except Exception as e:
+            logger.error("❌ Error guardando precios: %s", e)
+            return False
+
+    def save_many_trades(self, rows: Sequence[tuple]) -> bool:
+        """
+        Inserta filas de trade ya construidas en una transacción
+        ``(timestamp, side, amount_sol, price, value_usd, fees_sol, simulation,
+        slippage_pct, portfolio_value_before, portfolio_value_after, metadata)``.
+        """
+        if not rows:
+            return True
+        try:
+            with self._transaction() as conn:
+                conn.executemany(self._TRADE_INSERT, rows)
+            return True
+        except Exception as e:
+            logger.error("❌ Error guardando trades: %s", e)
+            return False
+
+    def save_batch(self, prices: List[PriceData] = (), trades: List[TradeData] = (),
+                   snapshots: List[PortfolioSnapshot] = ()) -> bool:
+        """
+        Guarda lotes de precios, trades y snapshots en una sola transacción.
+        Pensado para el loop del bot, que acumula filas y las vuelca cada K ticks.
+        """
+        if not (prices or trades or snapshots):
+            return True
+        try:
+            with self._transaction() as conn:
+                if prices:
+                    conn.executemany(self._PRICE_INSERT, [self._price_row(p) for p in prices])
+                if trades:
+                    conn.executemany(self._TRADE_INSERT, [self._trade_row(t) for t in trades])
+                if snapshots:
+                    conn.executemany(self._SNAPSHOT_INSERT, [self._snapshot_row(s) for s in snapshots])
+
+            if trades and logger.isEnabledFor(logging.INFO):
+                for trade in trades:
+                    logger.info("💾 Trade guardado: %s %.4f SOL @ $%s (%s)", trade.side, trade.amount_sol,
+                                trade.price, "SIM" if trade.simulation else "REAL")
+            return True
+        except Exception as e:
+            logger.error("❌ Error guardando lote: %s", e)
             return False
     
-    def get_price_history(self, source: str = None, hours: int = 24) -> List[Dict]:
-        """Obtiene historial de precios"""
+    _ORDER_SQL = {"asc": "ASC", "desc": "DESC"}
+
+    # Niveles de downsampling: bucket -> (tabla destino, segundos por bucket, tabla origen)
+    _ROLLUPS = {
+        "5m": ("price_history_5m", 300, "price_data"),
+        "1h": ("price_history_1h", 3600, "price_history_5m"),
+    }
+    # Cada nivel visto como velas: un tick crudo es una vela de un solo precio
+    _TIER_COLUMNS = {
+        "price_data": ("timestamp", "timestamp AS ts, price AS open, price AS high, price AS low, "
+                                    "price AS close, price AS avg_price, 1 AS tick_count"),
+        "price_history_5m": ("bucket_start", "bucket_start AS ts, open, high, low, close, avg_price, tick_count"),
+        "price_history_1h": ("bucket_start", "bucket_start AS ts, open, high, low, close, avg_price, tick_count"),
+    }
+
+    def _price_tiers_query(self, select_raw: str, select_rollup: str, source: str = None) -> tuple:
+        """UNION ALL de precios crudos y agregados; devuelve (subconsulta, filtro de fuente)."""
+        source_filter = " AND source = ?" if source else ""
+        parts = [f"{select_raw} FROM price_data WHERE timestamp > ?{source_filter}"]
+        for bucket, (table, _, _) in self._ROLLUPS.items():
+            parts.append(f"{select_rollup.format(bucket=bucket)} FROM {table} WHERE bucket_start > ?{source_filter}")
+        return " UNION ALL ".join(parts), [source] if source else []
+
+    def _candles_query(self, table: str, size: int, where: str) -> str:
+        """Velas OHLC de ``size`` segundos sobre ``table`` (filas que cumplen ``where``).
+
+        Columnas: bucket_start, source, open, high, low, close, avg_price, tick_count.
+        open/close son el primer/último valor del bucket por orden de tiempo; todo se
+        agrega en SQLite, sin traer filas a Python.
+        """
+        columns = self._TIER_COLUMNS[table][1]
+        return f"""
+            SELECT bucket_start, source, MIN(first_open) AS open, MAX(high) AS high, MIN(low) AS low,
+                   MIN(last_close) AS close, SUM(avg_price * tick_count) / SUM(tick_count) AS avg_price,
+                   SUM(tick_count) AS tick_count
+            FROM (
+                SELECT CAST(ts / {size} AS INTEGER) * {size} AS bucket_start, source, high, low,
+                       avg_price, tick_count,
+                       FIRST_VALUE(open) OVER w AS first_open, LAST_VALUE(close) OVER w AS last_close
+                FROM (SELECT rowid AS rid, source, {columns} FROM {table} WHERE {where})
+                WINDOW w AS (PARTITION BY CAST(ts / {size} AS INTEGER), source ORDER BY ts, rid
+                             ROWS BETWEEN UNBOUNDED PRECEDING AND UNBOUNDED FOLLOWING)
+            )
+            GROUP BY bucket_start, source
+        """
+
+    @staticmethod
+    def _price_metadata(row: tuple) -> Optional[Dict]:
+        if row[6] is None:
+            return _loads(row[5]) if row[5] else None
+        return {"bucket": row[6], "open": row[7], "high": row[8], "low": row[9], "count": row[10]}
+
+    @staticmethod
+    def _price_resolution(hours: float) -> Optional[str]:
+        """Nivel más grueso que cubre una ventana de ``hours``: crudo (``None``), "5m" o "1h"."""
+        if hours <= RAW_RETENTION_HOURS:
+            return None
+        if hours <= HOURLY_AFTER_HOURS:
+            return "5m"
+        return "1h"
+
+    def _price_history_query(self, source: str, hours: float, limit: Optional[int], order: str,
+                             resolution: Optional[str] = None) -> tuple:
+        """SELECT del historial de precios. Con ``resolution`` ("5m"/"1h") los niveles más
+        finos se agregan en SQLite a velas de ese tamaño; los demás se leen tal cual."""
+        cutoff_time = time.time() - (hours * 3600)
+        source_filter = " AND source = ?" if source else ""
+        # Alias explícitos: con resolution la primera parte del UNION es de velas (nombra las columnas)
+        stored = ("SELECT bucket_start AS timestamp, close AS price, source, NULL AS volume_24h, "
+                  "NULL AS market_cap, NULL AS metadata, '{bucket}' AS bucket, open, high, low, tick_count")
+        # Niveles de más fino a más grueso; los [:level] se agregan a ``resolution``
+        tiers = [("price_data", None)] + [(table, bucket) for bucket, (table, _, _) in self._ROLLUPS.items()]
+        level = 0 if resolution is None else 1 + list(self._ROLLUPS).index(resolution)
+        parts = []
+        for table, _ in tiers[:level]:
+            candles = self._candles_query(table, self._ROLLUPS[resolution][1],
+                                          f"{self._TIER_COLUMNS[table][0]} > ?{source_filter}")
+            parts.append(f"{stored.format(bucket=resolution)} FROM ({candles})")
+        for table, bucket in tiers[level:]:
+            if bucket is None:
+                parts.append("SELECT timestamp, price, source, volume_24h, market_cap, metadata, "
+                             "NULL AS bucket, NULL AS open, NULL AS high, NULL AS low, NULL AS tick_count "
+                             f"FROM price_data WHERE timestamp > ?{source_filter}")
+            else:
+                parts.append(f"{stored.format(bucket=bucket)} FROM {table} WHERE bucket_start > ?{source_filter}")
+        query = " UNION ALL ".join(parts) + f" ORDER BY 1 {self._ORDER_SQL[order]}"
+        params: List[Any] = [cutoff_time, *([source] if source else [])] * len(parts)
+        if limit is not None:
+            query += " LIMIT ?"
+            params.append(limit)
+        return query, params
+
+    def _history_query(self, table: str, simulation: Optional[bool], hours: float,
+                       limit: Optional[int], order: str) -> tuple:
+        """SELECT de trade_data / portfolio_snapshots con los filtros comunes."""
+        query = f"SELECT * FROM {table} WHERE timestamp > ?"
+        params: List[Any] = [time.time() - (hours * 3600)]
+        if simulation is not None:
+            query += " AND simulation = ?"
+            params.append(simulation)
+        query += f" ORDER BY timestamp {self._ORDER_SQL[order]}"
+        if limit is not None:
+            query += " LIMIT ?"
+            params.append(limit)
+        return query, params
+
+    @classmethod
+    def _price_dict(cls, row: tuple) -> Dict:
+        return {
+            "timestamp": row[0],
+            "price": row[1],
+            "source": row[2],
+            "volume_24h": row[3],
+            "market_cap": row[4],
+            "metadata": cls._price_metadata(row),
+            "datetime": datetime.fromtimestamp(row[0], tz=timezone.utc).isoformat()
+        }
+
+    def get_price_history(self, source: str = None, hours: int = 24,
+                          limit: int = None, order: str = "asc", as_frame: bool = False):
+        """
+        Obtiene historial de precios (``order="desc"`` + ``limit`` para los últimos N).
+        Se lee del nivel más grueso que cubre la ventana: ticks crudos hasta
+        ``RAW_RETENTION_HOURS``, velas de 5m hasta ``HOURLY_AFTER_HOURS`` y de 1h después
+        (los niveles más finos se agregan en SQLite a ese tamaño). Cada vela es una fila
+        (precio de cierre, OHLC en ``metadata``).
+        Con ``as_frame=True`` devuelve un DataFrame con el OHLC en columnas propias.
+        """
+        self.flush()
         try:
-            cutoff_time = time.time() - (hours * 3600)
+            query, params = self._price_history_query(source, hours, limit, order, self._price_resolution(hours))
             
-            with sqlite3.connect(self.db_path) as conn:
-                if source:
-                    cursor = conn.execute("""
-                        SELECT timestamp, price, source, volume_24h, market_cap, metadata
-                        FROM price_data 
-                        WHERE timestamp > ? AND source = ?
-                        ORDER BY timestamp ASC
-                    """, (cutoff_time, source))
-                else:
-                    cursor = conn.execute("""
-                        SELECT timestamp, price, source, volume_24h, market_cap, metadata
-                        FROM price_data 
-                        WHERE timestamp > ?
-                        ORDER BY timestamp ASC
-                    """, (cutoff_time,))
-                
-                rows = cursor.fetchall()
-                
-                return [
-                    {
-                        "timestamp": row[0],
-                        "price": row[1],
-                        "source": row[2],
-                        "volume_24h": row[3],
-                        "market_cap": row[4],
-                        "metadata": json.loads(row[5]) if row[5] else None,
-                        "datetime": datetime.fromtimestamp(row[0], tz=timezone.utc).isoformat()
-                    }
-                    for row in rows
-                ]
+            with self._transaction() as conn:
+                if as_frame:
+                    df = pd.read_sql_query(query, conn, params=params)
+                    # Conversión vectorizada: una pasada por columna en vez de un dict por fila
+                    df["metadata"] = df["metadata"].map(_loads, na_action="ignore")
+                    df["datetime"] = pd.to_datetime(df["timestamp"], unit="s", utc=True)
+                    return df
+                rows = conn.execute(query, params).fetchall()
+            
+            return [self._price_dict(row) for row in rows]
         except Exception as e:
             print(f"❌ Error obteniendo historial de precios: {e}")
-            return []
+            return pd.DataFrame() if as_frame else []
     
-    def get_trade_history(self, simulation: bool = None, hours: int = 24) -> List[Dict]:
-        """Obtiene historial de trades"""
+    def get_trade_history(self, simulation: bool = None, hours: int = 24,
+                          limit: int = None, order: str = "asc", as_frame: bool = False):
+        """Obtiene historial de trades (``order="desc"`` + ``limit`` para los últimos N; ``as_frame`` → DataFrame)"""
+        self.flush()
         try:
-            cutoff_time = time.time() - (hours * 3600)
+            query, params = self._history_query("trade_data", simulation, hours, limit, order)
             
-            with sqlite3.connect(self.db_path) as conn:
-                if simulation is not None:
-                    cursor = conn.execute("""
-                        SELECT * FROM trade_data 
-                        WHERE timestamp > ? AND simulation = ?
-                        ORDER BY timestamp ASC
-                    """, (cutoff_time, simulation))
-                else:
-                    cursor = conn.execute("""
-                        SELECT * FROM trade_data 
-                        WHERE timestamp > ?
-                        ORDER BY timestamp ASC
-                    """, (cutoff_time,))
-                
+            with self._transaction() as conn:
+                if as_frame:
+                    return pd.read_sql_query(query, conn, params=params)
+                cursor = conn.execute(query, params)
                 rows = cursor.fetchall()
                 columns = [desc[0] for desc in cursor.description]
                 
@@ -321,27 +717,19 @@ class DataManager:
                 ]
         except Exception as e:
             print(f"❌ Error obteniendo historial de trades: {e}")
-            return []
+            return pd.DataFrame() if as_frame else []
     
-    def get_portfolio_history(self, simulation: bool = None, hours: int = 24) -> List[Dict]:
-        """Obtiene historial del portfolio"""
+    def get_portfolio_history(self, simulation: bool = None, hours: int = 24,
+                              limit: int = None, order: str = "asc", as_frame: bool = False):
+        """Obtiene historial del portfolio (``order="desc"`` + ``limit`` para los últimos N; ``as_frame`` → DataFrame)"""
+        self.flush()
         try:
-            cutoff_time = time.time() - (hours * 3600)
+            query, params = self._history_query("portfolio_snapshots", simulation, hours, limit, order)
             
-            with sqlite3.connect(self.db_path) as conn:
-                if simulation is not None:
-                    cursor = conn.execute("""
-                        SELECT * FROM portfolio_snapshots 
-                        WHERE timestamp > ? AND simulation = ?
-                        ORDER BY timestamp ASC
-                    """, (cutoff_time, simulation))
-                else:
-                    cursor = conn.execute("""
-                        SELECT * FROM portfolio_snapshots 
-                        WHERE timestamp > ?
-                        ORDER BY timestamp ASC
-                    """, (cutoff_time,))
-                
+            with self._transaction() as conn:
+                if as_frame:
+                    return pd.read_sql_query(query, conn, params=params)
+                cursor = conn.execute(query, params)
                 rows = cursor.fetchall()
                 columns = [desc[0] for desc in cursor.description]
                 
@@ -351,12 +739,124 @@ class DataManager:
                 ]
         except Exception as e:
             print(f"❌ Error obteniendo historial del portfolio: {e}")
-            return []
+            return pd.DataFrame() if as_frame else []
+
+    @contextmanager
+    def _read_connection(self) -> Iterator[sqlite3.Connection]:
+        """Conexión de solo lectura aparte: con WAL no bloquea al escritor mientras se itera."""
+        if self.in_memory:
+            conn = sqlite3.connect(self._uri, uri=True)
+            conn.execute("PRAGMA query_only=ON")
+        else:
+            conn = sqlite3.connect(f"{Path(self.db_path).resolve().as_uri()}?mode=ro", uri=True)
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    def iter_price_history(self, source: str = None, hours: int = 24) -> Iterator[Dict]:
+        """Como ``get_price_history`` pero fila a fila y con cada nivel tal como está guardado
+        (sin agregar los ticks recientes: ``export_data`` los exporta completos)."""
+        self.flush()
+        query, params = self._price_history_query(source, hours, None, "asc")
+        with self._read_connection() as conn:
+            for row in conn.execute(query, params):
+                yield self._price_dict(row)
+
+    def iter_trade_history(self, simulation: bool = None, hours: int = 24) -> Iterator[Dict]:
+        """Como ``get_trade_history`` pero fila a fila."""
+        yield from self._iter_rows(*self._history_query("trade_data", simulation, hours, None, "asc"))
+
+    def iter_portfolio_history(self, simulation: bool = None, hours: int = 24) -> Iterator[Dict]:
+        """Como ``get_portfolio_history`` pero fila a fila."""
+        yield from self._iter_rows(*self._history_query("portfolio_snapshots", simulation, hours, None, "asc"))
+
+    def _iter_rows(self, query: str, params: List[Any]) -> Iterator[Dict]:
+        self.flush()
+        with self._read_connection() as conn:
+            cursor = conn.execute(query, params)
+            columns = [desc[0] for desc in cursor.description]
+            for row in cursor:
+                yield dict(zip(columns, row))
+
+    def get_price_stats(self, hours: int = 24) -> Dict[str, Any]:
+        """Agregados de precios del período calculados en SQLite (sin cargar filas), incluyendo buckets agregados"""
+        self.flush()
+        try:
+            cutoff_time = time.time() - (hours * 3600)
+            tiers, _ = self._price_tiers_query(
+                "SELECT COUNT(*) AS n, MIN(price) AS lo, MAX(price) AS hi, SUM(price) AS total",
+                "SELECT SUM(tick_count), MIN(low), MAX(high), SUM(avg_price * tick_count)",
+            )
+            with self._transaction() as conn:
+                count, min_price, max_price, total = conn.execute(
+                    f"SELECT COALESCE(SUM(n), 0), MIN(lo), MAX(hi), SUM(total) FROM ({tiers})",
+                    [cutoff_time] * (1 + len(self._ROLLUPS)),
+                ).fetchone()
+            avg_price = total / count if count else None
+            return {"count": count, "min_price": min_price, "max_price": max_price, "avg_price": avg_price}
+        except Exception as e:
+            print(f"❌ Error obteniendo estadísticas de precios: {e}")
+            return {"count": 0, "min_price": None, "max_price": None, "avg_price": None}
+
+    def get_trade_stats(self, hours: int = 24) -> Dict[str, Any]:
+        """Agregados de trades del período calculados en SQLite"""
+        self.flush()
+        try:
+            cutoff_time = time.time() - (hours * 3600)
+            with self._transaction() as conn:
+                count, total_volume, sim_count = conn.execute("""
+                    SELECT COUNT(*), COALESCE(SUM(value_usd), 0), COALESCE(SUM(simulation), 0)
+                    FROM trade_data WHERE timestamp > ?
+                """, (cutoff_time,)).fetchone()
+            return {
+                "count": count,
+                "total_volume_usd": total_volume,
+                "simulation_count": sim_count,
+                "real_count": count - sim_count,
+            }
+        except Exception as e:
+            print(f"❌ Error obteniendo estadísticas de trades: {e}")
+            return {"count": 0, "total_volume_usd": 0.0, "simulation_count": 0, "real_count": 0}
+
+    def get_portfolio_stats(self, hours: int = 24) -> Dict[str, Any]:
+        """Agregados de snapshots del período: extremos y valores inicial/final"""
+        self.flush()
+        try:
+            cutoff_time = time.time() - (hours * 3600)
+            with self._transaction() as conn:
+                count, min_value, max_value = conn.execute("""
+                    SELECT COUNT(*), MIN(total_value_usd), MAX(total_value_usd)
+                    FROM portfolio_snapshots WHERE timestamp > ?
+                """, (cutoff_time,)).fetchone()
+                first = conn.execute("""
+                    SELECT total_value_usd FROM portfolio_snapshots
+                    WHERE timestamp > ? ORDER BY timestamp ASC LIMIT 1
+                """, (cutoff_time,)).fetchone()
+                last = conn.execute("""
+                    SELECT total_value_usd, realized_pnl, unrealized_pnl FROM portfolio_snapshots
+                    WHERE timestamp > ? ORDER BY timestamp DESC LIMIT 1
+                """, (cutoff_time,)).fetchone()
+            if not count:
+                return {"count": 0}
+            return {
+                "count": count,
+                "min_value": min_value,
+                "max_value": max_value,
+                "initial_value": first[0],
+                "final_value": last[0],
+                "realized_pnl": last[1],
+                "unrealized_pnl": last[2],
+            }
+        except Exception as e:
+            print(f"❌ Error obteniendo estadísticas del portfolio: {e}")
+            return {"count": 0}
     
     def get_statistics(self) -> Dict[str, Any]:
         """Obtiene estadísticas generales"""
+        self.flush()
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with self._transaction() as conn:
                 stats = {}
                 
                 # Estadísticas de precios
@@ -378,8 +878,15 @@ class DataManager:
                 portfolio_count = cursor.fetchone()[0]
                 stats["portfolio_snapshots"] = {"total_records": portfolio_count}
                 
-                # Tamaño de la base de datos
-                db_size = os.path.getsize(self.db_path)
+                # Tamaño de la base de datos (en WAL las filas recientes viven en el -wal)
+                if self.in_memory:
+                    page_count = conn.execute("PRAGMA page_count").fetchone()[0]
+                    db_size = page_count * conn.execute("PRAGMA page_size").fetchone()[0]
+                else:
+                    db_size = os.path.getsize(self.db_path)
+                    wal_path = f"{self.db_path}-wal"
+                    if os.path.exists(wal_path):
+                        db_size += os.path.getsize(wal_path)
                 stats["database"] = {
                     "file_size_mb": round(db_size / (1024 * 1024), 2),
                     "path": self.db_path
@@ -391,21 +898,35 @@ class DataManager:
             return {}
     
     def export_data(self, filepath: str, format: str = "json") -> bool:
-        """Exporta todos los datos a un archivo"""
+        """Exporta todos los datos a un archivo (los historiales se escriben en streaming)"""
         try:
-            data = {
+            if format.lower() != "json":
+                raise ValueError(f"Formato no soportado: {format}")
+            
+            hours = 24 * 30  # 30 días
+            header = {
                 "exported_at": datetime.now(tz=timezone.utc).isoformat(),
                 "statistics": self.get_statistics(),
-                "price_history": self.get_price_history(hours=24*30),  # 30 días
-                "trade_history": self.get_trade_history(hours=24*30),
-                "portfolio_history": self.get_portfolio_history(hours=24*30)
+            }
+            sections = {
+                "price_history": self.iter_price_history(hours=hours),
+                "trade_history": self.iter_trade_history(hours=hours),
+                "portfolio_history": self.iter_portfolio_history(hours=hours),
             }
             
-            if format.lower() == "json":
-                with open(filepath, 'w') as f:
-                    json.dump(data, f, indent=2, default=str)
-            else:
-                raise ValueError(f"Formato no soportado: {format}")
+            # Objeto JSON escrito a mano en tramos de EXPORT_CHUNK_ROWS filas: un solo dumps y
+            # un write por tramo, sin acumular el historial completo en memoria
+            with open(filepath, 'wb') as f:
+                f.write(_dump_bytes(header)[:-1])
+                for name, rows in sections.items():
+                    f.write(b',' + _dump_bytes(name) + b':[')
+                    sep = b''
+                    while chunk := list(islice(rows, EXPORT_CHUNK_ROWS)):
+                        # El tramo se serializa como lista y se le quitan los corchetes
+                        f.write(sep + _dump_bytes(chunk)[1:-1])
+                        sep = b','
+                    f.write(b']')
+                f.write(b'}')
             
             print(f"📤 Datos exportados a: {filepath}")
             return True
@@ -413,12 +934,59 @@ class DataManager:
             print(f"❌ Error exportando datos: {e}")
             return False
     
-    def cleanup_old_data(self, days: int = 30) -> bool:
-        """Limpia datos antiguos"""
+    def downsample_older_than(self, hours: float, bucket: str) -> int:
+        """
+        Agrega en velas OHLC de ``bucket`` ("5m" o "1h") los precios de más de ``hours``
+        horas de la tabla inmediatamente más fina, y los elimina de ella.
+        Solo se agregan buckets completos; devuelve el número de filas agregadas.
+        """
+        table, size, source_table = self._ROLLUPS[bucket]
+        # Alinear el corte al inicio de bucket para no partir velas
+        cutoff_time = (time.time() - hours * 3600) // size * size
+        ts_column = self._TIER_COLUMNS[source_table][0]
+        candles = self._candles_query(source_table, size, f"{ts_column} < ?")
+        self.flush()
+        try:
+            with self._transaction() as conn:
+                # Un solo INSERT ... SELECT ... GROUP BY; si el bucket ya existía (filas
+                # tardías), se fusiona con la vela previa
+                candle_count = conn.execute(f"""
+                    INSERT INTO {table} (bucket_start, source, open, high, low, close, avg_price, tick_count)
+                    SELECT * FROM ({candles}) WHERE true
+                    ON CONFLICT(bucket_start, source) DO UPDATE SET
+                        high = MAX(high, excluded.high),
+                        low = MIN(low, excluded.low),
+                        close = excluded.close,
+                        avg_price = (avg_price * tick_count + excluded.avg_price * excluded.tick_count)
+                                    / (tick_count + excluded.tick_count),
+                        tick_count = tick_count + excluded.tick_count
+                """, (cutoff_time,)).rowcount
+                rolled = conn.execute(f"DELETE FROM {source_table} WHERE {ts_column} < ?", (cutoff_time,)).rowcount
+            
+            if rolled:
+                print(f"🗜️  Downsampling {bucket}: {rolled} filas -> {candle_count} velas")
+            return rolled
+        except Exception as e:
+            print(f"❌ Error agregando precios ({bucket}): {e}")
+            return 0
+    
+    def cleanup_old_data(self, days: int = 30, raw_hours: Optional[float] = RAW_RETENTION_HOURS,
+                         hourly_after_hours: Optional[float] = HOURLY_AFTER_HOURS) -> bool:
+        """
+        Borra los datos de más de ``days`` días y compacta los precios más recientes.
+        Los ticks crudos de más de ``raw_hours`` horas pasan a velas de 5m, y éstas a 1h
+        tras ``hourly_after_hours`` (``None`` desactiva ese nivel). Un nivel que empezaría
+        después de ``days`` no se aplica: esas filas se borran tal cual.
+        """
+        retention_hours = days * 24
+        if raw_hours is not None and raw_hours < retention_hours:
+            self.downsample_older_than(hours=raw_hours, bucket="5m")
+        if hourly_after_hours is not None and hourly_after_hours < retention_hours:
+            self.downsample_older_than(hours=hourly_after_hours, bucket="1h")
         try:
             cutoff_time = time.time() - (days * 24 * 3600)
             
-            with sqlite3.connect(self.db_path) as conn:
+            with self._transaction() as conn:
                 # Contar registros antes
                 cursor = conn.execute("SELECT COUNT(*) FROM price_data WHERE timestamp < ?", (cutoff_time,))
                 old_price_count = cursor.fetchone()[0]
@@ -433,11 +1001,17 @@ class DataManager:
                 conn.execute("DELETE FROM price_data WHERE timestamp < ?", (cutoff_time,))
                 conn.execute("DELETE FROM trade_data WHERE timestamp < ?", (cutoff_time,))
                 conn.execute("DELETE FROM portfolio_snapshots WHERE timestamp < ?", (cutoff_time,))
-                
-                conn.commit()
-                
-                print(f"🧹 Limpieza completada - Eliminados {old_price_count} precios, {old_trade_count} trades, {old_portfolio_count} snapshots")
-                return True
+                for table, _, _ in self._ROLLUPS.values():
+                    conn.execute(f"DELETE FROM {table} WHERE bucket_start < ?", (cutoff_time,))
+            
+            # Estadísticas frescas para el planner y WAL truncado (fuera de la transacción)
+            with self._lock:
+                for table in ("price_data", "trade_data", "portfolio_snapshots"):
+                    self._conn.execute(f"ANALYZE {table}")
+                self._conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+            
+            print(f"🧹 Limpieza completada - Eliminados {old_price_count} precios, {old_trade_count} trades, {old_portfolio_count} snapshots")
+            return True
         except Exception as e:
             print(f"❌ Error limpiando datos: {e}")
             return False
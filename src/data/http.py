@@ -0,0 +1,76 @@
+"""Shared aiohttp session for the price feeds (Pyth Hermes, Jupiter) and Jupiter API calls."""
+
+import asyncio
+import atexit
+import json
+from typing import Any, Optional
+
+import aiohttp
+
+# orjson es opcional: decodifica las respuestas (quotes de varios KB) bastante más rápido
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+KEEPALIVE_TIMEOUT_SEC = 120
+
+# Una sola sesión keep-alive por proceso: evita un handshake TCP+TLS por petición
+_session: Optional[aiohttp.ClientSession] = None
+_session_loop: Optional[asyncio.AbstractEventLoop] = None
+
+
+async def get_session() -> aiohttp.ClientSession:
+    """Return the shared session, creating it lazily on the running loop.
+
+    A session is bound to the loop it was created on, so a new one is opened
+    when called from a different loop (e.g. successive ``asyncio.run`` calls).
+    """
+    global _session, _session_loop
+    loop = asyncio.get_running_loop()
+    if _session is None or _session.closed or _session_loop is not loop:
+        if _session is not None and not _session.closed:
+            _session.detach()  # pertenece a otro loop: no se puede cerrar desde aquí
+        _session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(
+                limit=64,
+                limit_per_host=16,  # pocos hosts (jup.ag, hermes): el pool es por host
+                ttl_dns_cache=300,
+                # Mayor que el intervalo de trading por defecto (60s): la conexión sigue viva entre ticks
+                keepalive_timeout=KEEPALIVE_TIMEOUT_SEC,
+            ),
+            timeout=aiohttp.ClientTimeout(total=5),
+        )
+        _session_loop = loop
+    return _session
+
+
+async def read_json(resp: aiohttp.ClientResponse) -> Any:
+    """Decode a JSON response body, with orjson when available.
+
+    Reads the raw bytes instead of ``resp.json()``, skipping aiohttp's
+    content-type check and text decoding. Invalid JSON raises ``ValueError``.
+    """
+    body = await resp.read()
+    return orjson.loads(body) if ORJSON_AVAILABLE else json.loads(body)
+
+
+async def close_session() -> None:
+    """Close the shared session (call before the event loop shuts down)."""
+    global _session, _session_loop
+    if _session is not None and not _session.closed:
+        await _session.close()
+    _session = None
+    _session_loop = None
+
+
+@atexit.register
+def _close_at_exit() -> None:
+    # Último recurso si nadie llamó a close_session(): cerrar si el loop sigue vivo
+    if _session is None or _session.closed:
+        return
+    if _session_loop is not None and not _session_loop.is_closed() and not _session_loop.is_running():
+        _session_loop.run_until_complete(_session.close())
+    else:
+        _session.detach()
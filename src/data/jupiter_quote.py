@@ -1,23 +1,47 @@
+import asyncio
+
 import aiohttp
 from typing import Optional
 
-JUPITER_PRICE_URL = "https://api.jup.ag/price/v2?ids=So11111111111111111111111111111111111111112"
+from .http import get_session, read_json
+from .ttl_cache import ttl_cached
+
+SOL_MINT = "So11111111111111111111111111111111111111112"
+USDC_MINT = "EPjFWdd5AufqSSqeM2qN1xzybapC8G4wEGGkZwyTDt1v"
+
+JUPITER_PRICE_URL = f"https://api.jup.ag/price/v2?ids={SOL_MINT}"
 
-async def fetch_sol_price() -> Optional[float]:
+@ttl_cached()
+async def fetch_sol_price(session: Optional[aiohttp.ClientSession] = None) -> Optional[float]:
     """Return the current SOL price reported by Jupiter.
 
+    Pass ``session`` to use a specific connection pool; otherwise the shared
+    keep-alive session from :mod:`src.data.http` is used. Results are reused
+    for ``PRICE_TTL_SEC`` (see :mod:`src.data.ttl_cache`).
+
     If the request fails (for instance due to missing network access) ``None``
-    is returned instead of raising an exception.
+    is returned instead of raising an exception; so is a malformed body.
     """
     try:
-        async with aiohttp.ClientSession() as session:
-            async with session.get(JUPITER_PRICE_URL) as resp:
-                if resp.status != 200:
-                    return None
-                data = await resp.json()
-                return float(
-                    data["data"]["So11111111111111111111111111111111111111112"]["price"]
-                )
-    except Exception:
+        return await _fetch_sol_price(session or await get_session())
+    except (aiohttp.ClientError, asyncio.TimeoutError, ValueError):
         # Network might be unavailable in certain environments.
+        # ValueError: cuerpo que no es JSON válido
+        return None
+
+
+async def _fetch_sol_price(session: aiohttp.ClientSession) -> Optional[float]:
+    async with session.get(JUPITER_PRICE_URL) as resp:
+        if resp.status != 200:
+            return None
+        data = await read_json(resp)
+    # Un cuerpo con otra forma (lista, null...) es una respuesta inválida, no un error
+    entries = data.get("data") if isinstance(data, dict) else None
+    entry = entries.get(SOL_MINT) if isinstance(entries, dict) else None
+    price = entry.get("price") if isinstance(entry, dict) else None
+    if price is None:
+        return None
+    try:
+        return float(price)
+    except (ValueError, TypeError):
         return None
@@ -7,6 +7,8 @@ import random
 import asyncio
 from typing import Optional
 
+import numpy as np
+
 
 class MockPriceFeed:
     """
@@ -17,15 +19,20 @@ class MockPriceFeed:
     Solo está permitido en tests unitarios.
     """
     
-    def __init__(self, base_price: float = 200.0, volatility: float = 0.02):
+    def __init__(self, base_price: float = 200.0, volatility: float = 0.02,
+                 delay: float = 0.01, seed: Optional[int] = None):
         """
         Args:
             base_price: Precio base alrededor del cual fluctuar
             volatility: Volatilidad (0.02 = 2%)
+            delay: Espera simulada de la API en ``get_price`` (0 para backtests)
+            seed: Semilla del generador de ``get_prices_batch``
         """
         self.base_price = base_price
         self.volatility = volatility
         self.current_price = base_price
+        self.delay = delay
+        self._rng = np.random.default_rng(seed)
         
         # Warning para que quede claro que es solo testing
         print("⚠️  MockPriceFeed inicializado - SOLO PARA TESTING")
@@ -38,7 +45,8 @@ class MockPriceFeed:
             Precio simulado realista
         """
         # Simular pequeño delay como API real
-        await asyncio.sleep(0.01)
+        if self.delay:
+            await asyncio.sleep(self.delay)
         
         # Movimiento browniano simple
         change_pct = random.gauss(0, self.volatility)
@@ -52,6 +60,18 @@ class MockPriceFeed:
         
         return round(self.current_price, 2)
     
+    def get_prices_batch(self, n: int) -> np.ndarray:
+        """
+        Genera ``n`` precios consecutivos de una vez (para backtests), continuando
+        desde ``current_price``. Los límites 0.5x-2x se aplican sobre la serie entera.
+        """
+        changes = self._rng.standard_normal(n) * self.volatility
+        prices = self.current_price * np.exp(np.cumsum(np.log1p(changes)))
+        np.clip(prices, self.base_price * 0.5, self.base_price * 2.0, out=prices)
+        if n:
+            self.current_price = float(prices[-1])
+        return np.round(prices, 2)
+    
     def reset_price(self, new_base: float = None):
         """Reset price para tests determinísticos"""
         if new_base:
@@ -1,18 +1,53 @@
+import asyncio
+
+import aiohttp
 from typing import Optional
-from pythclient.hermes import HermesClient
+
+from .http import get_session, read_json
+from .ttl_cache import ttl_cached
 
 # Pyth price feed ID for SOL/USD on mainnet
 SOL_FEED_ID = "J83mCTdkBStKF7yD1ewtg7d6cgt1YG11E9cujiFFJmD9"  # default feed id
 
-async def fetch_pyth_sol_price() -> Optional[float]:
-    """Fetch SOL/USD price from Pyth using Hermes HTTP endpoint."""
-    client = HermesClient([SOL_FEED_ID])
+# Mismo endpoint que pythclient.hermes.HermesClient, pero sobre la sesión compartida
+HERMES_LATEST_URL = "https://hermes.pyth.network/v2/updates/price/latest"
+
+
+@ttl_cached()
+async def fetch_pyth_sol_price(session: Optional[aiohttp.ClientSession] = None) -> Optional[float]:
+    """Fetch SOL/USD price from Pyth using Hermes HTTP endpoint.
+
+    The request goes through the shared keep-alive session from
+    :mod:`src.data.http` (or ``session`` when given), so it shares the
+    connection pool with the Jupiter requests. Results are reused for
+    ``PRICE_TTL_SEC`` (see :mod:`src.data.ttl_cache`). Network failures and
+    malformed bodies return ``None``.
+    """
     try:
-        prices = await client.get_all_prices(version=2)
-        feed = prices.get(SOL_FEED_ID)
-        if not feed:
-            return None
-        price = feed["price"].price * (10 ** feed["price"].expo)
-        return float(price)
-    except Exception:
+        return await _fetch_pyth_sol_price(session or await get_session())
+    except (aiohttp.ClientError, asyncio.TimeoutError, ValueError):
         return None
+
+
+async def _fetch_pyth_sol_price(session: aiohttp.ClientSession) -> Optional[float]:
+    params = {"ids[]": SOL_FEED_ID, "parsed": "true"}
+    async with session.get(HERMES_LATEST_URL, params=params) as resp:
+        if resp.status != 200:
+            return None
+        data = await read_json(resp)
+    # Un cuerpo con otra forma (lista, null...) es una respuesta inválida, no un error
+    feeds = data.get("parsed") if isinstance(data, dict) else None
+    for feed in feeds if isinstance(feeds, list) else ():
+        if not isinstance(feed, dict) or feed.get("id") != SOL_FEED_ID:
+            continue
+        price = feed.get("price")
+        if not isinstance(price, dict):
+            return None
+        raw, expo = price.get("price"), price.get("expo")
+        if raw is None or expo is None:
+            return None
+        try:
+            return float(int(raw) * (10 ** int(expo)))
+        except (ValueError, TypeError):
+            return None
+    return None
@@ -0,0 +1,57 @@
+"""Short-lived memoization for the async price fetchers."""
+
+import asyncio
+import functools
+import math
+import time
+from typing import Awaitable, Callable, Optional, TypeVar
+
+T = TypeVar("T")
+
+# SOL/USD apenas se mueve en medio segundo: dentro de este margen no se vuelve a pedir
+PRICE_TTL_SEC = 0.5
+
+
+def ttl_cached(ttl: float = PRICE_TTL_SEC) -> Callable[[Callable[..., Awaitable[Optional[T]]]],
+                                                       Callable[..., Awaitable[Optional[T]]]]:
+    """Memoize an async fetcher's last non-``None`` result for ``ttl`` seconds.
+
+    Callers that miss the cache while a refresh is running await that same
+    request (single-flight). Failures (``None``) are not cached. The wrapper
+    exposes ``cache_clear()``.
+
+    There is a single cached value per fetcher: the arguments are not part of
+    the key. They are meant for things like the ``session`` that only choose
+    the connection pool, so a call with another session reuses the cached
+    price (or the in-flight request started with the first session).
+    """
+    def decorator(fetch: Callable[..., Awaitable[Optional[T]]]) -> Callable[..., Awaitable[Optional[T]]]:
+        value: Optional[T] = None
+        stamp = -math.inf
+        task: Optional[asyncio.Task] = None
+
+        def _store(done: asyncio.Task) -> None:
+            nonlocal value, stamp
+            # Se guarda aunque quien lanzó la petición ya no la espere
+            if not done.cancelled() and done.exception() is None and done.result() is not None:
+                value, stamp = done.result(), time.monotonic()
+
+        @functools.wraps(fetch)
+        async def wrapper(*args, **kwargs) -> Optional[T]:
+            nonlocal task
+            if value is not None and time.monotonic() - stamp < ttl:
+                return value
+            if task is None or task.done() or task.get_loop() is not asyncio.get_running_loop():
+                task = asyncio.ensure_future(fetch(*args, **kwargs))
+                task.add_done_callback(_store)
+            # shield: cancelar a un llamador no cancela la petición compartida
+            return await asyncio.shield(task)
+
+        def cache_clear() -> None:
+            nonlocal value, stamp
+            value, stamp = None, -math.inf
+
+        wrapper.cache_clear = cache_clear
+        return wrapper
+
+    return decorator
@@ -2,15 +2,53 @@
 Trading capital management to control investment amounts and risk.
 """
 
+import asyncio
+import time
 from dataclasses import dataclass
-from typing import Dict, Optional
+from typing import Dict, List, Optional, Tuple
 from solders.keypair import Keypair
+from solders.pubkey import Pubkey
 from solana.rpc.async_api import AsyncClient
 from solana.rpc.commitment import Confirmed
+from solana.rpc.types import DataSliceOpts
 from src.config import settings
+from .portfolio import TradeValidation
 
+# El saldo solo cambia al liquidar un trade: entre swaps basta con un snapshot reciente
+BALANCE_TTL_SEC = 2.0
 
-@dataclass
+# Se incrementa tras cada swap; un snapshot de una época anterior se descarta
+_balance_epoch = 0
+
+
+def invalidate_balances() -> None:
+    """Discard every manager's cached wallet balance (call after a swap)."""
+    global _balance_epoch
+    _balance_epoch += 1
+
+
+# Límite de getMultipleAccounts por petición
+MAX_ACCOUNTS_PER_REQUEST = 100
+# Solo interesan los lamports: no se descarga el contenido de las cuentas
+_NO_ACCOUNT_DATA = DataSliceOpts(offset=0, length=0)
+
+
+async def get_balances_batch(client: AsyncClient, pubkeys: List[Pubkey]) -> Dict[Pubkey, float]:
+    """Fetch the SOL balance of several wallets with ``getMultipleAccounts``.
+
+    One RPC round-trip per ``MAX_ACCOUNTS_PER_REQUEST`` pubkeys instead of one
+    ``getBalance`` per wallet. Accounts that do not exist report ``0.0``.
+    """
+    balances: Dict[Pubkey, float] = {}
+    for start in range(0, len(pubkeys), MAX_ACCOUNTS_PER_REQUEST):
+        chunk = pubkeys[start:start + MAX_ACCOUNTS_PER_REQUEST]
+        response = await client.get_multiple_accounts(chunk, commitment=Confirmed, data_slice=_NO_ACCOUNT_DATA)
+        for pk, account in zip(chunk, response.value):
+            balances[pk] = account.lamports / 1e9 if account is not None else 0.0
+    return balances
+
+
+@dataclass(slots=True)
 class CapitalStatus:
     """Status of trading capital allocation."""
     total_wallet_balance: float
@@ -35,6 +73,45 @@ class TradingCapitalManager:
         self.trading_capital = settings.trading_capital_sol
         self.max_position_size_pct = settings.max_position_size_pct
         self.reserve_balance = settings.reserve_balance_sol
+        # (saldo SOL, time.monotonic(), época) de la última consulta RPC
+        self._balance_cache: Optional[Tuple[float, float, int]] = None
+        self._balance_ttl = BALANCE_TTL_SEC
+        self._balance_lock = asyncio.Lock()
+
+    # Derivados de la configuración: se calculan al leerlos, así siguen cualquier
+    # cambio de trading_capital, max_position_size_pct o reserve_balance
+    @property
+    def _max_position_sol(self) -> float:
+        return self.trading_capital * (self.max_position_size_pct / 100.0)
+
+    @property
+    def _min_wallet_needed(self) -> float:
+        return self.trading_capital + self.reserve_balance
+
+    def invalidate_balance(self) -> None:
+        """Force the next status query to hit the RPC."""
+        self._balance_cache = None
+
+    def _cached_balance(self) -> Optional[float]:
+        cached = self._balance_cache
+        if cached is None or cached[2] != _balance_epoch or time.monotonic() - cached[1] >= self._balance_ttl:
+            return None
+        return cached[0]
+
+    async def get_wallet_balance(self) -> float:
+        """Wallet balance in SOL, reused for ``BALANCE_TTL_SEC`` until the next swap."""
+        balance = self._cached_balance()
+        if balance is not None:
+            return balance
+        # Single-flight: las consultas concurrentes esperan a la misma llamada RPC
+        async with self._balance_lock:
+            balance = self._cached_balance()
+            if balance is None:
+                epoch = _balance_epoch
+                response = await self.client.get_balance(self.keypair.pubkey(), commitment=Confirmed)
+                balance = response.value / 1e9  # Convert lamports to SOL
+                self._balance_cache = (balance, time.monotonic(), epoch)
+            return balance
         
     async def get_capital_status(self, current_sol_position: float = 0.0, current_price: float = 0.0) -> CapitalStatus:
         """
@@ -46,8 +123,7 @@ class TradingCapitalManager:
         """
         try:
             # Get actual wallet balance
-            response = await self.client.get_balance(self.keypair.pubkey(), commitment=Confirmed)
-            total_balance = response.value / 1e9  # Convert lamports to SOL
+            total_balance = await self.get_wallet_balance()
             
             # Calculate current position value in SOL equivalent
             current_position_value = current_sol_position
@@ -67,9 +143,9 @@ class TradingCapitalManager:
             elif available_capital <= 0:
                 can_trade = False
                 reason = "Trading capital fully allocated"
-            elif total_balance < (self.trading_capital + self.reserve_balance):
+            elif total_balance < self._min_wallet_needed:
                 can_trade = False
-                reason = f"Insufficient wallet balance (need {self.trading_capital + self.reserve_balance} SOL total)"
+                reason = f"Insufficient wallet balance (need {self._min_wallet_needed} SOL total)"
             
             # Calculate position size percentage
             position_size_pct = (used_capital / self.trading_capital * 100) if self.trading_capital > 0 else 0
@@ -107,18 +183,16 @@ class TradingCapitalManager:
         Returns:
             Position size in SOL
         """
-        # Base position size as percentage of trading capital
-        base_position_pct = min(self.max_position_size_pct, 100.0) / 100.0
-        
-        # Adjust by signal strength
-        adjusted_position_pct = base_position_pct * max(0.0, min(1.0, signal_strength))
+        # Adjust base position size (fraction of trading capital) by signal strength
+        base_position_frac = min(self.max_position_size_pct, 100.0) / 100.0
+        adjusted_position_pct = base_position_frac * max(0.0, min(1.0, signal_strength))
         
         # Calculate position size in SOL
         position_size = self.trading_capital * adjusted_position_pct
         
         return position_size
     
-    def validate_trade_size(self, trade_size_sol: float, current_position: float = 0.0) -> Dict[str, any]:
+    def validate_trade_size(self, trade_size_sol: float, current_position: float = 0.0) -> TradeValidation:
         """
         Validate if a trade size is within capital limits.
         
@@ -127,43 +201,66 @@ class TradingCapitalManager:
             current_position: Current SOL position
             
         Returns:
-            Dict with validation result
+            TradeValidation with the result
         """
+        max_position = self._max_position_sol
+        # Un solo límite (min de capital y tamaño máximo) en vez de dos comprobaciones
+        limit = min(self.trading_capital, max_position)
+        
         # Calculate what position would be after trade
         new_position = abs(current_position + trade_size_sol)
+        if new_position <= limit:
+            return TradeValidation(True, "Trade size is valid", max_position, trade_size_sol)
         
-        # Check against trading capital
-        if new_position > self.trading_capital:
-            return {
-                "valid": False,
-                "reason": f"Trade would exceed trading capital ({new_position:.4f} > {self.trading_capital:.4f} SOL)",
-                "max_allowed": self.trading_capital - abs(current_position),
-                "suggested_size": max(0, self.trading_capital - abs(current_position))
-            }
-        
-        # Check against max position size
-        max_allowed = self.trading_capital * (self.max_position_size_pct / 100.0)
-        if new_position > max_allowed:
-            return {
-                "valid": False,
-                "reason": f"Trade would exceed max position size ({new_position:.4f} > {max_allowed:.4f} SOL)",
-                "max_allowed": max_allowed - abs(current_position),
-                "suggested_size": max(0, max_allowed - abs(current_position))
-            }
-        
-        return {
-            "valid": True,
-            "reason": "Trade size is valid",
-            "max_allowed": max_allowed,
-            "suggested_size": trade_size_sol
-        }
+        # El motivo solo se formatea cuando el trade se rechaza
+        label = "trading capital" if limit == self.trading_capital else "max position size"
+        headroom = limit - abs(current_position)
+        return TradeValidation(
+            False,
+            f"Trade would exceed {label} ({new_position:.4f} > {limit:.4f} SOL)",
+            headroom,
+            max(0.0, headroom),
+        )
     
     def get_capital_summary(self) -> Dict[str, float]:
         """Get summary of capital configuration."""
         return {
             "trading_capital_sol": self.trading_capital,
             "max_position_size_pct": self.max_position_size_pct,
-            "max_position_size_sol": self.trading_capital * (self.max_position_size_pct / 100.0),
+            "max_position_size_sol": self._max_position_sol,
             "reserve_balance_sol": self.reserve_balance,
-            "min_wallet_balance_needed": self.trading_capital + self.reserve_balance
-        }
\ No newline at end of file
+            "min_wallet_balance_needed": self._min_wallet_needed
+        }
+
+
+class CapitalManagerRegistry:
+    """Refresh the wallet balance of several managers with a single RPC call."""
+
+    def __init__(self):
+        self._managers: List[TradingCapitalManager] = []
+
+    def register(self, manager: TradingCapitalManager) -> TradingCapitalManager:
+        if manager not in self._managers:
+            self._managers.append(manager)
+        return manager
+
+    def unregister(self, manager: TradingCapitalManager) -> None:
+        if manager in self._managers:
+            self._managers.remove(manager)
+
+    async def refresh(self) -> Dict[Pubkey, float]:
+        """Fetch every registered wallet at once and prime each manager's balance cache."""
+        # Agrupar por cliente RPC: cada cliente puede apuntar a un endpoint distinto
+        by_client: Dict[int, List[TradingCapitalManager]] = {}
+        for manager in self._managers:
+            by_client.setdefault(id(manager.client), []).append(manager)
+
+        balances: Dict[Pubkey, float] = {}
+        for managers in by_client.values():
+            epoch = _balance_epoch
+            pubkeys = list(dict.fromkeys(m.keypair.pubkey() for m in managers))
+            balances.update(await get_balances_batch(managers[0].client, pubkeys))
+            now = time.monotonic()
+            for manager in managers:
+                manager._balance_cache = (balances[manager.keypair.pubkey()], now, epoch)
+        return balances
\ No newline at end of file
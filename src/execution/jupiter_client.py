@@ -1,40 +1,78 @@
 import aiohttp
-from typing import Optional, Dict
+from functools import lru_cache
+from typing import Optional, Dict, Tuple
+from urllib.parse import urlencode
+from yarl import URL
 from ..config import settings
+from ..data.http import get_session, read_json
 from .simulation_client import simulator
 
 
 API_URL = "https://quote-api.jup.ag/v6/quote"
 
+class QuoteRequester:
+    """Jupiter quotes for a fixed pair and slippage; only ``amount`` varies.
+
+    The query string is encoded once, so each request just appends the amount.
+    """
+
+    def __init__(self, input_mint: str, output_mint: str, slippage_bps: int = 50):
+        self.input_mint = input_mint
+        self.output_mint = output_mint
+        self.slippage_bps = slippage_bps
+        fixed = urlencode({"inputMint": input_mint, "outputMint": output_mint, "slippageBps": slippage_bps})
+        self._url_prefix = f"{API_URL}?{fixed}&amount="
+        self._headers = {"apikey": settings.jupiter_api_key} if settings.jupiter_api_key else {}
+
+    def url(self, amount: int) -> URL:
+        # encoded=True: la URL ya está codificada, yarl no la vuelve a procesar
+        return URL(self._url_prefix + str(int(amount)), encoded=True)
+
+    async def quote(self, amount: int, session: Optional[aiohttp.ClientSession] = None) -> Optional[Dict]:
+        """Fetch a quote for ``amount`` (smallest units); ``None`` on failure."""
+        try:
+            return await _get_quote(session or await get_session(), self.url(amount), self._headers)
+        except Exception:
+            # Network access might not be available in some environments.
+            return None
+
+
+@lru_cache(maxsize=16)
+def quote_requester(input_mint: str, output_mint: str, slippage_bps: int = 50) -> QuoteRequester:
+    """Shared :class:`QuoteRequester` per (pair, slippage)."""
+    return QuoteRequester(input_mint, output_mint, slippage_bps)
+
+
 async def request_quote(
     input_mint: str,
     output_mint: str,
     amount: int,
     slippage_bps: int = 50,
+    session: Optional[aiohttp.ClientSession] = None,
 ) -> Optional[Dict]:
     """Fetch a swap quote from the Jupiter aggregator.
 
+    Pass ``session`` to use a specific connection pool; otherwise the shared
+    keep-alive session from :mod:`src.data.http` is used.
+
     Returns the JSON response with route information or ``None`` if the
     request fails (for example due to missing network access).
     """
-    params = {
-        "inputMint": input_mint,
-        "outputMint": output_mint,
-        "amount": amount,
-        "slippageBps": slippage_bps,
-    }
-    headers = {}
-    if settings.jupiter_api_key:
-        headers["apikey"] = settings.jupiter_api_key
-    try:
-        async with aiohttp.ClientSession() as session:
-            async with session.get(API_URL, params=params, headers=headers) as resp:
-                if resp.status != 200:
-                    return None
-                return await resp.json()
-    except Exception:
-        # Network access might not be available in some environments.
-        return None
+    return await quote_requester(input_mint, output_mint, slippage_bps).quote(amount, session)
+
+
+async def _get_quote(session: aiohttp.ClientSession, url: URL, headers: Dict) -> Optional[Dict]:
+    async with session.get(url, headers=headers) as resp:
+        if resp.status != 200:
+            return None
+        return await read_json(resp)
+
+
+def swap_mints(side: str) -> Tuple[str, str]:
+    """Return ``(input_mint, output_mint)`` for a BUY or SELL of the base token."""
+    if side.upper() == "BUY":
+        return settings.quote_mint, settings.base_mint
+    return settings.base_mint, settings.quote_mint
 
 
 async def execute_swap(quote: Dict) -> bool:
@@ -44,26 +82,29 @@ async def execute_swap(quote: Dict) -> bool:
     return False
 
 
-async def execute_trade(side: str, amount_sol: float, price: float) -> bool:
+async def execute_trade(side: str, amount_sol: float, price: float,
+                        session: Optional[aiohttp.ClientSession] = None) -> bool:
     """Execute a BUY or SELL trade either simulated or on-chain."""
     if settings.simulation_mode and simulator:
         result = simulator.simulate_trade(side.upper(), amount_sol, price)
         return result.get("success", False)
 
     amount_lamports = int(amount_sol * 1_000_000_000)
-    if side.upper() == "BUY":
-        input_mint = settings.quote_mint
-        output_mint = settings.base_mint
-    else:
-        input_mint = settings.base_mint
-        output_mint = settings.quote_mint
+    input_mint, output_mint = swap_mints(side)
 
     quote = await request_quote(
         input_mint=input_mint,
         output_mint=output_mint,
         amount=amount_lamports,
         slippage_bps=settings.slippage_bps,
+        session=session,
     )
     if not quote:
         return False
-    return await execute_swap(quote)
+    try:
+        return await execute_swap(quote)
+    finally:
+        # Haya salido o no, el swap puede haber movido el saldo (al menos las fees);
+        # import diferido: capital_manager arrastra el cliente RPC de solana
+        from .capital_manager import invalidate_balances
+        invalidate_balances()
@@ -1,10 +1,19 @@
-from dataclasses import dataclass
-from typing import Dict, Optional
+from dataclasses import dataclass, field
+from typing import Any, Dict, NamedTuple, Optional
+import numpy as np
 from src.config import settings
 from .simulation_client import simulator
 
 
-@dataclass
+class TradeValidation(NamedTuple):
+    """Result of a trade size validation (a plain tuple: no dict per call)."""
+    valid: bool
+    reason: str
+    max_allowed: float
+    suggested_size: float
+
+
+@dataclass(slots=True)
 class Portfolio:
     """Trading portfolio tracker with capital management."""
 
@@ -17,11 +26,21 @@ class Portfolio:
     # Capital management
     trading_capital: float = 0.0
     allocated_capital: float = 0.0
+
+    # Cache de as_dict(): se reconstruye solo cuando cambia _version
+    _version: int = field(default=0, init=False, repr=False, compare=False)
+    _snapshot: Optional[Dict] = field(default=None, init=False, repr=False, compare=False)
+    _snapshot_version: int = field(default=-1, init=False, repr=False, compare=False)
+    # Simulador activo (TradingSimulator o su proxy perezoso; None en modo real),
+    # fijado al crear el portfolio
+    _sim: Any = field(default=None, init=False, repr=False, compare=False)
     
     def __post_init__(self) -> None:
         """Initialize portfolio with trading capital configuration."""
         # Set trading capital from config
         self.trading_capital = settings.trading_capital_sol
+        # Se lee una vez: los métodos de cada tick no consultan settings
+        self._sim = simulator if settings.simulation_mode else None
 
         # Initialize balances only if not provided
         if self.quote_balance == 0.0:
@@ -31,9 +50,13 @@ class Portfolio:
 
     def update_from_trade(self, side: str, quantity: float, price: float, fee: float = 0.0) -> None:
         """Update balances after executing a trade."""
-        if settings.simulation_mode and simulator:
+        self._version += 1
+        if side != "BUY" and side != "SELL":
+            side = side.upper()
+        sim = self._sim
+        if sim is not None:
             # En modo simulación, usar el simulador
-            result = simulator.simulate_trade(side, quantity, price)
+            result = sim.simulate_trade(side, quantity, price)
             if result["success"]:
                 # Actualizar balance local desde simulador
                 self.quote_balance = result["new_balance_sol"]
@@ -44,13 +67,31 @@ class Portfolio:
             return
         
         # Modo real - actualizar balances normalmente
-        if side.upper() == "BUY":
+        if side == "BUY":
             self.base_balance += quantity
             self.quote_balance -= quantity * price + fee
-        elif side.upper() == "SELL":
+        elif side == "SELL":
             self.base_balance -= quantity
             self.quote_balance += quantity * price - fee
 
+    def update_price(self, price: float) -> None:
+        """Propagate the latest market price (unrealized P&L in simulation mode)."""
+        sim = self._sim
+        if sim is not None and sim.update_current_price(price):
+            self._version += 1
+
+    @property
+    def snapshot(self) -> Dict[str, float]:
+        """Cached ``as_dict()``, rebuilt only after ``update_from_trade``/``update_price``.
+
+        The returned dict is shared between calls and must not be mutated.
+        Balances assigned directly bypass the cache; use ``as_dict()`` then.
+        """
+        if self._snapshot is None or self._snapshot_version != self._version:
+            self._snapshot = self.as_dict()
+            self._snapshot_version = self._version
+        return self._snapshot
+
     @property
     def value_usd(self) -> float:
         """Return portfolio value in USD based on quote balance only."""
@@ -60,6 +101,10 @@ class Portfolio:
         """Return portfolio value including base asset priced in USD."""
         return self.quote_balance + self.base_balance * price
 
+    def total_value_series(self, prices: np.ndarray) -> np.ndarray:
+        """``total_value`` for every price in ``prices`` with the current balances."""
+        return self.quote_balance + self.base_balance * np.asarray(prices, dtype=np.float64)
+
     def get_position_value_sol(self) -> float:
         """Get current position value in SOL terms."""
         return self.base_balance
@@ -69,37 +114,37 @@ class Portfolio:
         used_capital = self.get_position_value_sol()
         return max(0, self.trading_capital - used_capital)
     
-    def calculate_max_trade_size(self, max_position_pct: float = None) -> float:
+    @property
+    def _max_position_sol(self) -> float:
+        # Se calcula al leerlo: trading_capital es un campo público y puede cambiar
+        return self.trading_capital * (settings.max_position_size_pct / 100.0)
+
+    def calculate_max_trade_size(self, max_position_pct: Optional[float] = None) -> float:
         """Calculate maximum trade size based on capital limits."""
         if max_position_pct is None:
-            max_position_pct = settings.max_position_size_pct
-        
-        max_position_sol = self.trading_capital * (max_position_pct / 100.0)
+            max_position_sol = self._max_position_sol
+        else:
+            max_position_sol = self.trading_capital * (max_position_pct / 100.0)
         current_position = abs(self.base_balance)
         
         return max(0, max_position_sol - current_position)
     
-    def validate_trade_size(self, trade_size_sol: float) -> Dict[str, any]:
+    def validate_trade_size(self, trade_size_sol: float) -> TradeValidation:
         """Validate if trade size is within capital limits."""
         current_position = abs(self.base_balance)
         new_position = current_position + abs(trade_size_sol)
-        
-        if new_position > self.trading_capital:
-            return {
-                "valid": False,
-                "reason": f"Exceeds trading capital ({new_position:.4f} > {self.trading_capital:.4f} SOL)",
-                "max_allowed": self.trading_capital - current_position
-            }
-        
-        max_position = self.trading_capital * (settings.max_position_size_pct / 100.0)
-        if new_position > max_position:
-            return {
-                "valid": False,
-                "reason": f"Exceeds max position size ({new_position:.4f} > {max_position:.4f} SOL)",
-                "max_allowed": max_position - current_position
-            }
-        
-        return {"valid": True, "reason": "Trade size valid"}
+        # Un solo límite: el menor entre capital y tamaño máximo de posición
+        limit = min(self.trading_capital, self._max_position_sol)
+        headroom = limit - current_position
+        if new_position <= limit:
+            return TradeValidation(True, "Trade size valid", headroom, trade_size_sol)
+        reason = "Exceeds trading capital" if limit == self.trading_capital else "Exceeds max position size"
+        return TradeValidation(
+            False,
+            f"{reason} ({new_position:.4f} > {limit:.4f} SOL)",
+            headroom,
+            max(0.0, headroom),
+        )
 
     def as_dict(self) -> Dict[str, float]:
         base_dict = {
@@ -112,8 +157,8 @@ class Portfolio:
         }
         
         # Agregar información de simulación si está activa
-        if settings.simulation_mode and simulator:
-            sim_status = simulator.get_portfolio_status()
+        if self._sim is not None:
+            sim_status = self._sim.get_portfolio_status()
             base_dict.update({
                 "simulation_mode": True,
                 "realized_pnl": sim_status["realized_pnl"],
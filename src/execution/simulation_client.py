@@ -3,15 +3,37 @@ Simulador de trading que no ejecuta transacciones reales.
 Simula operaciones y tracking de P&L sin tocar la blockchain.
 """
 
+import logging
 import time
-from typing import Dict, List, Optional, Tuple
-from dataclasses import dataclass, asdict
+from typing import BinaryIO, Dict, List, Optional, Tuple, Union
+from dataclasses import dataclass, field
 from datetime import datetime
 import json
+import numpy as np
 from ..config import settings
 
+# Logger "bot" sin reconfigurar: setup_logger() lo llama quien arranca el proceso (TradingBot)
+logger = logging.getLogger("bot")
 
-@dataclass
+# orjson es opcional: el log de simulación se serializa e indenta en C
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+# Slippage simulado: rango en % y tamaño del lote de sorteos precalculados
+SLIPPAGE_RANGE_PCT = (0.1, 0.5)
+SLIPPAGE_BATCH = 4096
+
+# Cambios de precio menores que esto no recalculan el P&L no realizado
+PRICE_EPSILON = 1e-9
+
+# Capacidad inicial del TradeLog: una sesión normal no llega a duplicarlo
+TRADE_LOG_CAPACITY = 4096
+
+
+@dataclass(slots=True)
 class SimulatedTrade:
     """Representa una operación simulada"""
     timestamp: float
@@ -21,9 +43,73 @@ class SimulatedTrade:
     value_usd: float
     fees_sol: float = 0.0
     slippage_pct: float = 0.0
+
+
+# Lado de cada trade guardado como uint8 (índice en esta tupla)
+_TRADE_SIDES = ("BUY", "SELL")
+_TRADE_COLUMNS = (
+    ("timestamp", np.float64),
+    ("side", np.uint8),
+    ("amount_sol", np.float64),
+    ("price", np.float64),
+    ("value_usd", np.float64),
+    ("fees_sol", np.float64),
+    ("slippage_pct", np.float64),
+)
+
+
+class TradeLog:
+    """Trades simulados por columnas (structure-of-arrays).
+
+    Cada campo de ``SimulatedTrade`` es un array NumPy contiguo que crece
+    duplicando su capacidad. ``len``, el índice y la iteración devuelven
+    ``SimulatedTrade`` como la lista anterior; ``column`` da la vista de un campo.
+    """
+
+    def __init__(self, capacity: int = TRADE_LOG_CAPACITY):
+        self._n = 0
+        self._cols: Dict[str, np.ndarray] = {name: np.empty(capacity, dtype) for name, dtype in _TRADE_COLUMNS}
+
+    def append(self, trade: Dict) -> None:
+        n = self._n
+        if n == len(self._cols["timestamp"]):
+            for name, col in self._cols.items():
+                grown = np.empty(2 * len(col), col.dtype)
+                grown[:n] = col
+                self._cols[name] = grown
+        for name, col in self._cols.items():
+            col[n] = trade[name] if name != "side" else _TRADE_SIDES.index(trade["side"])
+        self._n = n + 1
+
+    def column(self, name: str) -> np.ndarray:
+        """Vista (sin copia) de un campo para agregados vectorizados"""
+        return self._cols[name][: self._n]
+
+    def to_dicts(self) -> List[Dict]:
+        """Trades como dicts con las claves de ``SimulatedTrade``"""
+        names = [name for name, _ in _TRADE_COLUMNS]
+        columns = [self.column(name).tolist() for name in names]
+        columns[1] = [_TRADE_SIDES[side] for side in columns[1]]
+        return [dict(zip(names, row)) for row in zip(*columns)]
+
+    def __len__(self) -> int:
+        return self._n
+
+    def __getitem__(self, i: int) -> SimulatedTrade:
+        if i < 0:
+            i += self._n
+        if not 0 <= i < self._n:
+            raise IndexError("trade index out of range")
+        row = {name: self._cols[name][i].item() for name, _ in _TRADE_COLUMNS}
+        row["side"] = _TRADE_SIDES[row["side"]]
+        return SimulatedTrade(**row)
+
+    def __iter__(self):
+        for row in self.to_dicts():
+            yield SimulatedTrade(**row)
     
 
-@dataclass
+@dataclass(slots=True)
 class SimulatedPosition:
     """Representa una posición simulada"""
     entry_timestamp: float
@@ -31,11 +117,30 @@ class SimulatedPosition:
     amount_sol: float
     current_price: float = 0.0
     unrealized_pnl: float = 0.0
+    # Coste acumulado (USD) de la posición abierta: entry_price = cost_usd / amount_sol
+    cost_usd: float = field(default=0.0, init=False, repr=False, compare=False)
+
+    def __post_init__(self):
+        self.cost_usd = self.entry_price * self.amount_sol
     
-    def update_price(self, new_price: float):
-        """Actualiza precio actual y P&L no realizado"""
+    def update_price(self, new_price: float) -> bool:
+        """Actualiza precio actual y P&L no realizado; ``False`` si el precio no cambió"""
+        # Los feeds cacheados repiten el mismo precio entre ticks: nada que recalcular
+        if abs(new_price - self.current_price) < PRICE_EPSILON:
+            return False
         self.current_price = new_price
         self.unrealized_pnl = (new_price - self.entry_price) * self.amount_sol
+        return True
+
+    def as_dict(self) -> Dict:
+        """Dict plano con los campos (sin la copia recursiva de ``asdict``)"""
+        return {
+            "entry_timestamp": self.entry_timestamp,
+            "entry_price": self.entry_price,
+            "amount_sol": self.amount_sol,
+            "current_price": self.current_price,
+            "unrealized_pnl": self.unrealized_pnl,
+        }
 
 
 class TradingSimulator:
@@ -44,20 +149,30 @@ class TradingSimulator:
     Simula todas las operaciones con datos virtuales.
     """
     
-    def __init__(self, initial_balance: float = None):
+    def __init__(self, initial_balance: Optional[float] = None, seed: Optional[int] = None):
         self.initial_balance = initial_balance or settings.simulation_initial_balance
+        # Modo simulación fijado al crear el simulador (no se relee en cada trade)
+        self._sim_mode = settings.simulation_mode
         self.sol_balance = self.initial_balance
         self.usd_balance = 0.0
         
-        self.trades: List[SimulatedTrade] = []
+        self.trades = TradeLog()
         self.position: Optional[SimulatedPosition] = None
         
         self.total_fees_paid = 0.0
         self.realized_pnl = 0.0
         self.start_time = time.time()
         
-        from src.utils.logger import setup_logger
-        logger = setup_logger()
+        # Sorteos de slippage por lotes: un acceso a array por trade en vez de random.uniform
+        self._rng = np.random.default_rng(seed)
+        self._slip_buf = self._rng.uniform(*SLIPPAGE_RANGE_PCT, size=SLIPPAGE_BATCH)
+        self._slip_i = 0
+        
+        # Base en USD para total_return_pct: balance inicial valorado al precio del primer fill
+        self._return_ref_usd: Optional[float] = None
+        # Status cacheado; se invalida con cada trade o actualización de precio
+        self._status: Optional[Dict] = None
+        
         logger.info(f"🎮 MODO SIMULACIÓN ACTIVADO")
         logger.info(f"💰 Balance inicial: {self.initial_balance:.4f} SOL")
         logger.warning(f"⚠️  NO SE EJECUTARÁN TRANSACCIONES REALES")
@@ -75,16 +190,16 @@ class TradingSimulator:
             Dict con resultado de la simulación
         """
         
-        if not settings.simulation_mode:
+        if not self._sim_mode:
             raise Exception("⚠️ NO SE PUEDE SIMULAR - Modo simulación desactivado")
+        self._status = None
             
         # Simular fees (0.25% típico)
         fee_rate = 0.0025
         fees_sol = amount_sol * fee_rate
         
         # Simular slippage (random entre 0.1% - 0.5%)
-        import random
-        slippage_pct = random.uniform(0.1, 0.5)
+        slippage_pct = self._next_slippage()
         
         if side == "BUY":
             return self._simulate_buy(amount_sol, price, fees_sol, slippage_pct)
@@ -93,6 +208,15 @@ class TradingSimulator:
         else:
             raise ValueError(f"Lado inválido: {side}")
     
+    def _next_slippage(self) -> float:
+        """Siguiente slippage (%) del lote precalculado; se rellena al agotarse"""
+        if self._slip_i == SLIPPAGE_BATCH:
+            self._slip_buf = self._rng.uniform(*SLIPPAGE_RANGE_PCT, size=SLIPPAGE_BATCH)
+            self._slip_i = 0
+        slippage_pct = float(self._slip_buf[self._slip_i])
+        self._slip_i += 1
+        return slippage_pct
+    
     def _simulate_buy(self, amount_sol: float, price: float, fees_sol: float, slippage_pct: float) -> Dict:
         """Simula una compra"""
         
@@ -108,6 +232,8 @@ class TradingSimulator:
         # Aplicar slippage al precio (peor precio en compra)
         actual_price = price * (1 + slippage_pct / 100)
         value_usd = amount_sol * actual_price
+        if self._return_ref_usd is None:
+            self._return_ref_usd = self.initial_balance * actual_price
         
         # Actualizar balances virtuales
         self.sol_balance -= total_cost
@@ -115,42 +241,42 @@ class TradingSimulator:
         self.total_fees_paid += fees_sol
         
         # Crear trade simulado
-        trade = SimulatedTrade(
-            timestamp=time.time(),
-            side="BUY",
-            amount_sol=amount_sol,
-            price=actual_price,
-            value_usd=value_usd,
-            fees_sol=fees_sol,
-            slippage_pct=slippage_pct
-        )
+        trade: Dict = {
+            "timestamp": time.time(),
+            "side": "BUY",
+            "amount_sol": amount_sol,
+            "price": actual_price,
+            "value_usd": value_usd,
+            "fees_sol": fees_sol,
+            "slippage_pct": slippage_pct
+        }
         self.trades.append(trade)
         
         # Crear/actualizar posición
         if self.position is None:
             self.position = SimulatedPosition(
-                entry_timestamp=trade.timestamp,
+                entry_timestamp=trade["timestamp"],
                 entry_price=actual_price,
                 amount_sol=amount_sol,
                 current_price=actual_price
             )
         else:
-            # Promedio ponderado si ya hay posición
-            total_amount = self.position.amount_sol + amount_sol
-            avg_price = ((self.position.entry_price * self.position.amount_sol) + 
-                        (actual_price * amount_sol)) / total_amount
-            
-            self.position.amount_sol = total_amount
-            self.position.entry_price = avg_price
-            self.position.current_price = actual_price
+            # Promedio ponderado si ya hay posición (coste acumulado, sin recalcular entry*amount)
+            position = self.position
+            position.cost_usd += actual_price * amount_sol
+            position.amount_sol += amount_sol
+            position.entry_price = position.cost_usd / position.amount_sol
+            position.current_price = actual_price
+            # El P&L se fija aquí: update_price ignora un tick al mismo precio
+            position.unrealized_pnl = (actual_price - position.entry_price) * position.amount_sol
         
         return {
             "success": True,
             "simulation": True,
-            "trade": asdict(trade),
+            "trade": trade,
             "new_balance_sol": self.sol_balance,
             "new_balance_usd": self.usd_balance,
-            "position": asdict(self.position) if self.position else None
+            "position": self.position.as_dict() if self.position else None
         }
     
     def _simulate_sell(self, amount_sol: float, price: float, fees_sol: float, slippage_pct: float) -> Dict:
@@ -180,18 +306,19 @@ class TradingSimulator:
         self.total_fees_paid += fees_sol
         
         # Crear trade simulado
-        trade = SimulatedTrade(
-            timestamp=time.time(),
-            side="SELL",
-            amount_sol=amount_sol,
-            price=actual_price,
-            value_usd=value_usd,
-            fees_sol=fees_sol,
-            slippage_pct=slippage_pct
-        )
+        trade: Dict = {
+            "timestamp": time.time(),
+            "side": "SELL",
+            "amount_sol": amount_sol,
+            "price": actual_price,
+            "value_usd": value_usd,
+            "fees_sol": fees_sol,
+            "slippage_pct": slippage_pct
+        }
         self.trades.append(trade)
         
         # Actualizar posición
+        self.position.cost_usd -= cost_basis
         self.position.amount_sol -= amount_sol
         if self.position.amount_sol <= 0.0001:  # Posición cerrada
             self.position = None
@@ -199,35 +326,46 @@ class TradingSimulator:
         return {
             "success": True,
             "simulation": True,
-            "trade": asdict(trade),
+            "trade": trade,
             "realized_pnl": pnl,
             "new_balance_sol": self.sol_balance,
             "new_balance_usd": self.usd_balance,
-            "position": asdict(self.position) if self.position else None
+            "position": self.position.as_dict() if self.position else None
         }
     
-    def update_current_price(self, price: float):
-        """Actualiza precio actual para P&L no realizado"""
-        if self.position:
-            self.position.update_price(price)
+    def update_current_price(self, price: float) -> bool:
+        """Actualiza precio actual para P&L no realizado; ``True`` si algo cambió"""
+        if self.position and self.position.update_price(price):
+            self._status = None
+            return True
+        return False
     
     def get_portfolio_status(self) -> Dict:
-        """Obtiene status actual del portfolio simulado"""
-        
+        """Obtiene status actual del portfolio simulado
+
+        Solo ``runtime_hours`` se recalcula si no hubo trades ni cambios de precio
+        desde la última llamada.
+        """
+        if self._status is None:
+            self._status = self._build_status()
+        return {**self._status, "runtime_hours": (time.time() - self.start_time) / 3600}
+
+    def _build_status(self) -> Dict:
         total_value_sol = self.sol_balance
         if self.position and self.position.current_price > 0:
             total_value_sol += self.position.amount_sol
         
         unrealized_pnl = self.position.unrealized_pnl if self.position else 0.0
         total_pnl = self.realized_pnl + unrealized_pnl
-        total_return_pct = (total_pnl / (self.initial_balance * (self.position.entry_price if self.position else 1))) * 100
+        # P&L (USD) sobre el capital inicial en USD; sin trades no hay P&L
+        total_return_pct = 100.0 * total_pnl / self._return_ref_usd if self._return_ref_usd else 0.0
         
         return {
             "simulation_mode": True,
             "initial_balance": self.initial_balance,
             "sol_balance": self.sol_balance,
             "usd_balance": self.usd_balance,
-            "position": asdict(self.position) if self.position else None,
+            "position": self.position.as_dict() if self.position else None,
             "total_value_sol": total_value_sol,
             "realized_pnl": self.realized_pnl,
             "unrealized_pnl": unrealized_pnl,
@@ -235,15 +373,18 @@ class TradingSimulator:
             "total_return_pct": total_return_pct,
             "total_fees_paid": self.total_fees_paid,
             "total_trades": len(self.trades),
-            "runtime_hours": (time.time() - self.start_time) / 3600
         }
     
     def get_trade_history(self) -> List[Dict]:
         """Obtiene historial de trades simulados"""
-        return [asdict(trade) for trade in self.trades]
+        return self.trades.to_dicts()
     
-    def export_simulation_log(self, filename: str = None) -> str:
-        """Exporta log detallado de la simulación"""
+    def export_simulation_log(self, filename: Union[str, BinaryIO, None] = None) -> Union[str, BinaryIO]:
+        """Exporta log detallado de la simulación
+
+        ``filename`` puede ser una ruta o un fichero binario ya abierto
+        (p. ej. ``io.BytesIO``); se devuelve el mismo destino.
+        """
         
         if filename is None:
             filename = f"simulation_log_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
@@ -257,11 +398,43 @@ class TradingSimulator:
             }
         }
         
-        with open(filename, 'w') as f:
-            json.dump(log_data, f, indent=2)
+        if ORJSON_AVAILABLE:
+            payload = orjson.dumps(log_data, option=orjson.OPT_INDENT_2 | orjson.OPT_SERIALIZE_NUMPY)
+        else:
+            payload = json.dumps(log_data, indent=2).encode()
+        
+        if isinstance(filename, str):
+            with open(filename, 'wb') as f:
+                f.write(payload)
+        else:
+            filename.write(payload)
         
         return filename
 
 
+class _LazySimulator:
+    """Proxy del simulador global: el ``TradingSimulator`` se crea en el primer uso.
+
+    Importar el módulo no construye el simulador ni escribe en el log.
+    """
+    __slots__ = ("_instance",)
+
+    def __init__(self):
+        object.__setattr__(self, "_instance", None)
+
+    def _get(self) -> TradingSimulator:
+        instance = object.__getattribute__(self, "_instance")
+        if instance is None:
+            instance = TradingSimulator()
+            object.__setattr__(self, "_instance", instance)
+        return instance
+
+    def __getattr__(self, name):
+        return getattr(self._get(), name)
+
+    def __setattr__(self, name, value):
+        setattr(self._get(), name, value)
+
+
 # Instancia global del simulador
-simulator = TradingSimulator() if settings.simulation_mode else None
\ No newline at end of file
+simulator = _LazySimulator() if settings.simulation_mode else None
\ No newline at end of file
@@ -0,0 +1,151 @@
+"""Phantom-compatible key derivation from a BIP39 mnemonic."""
+
+from hmac import digest as _hmac_digest
+from pathlib import Path
+from typing import List, Optional
+import base64
+import functools
+import hashlib
+import os
+import struct
+
+# blake3 es opcional (SIMD); solo se usa para el índice de la cache, no para derivar la clave
+try:
+    import blake3
+    BLAKE3_AVAILABLE = True
+except ImportError:
+    BLAKE3_AVAILABLE = False
+
+# Cache en disco de la clave derivada del MNEMONIC (evita PBKDF2 + BIP32 en cada arranque).
+# Guarda la clave privada, así que es opcional (KEY_CACHE=true) y vive fuera del repo
+KEY_CACHE_ENV = "KEY_CACHE"
+KEY_CACHE_NAME = "solana_trade_agent/keycache"
+# Tamaño de ``Keypair.to_bytes()``: seed (32) + clave pública (32)
+KEYPAIR_BYTES = 64
+
+PHANTOM_PATH = "m/44'/501'/0'/0'"
+# Índices ya endurecidos de PHANTOM_PATH: la ruta por defecto no se vuelve a parsear
+_PHANTOM_INDICES = tuple(i + 2**31 for i in (44, 501, 0, 0))
+
+
+def _parse_path(path: str) -> tuple:
+    if not path.startswith('m/'):
+        raise ValueError("Path must start with 'm/'")
+    indices = []
+    for part in path[2:].split('/'):
+        if part.endswith("'"):
+            index = int(part[:-1]) + 2**31
+        else:
+            index = int(part)
+        # ED25519 solo admite derivación endurecida
+        if index < 2**31:
+            index += 2**31
+        indices.append(index)
+    return tuple(indices)
+
+
+def derive_ed25519_path(seed: bytes, path: str) -> bytes:
+    """ED25519 HD key derivation compatible with Phantom wallet"""
+    indices = _PHANTOM_INDICES if path == PHANTOM_PATH else _parse_path(path)
+    # hmac.digest: HMAC-SHA512 de una sola llamada en OpenSSL
+    master_secret = _hmac_digest(b"ed25519 seed", seed, 'sha512')
+    chain_code = master_secret[32:]
+    # Buffer reutilizado en cada nivel: 0x00 || clave (32) || índice big-endian (4)
+    buf = bytearray(37)
+    buf[1:33] = master_secret[:32]
+    for index in indices:
+        struct.pack_into('>I', buf, 33, index)
+        derived = _hmac_digest(chain_code, buf, 'sha512')
+        buf[1:33] = derived[:32]
+        chain_code = derived[32:]
+    return bytes(buf[1:33])
+
+
+@functools.lru_cache(maxsize=None)
+def english_mnemonic():
+    """Shared ``Mnemonic("english")``: the wordlist is read from disk only once."""
+    from mnemonic import Mnemonic
+    return Mnemonic("english")
+
+
+def derive_private_key_from_mnemonic(mnemonic: str):
+    """
+    Derive private key from mnemonic using Phantom-compatible ED25519 derivation.
+    Uses path m/44'/501'/0'/0' which is Phantom's default.
+    Results are memoized per process.
+    """
+    derived = _derive_private_key(mnemonic)
+    return list(derived) if derived is not None else None
+
+
+@functools.lru_cache(maxsize=4)
+def _derive_private_key(mnemonic: str):
+    try:
+        from solders.keypair import Keypair
+
+        seed = english_mnemonic().to_seed(mnemonic)
+        private_key_32 = derive_ed25519_path(seed, PHANTOM_PATH)
+        keypair = Keypair.from_seed(private_key_32)
+        return tuple(keypair.to_bytes())
+    except Exception as e:
+        from src.utils.logger import setup_logger
+        logger = setup_logger()
+        logger.error(f"Error derivando clave privada del mnemonic: {e}")
+        return None
+
+
+def _mnemonic_cache_key(mnemonic: str) -> str:
+    # Si cambia el hash (con/sin blake3) la entrada no coincide y se vuelve a derivar
+    if BLAKE3_AVAILABLE:
+        return blake3.blake3(mnemonic.encode()).hexdigest(length=16)
+    return hashlib.blake2b(mnemonic.encode(), digest_size=16).hexdigest()
+
+
+def key_cache_enabled() -> bool:
+    """``True`` if ``KEY_CACHE=true`` is set in the environment."""
+    return os.getenv(KEY_CACHE_ENV, "false").lower() == "true"
+
+
+def key_cache_file() -> Path:
+    """``$XDG_CACHE_HOME/solana_trade_agent/keycache`` (``~/.cache`` by default)."""
+    base = os.getenv("XDG_CACHE_HOME") or Path.home() / ".cache"
+    return Path(base) / KEY_CACHE_NAME
+
+
+def load_cached_private_key(mnemonic: str) -> Optional[List[int]]:
+    """Return the cached key for ``mnemonic`` from :func:`key_cache_file`, if present."""
+    try:
+        key, encoded = key_cache_file().read_text().strip().split(":", 1)
+        if key != _mnemonic_cache_key(mnemonic):
+            return None
+        private_key = base64.b64decode(encoded, validate=True)
+    except (OSError, ValueError):
+        return None
+    # Una entrada truncada o corrupta se ignora: el llamador vuelve a derivar la clave
+    if len(private_key) != KEYPAIR_BYTES:
+        return None
+    return list(private_key)
+
+
+def store_cached_private_key(mnemonic: str, private_key: List[int]) -> None:
+    """Write the derived key to :func:`key_cache_file` with 0600 permissions (best effort)."""
+    path = key_cache_file()
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True, mode=0o700)
+        fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, "w") as f:
+            f.write(f"{_mnemonic_cache_key(mnemonic)}:{base64.b64encode(bytes(private_key)).decode()}")
+    except OSError:
+        pass
+
+
+def private_key_from_mnemonic(mnemonic: str) -> Optional[List[int]]:
+    """Return the key for ``mnemonic``, using the disk cache when it is enabled."""
+    if not key_cache_enabled():
+        return derive_private_key_from_mnemonic(mnemonic)
+    derived = load_cached_private_key(mnemonic)
+    if derived is None:
+        derived = derive_private_key_from_mnemonic(mnemonic)
+        if derived:
+            store_cached_private_key(mnemonic, derived)
+    return derived
@@ -2,16 +2,26 @@ import argparse
 import asyncio
 from pathlib import Path
 
-from .bot import TradingBot
-from .utils.backtest import load_prices_csv, run_backtest
+# uvloop es opcional (no existe en Windows): bucle de eventos en C sobre libuv
+try:
+    import uvloop
+    UVLOOP_AVAILABLE = True
+except ImportError:
+    UVLOOP_AVAILABLE = False
 
 
+# Los subcomandos importan sus módulos (bot, pandas, aiohttp, solana...) solo al ejecutarse
+
 async def run_bot(args: argparse.Namespace) -> None:
+    from .bot import TradingBot
+
     bot = TradingBot()  # No mock parameter - always real feeds
     await bot.run(steps=args.steps, interval=args.interval)
 
 
 def run_backtest_cmd(args: argparse.Namespace) -> None:
+    from .utils.backtest import load_prices_csv, run_backtest
+
     prices = load_prices_csv(Path(args.csv))
     result = run_backtest(prices)
     print(f"returns={result.returns:.2f} trades={result.trades}")
@@ -39,5 +49,13 @@ async def main() -> None:
         run_backtest_cmd(args)
 
 
+def run(coro) -> None:
+    """Run ``coro`` on uvloop when installed, otherwise on the stock asyncio loop."""
+    if UVLOOP_AVAILABLE:
+        uvloop.run(coro)
+    else:
+        asyncio.run(coro)
+
+
 if __name__ == "__main__":
-    asyncio.run(main())
+    run(main())
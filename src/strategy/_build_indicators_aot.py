@@ -0,0 +1,36 @@
+"""Build the ahead-of-time compiled indicator kernels.
+
+Run ``python -m src.strategy._build_indicators_aot`` (needs numba with
+``numba.pycc``) to write ``_indicators_aot.*.so`` next to this file.
+``_kernels`` loads it when present, so short runs such as
+``python -m src.main backtest`` skip the JIT compilation of the kernels.
+"""
+
+from pathlib import Path
+
+from numba.pycc import CC
+
+from src.strategy import _kernels
+
+cc = CC("_indicators_aot")
+cc.output_dir = str(Path(__file__).resolve().parent)
+cc.verbose = True
+
+# Firmas de los kernels de _kernels
+SIGNATURES = {
+    "ema": "f8(f8[:], i8)",
+    "rsi": "f8(f8[:], i8)",
+    "bollinger": "UniTuple(f8, 2)(f8[:], i8, f8)",
+    "backtest_fsm": "Tuple((f8, i8))(f8[:], i1[:], f8, i8)",
+    "all_indicators": "UniTuple(f8, 6)(f8[:], i8, i8, i8, i8, f8)",
+    "scan_drawdown": "i8(f8[:], f8, f8)",
+}
+
+# PY_KERNELS y no los atributos del módulo: con una extensión ya construida
+# esos son las funciones compiladas, sin código Python que volver a compilar
+for name, signature in SIGNATURES.items():
+    cc.export(name, signature)(_kernels.PY_KERNELS[name])
+
+
+if __name__ == "__main__":
+    cc.compile()
@@ -0,0 +1,204 @@
+"""Numba kernels for the indicator helpers.
+
+Each kernel reproduces the value the pandas helper in ``indicators`` returns for
+the last element of a ``float64`` array. Numba is optional: without it the
+decorator is a no-op and ``indicators`` uses its NumPy fallbacks. When the
+AOT extension built by ``_build_indicators_aot`` is present its compiled
+kernels are used instead and no JIT compilation happens.
+"""
+
+import math
+
+import numpy as np
+
+try:
+    from numba import njit
+    NUMBA_AVAILABLE = True
+except ImportError:
+    NUMBA_AVAILABLE = False
+
+    def njit(*args, **kwargs):
+        """No-op stand-in for ``numba.njit`` so the kernels stay importable."""
+        if len(args) == 1 and callable(args[0]) and not kwargs:
+            return args[0]
+        return lambda func: func
+
+
+# Sin fastmath: los kernels devuelven NaN durante el warm-up (igual que pandas)
+@njit(cache=True)
+def ema(prices, span):
+    """Last value of ``pd.Series(prices).ewm(span=span, adjust=False).mean()``."""
+    if prices.shape[0] == 0:
+        return math.nan
+    alpha = 2.0 / (span + 1.0)
+    value = prices[0]
+    for i in range(1, prices.shape[0]):
+        value += alpha * (prices[i] - value)
+    return value
+
+
+@njit(cache=True)
+def rsi(prices, period):
+    """Last value of the rolling-mean RSI computed by ``indicators.rsi``."""
+    n = prices.shape[0]
+    if n < period:
+        return math.nan
+    gain = 0.0
+    loss = 0.0
+    # La primera diferencia de pandas es NaN y cuenta como 0 dentro de la ventana
+    for i in range(max(n - period, 1), n):
+        delta = prices[i] - prices[i - 1]
+        if delta > 0:
+            gain += delta
+        elif delta < 0:
+            loss -= delta
+    if loss == 0.0:
+        return 100.0 if gain > 0.0 else math.nan
+    rs = gain / loss
+    return 100.0 - 100.0 / (1.0 + rs)
+
+
+@njit(cache=True)
+def bollinger(prices, period, k):
+    """Last ``(upper, lower)`` Bollinger Bands with sample std (ddof=1), like pandas."""
+    n = prices.shape[0]
+    if n < period or period < 2:
+        return math.nan, math.nan
+    mean = 0.0
+    for i in range(n - period, n):
+        mean += prices[i]
+    mean /= period
+    m2 = 0.0
+    for i in range(n - period, n):
+        m2 += (prices[i] - mean) ** 2
+    std = math.sqrt(m2 / (period - 1))
+    return mean + k * std, mean - k * std
+
+
+@njit(cache=True)
+def all_indicators(prices, fast, slow, rsi_period, bb_period, k):
+    """``(ema_fast, ema_slow, sma, rsi, upper, lower)`` of the kernels above in one pass.
+
+    Same operations in the same order as ``ema``/``rsi``/``bollinger``, so the
+    results are identical; only the Bollinger variance re-reads its tail.
+    """
+    n = prices.shape[0]
+    if n == 0:
+        return math.nan, math.nan, math.nan, math.nan, math.nan, math.nan
+    a_fast = 2.0 / (fast + 1.0)
+    a_slow = 2.0 / (slow + 1.0)
+    e_fast = prices[0]
+    e_slow = prices[0]
+    gain = 0.0
+    loss = 0.0
+    bb_sum = 0.0
+    rsi_start = max(n - rsi_period, 1)
+    bb_start = n - bb_period
+    for i in range(n):
+        x = prices[i]
+        if i > 0:
+            e_fast += a_fast * (x - e_fast)
+            e_slow += a_slow * (x - e_slow)
+            if i >= rsi_start:
+                delta = x - prices[i - 1]
+                if delta > 0:
+                    gain += delta
+                elif delta < 0:
+                    loss -= delta
+        if i >= bb_start:
+            bb_sum += x
+
+    if n < rsi_period:
+        rsi_val = math.nan
+    elif loss == 0.0:
+        rsi_val = 100.0 if gain > 0.0 else math.nan
+    else:
+        rsi_val = 100.0 - 100.0 / (1.0 + gain / loss)
+
+    if n < bb_period or bb_period < 2:
+        return e_fast, e_slow, math.nan, rsi_val, math.nan, math.nan
+    mean = bb_sum / bb_period
+    m2 = 0.0
+    for i in range(bb_start, n):
+        m2 += (prices[i] - mean) ** 2
+    std = math.sqrt(m2 / (bb_period - 1))
+    return e_fast, e_slow, mean, rsi_val, mean + k * std, mean - k * std
+
+
+# Códigos de señal para los kernels (generate_signals devuelve strings)
+HOLD, BUY, SELL = 0, 1, 2
+
+
+@njit(cache=True)
+def backtest_fsm(prices, signals, cash, start):
+    """Fixed 1-unit BUY/SELL state machine of ``run_backtest`` without fees.
+
+    ``signals`` holds the ``HOLD``/``BUY``/``SELL`` codes; bars before
+    ``start`` are skipped. Returns ``(cash, trades)``.
+    """
+    base = 0.0
+    trades = 0
+    for i in range(start, prices.shape[0]):
+        price = prices[i]
+        signal = signals[i]
+        if signal == 1 and cash >= price:
+            base += 1.0
+            cash -= price
+            trades += 1
+        elif signal == 2 and base >= 1.0:
+            base -= 1.0
+            cash += price
+            trades += 1
+    return cash, trades
+
+
+@njit(cache=True)
+def scan_drawdown(equity, peak, max_drawdown_pct):
+    """Index of the first value of ``equity`` whose drawdown from the running
+    peak (starting at ``peak``) reaches ``max_drawdown_pct``; ``-1`` if none.
+
+    Same rule as ``risk.exceed_max_drawdown``: a new peak is never a breach,
+    and neither is any value while the peak is still ``<= 0``.
+    """
+    for i in range(equity.shape[0]):
+        value = equity[i]
+        if value > peak:
+            peak = value
+        # Sin pico positivo no hay drawdown que medir (y se evita dividir por cero)
+        elif peak > 0.0 and (peak - value) / peak * 100.0 >= max_drawdown_pct:
+            return i
+    return -1
+
+
+# Funciones Python originales (sin njit), guardadas antes de que la extensión AOT
+# sustituya los nombres: ``_build_indicators_aot`` compila a partir de estas
+PY_KERNELS = {
+    func.__name__: getattr(func, "py_func", func)
+    for func in (ema, rsi, bollinger, all_indicators, backtest_fsm, scan_drawdown)
+}
+
+# Extensión AOT opcional: mismos kernels ya compilados (sin coste de JIT en el arranque)
+try:
+    from . import _indicators_aot
+    ema, rsi, bollinger = _indicators_aot.ema, _indicators_aot.rsi, _indicators_aot.bollinger
+    all_indicators = _indicators_aot.all_indicators
+    backtest_fsm = _indicators_aot.backtest_fsm
+    # Una extensión compilada antes de existir el kernel no lo trae: se queda el JIT
+    scan_drawdown = getattr(_indicators_aot, "scan_drawdown", scan_drawdown)
+    AOT_AVAILABLE = True
+except ImportError:
+    AOT_AVAILABLE = False
+
+# Kernels nativos disponibles (JIT o AOT); si no, ``indicators`` usa NumPy
+COMPILED = NUMBA_AVAILABLE or AOT_AVAILABLE
+
+
+def warmup() -> None:
+    """Compile the kernels once (no-op cost without numba or with the AOT build)."""
+    sample = np.linspace(1.0, 2.0, 64)
+    ema(sample, 12)
+    rsi(sample, 14)
+    bollinger(sample, 20, 2.0)
+    all_indicators(sample, 12, 50, 14, 20, 2.0)
+    backtest_fsm(sample, np.zeros(sample.shape[0], dtype=np.int8), 1.0, 0)
+    scan_drawdown(sample, 0.0, 20.0)
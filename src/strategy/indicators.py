@@ -1,52 +1,226 @@
-from typing import List, Tuple
+import math
+from collections import deque
+from typing import Dict, Sequence, Tuple, Union
+
+import numpy as np
 import pandas as pd
 
+from . import _kernels
+
+# Indicators accept plain lists as well as the bot's NumPy price buffer
+Prices = Union[Sequence[float], np.ndarray]
 
-def ema(prices: List[float], span: int) -> float:
+
+def ema(prices: Prices, span: int) -> float:
     """Calculate exponential moving average for the given span."""
-    series = pd.Series(prices)
-    return series.ewm(span=span, adjust=False).mean().iloc[-1]
+    a = np.asarray(prices, dtype=np.float64)
+    if _kernels.COMPILED:
+        return _kernels.ema(a, span)
+    n = a.shape[0]
+    if n == 0:
+        return math.nan
+    # Forma cerrada de la recurrencia adjust=False: un producto escalar en vez de un bucle
+    alpha = 2.0 / (span + 1.0)
+    decay = (1.0 - alpha) ** np.arange(n - 1, -1, -1, dtype=np.float64)
+    weights = alpha * decay
+    weights[0] = decay[0]
+    return float(weights @ a)
 
 
-def rsi(prices: List[float], window: int = 14) -> float:
+def rsi(prices: Prices, window: int = 14) -> float:
     """Calculate Relative Strength Index (RSI)."""
-    series = pd.Series(prices)
+    a = np.asarray(prices, dtype=np.float64)
+    if _kernels.COMPILED:
+        return _kernels.rsi(a, window)
+    n = a.shape[0]
+    if n < window:
+        return math.nan
+    # Solo las diferencias de la última ventana (la primera de la serie cuenta como 0)
+    delta = np.diff(a[max(n - window, 1) - 1:])
+    gain = float(delta[delta > 0].sum())
+    loss = float(-delta[delta < 0].sum())
+    if loss == 0.0:
+        return 100.0 if gain > 0.0 else math.nan
+    return 100.0 - 100.0 / (1.0 + gain / loss)
+
+
+def bollinger_bands(prices: Prices, window: int = 20, num_std: float = 2) -> Tuple[float, float]:
+    """Return upper and lower Bollinger Bands."""
+    a = np.asarray(prices, dtype=np.float64)
+    if _kernels.COMPILED:
+        return _kernels.bollinger(a, window, float(num_std))
+    if a.shape[0] < window or window < 2:
+        return math.nan, math.nan
+    tail = a[-window:]
+    mean = float(tail.mean())
+    std = float(tail.std(ddof=1))
+    return mean + num_std * std, mean - num_std * std
+
+
+# Versiones "serie": el valor i es el que devuelve el helper escalar para prices[:i + 1]
+
+def ema_series(prices: Prices, span: int) -> np.ndarray:
+    """EMA at every element of ``prices``."""
+    return pd.Series(prices, dtype=np.float64).ewm(span=span, adjust=False).mean().to_numpy()
+
+
+def rsi_series(prices: Prices, window: int = 14) -> np.ndarray:
+    """Rolling-mean RSI at every element of ``prices``."""
+    series = pd.Series(prices, dtype=np.float64)
     delta = series.diff()
     gain = delta.where(delta > 0, 0.0)
     loss = -delta.where(delta < 0, 0.0)
     avg_gain = gain.rolling(window=window).mean()
     avg_loss = loss.rolling(window=window).mean()
     rs = avg_gain / avg_loss
-    rsi = 100 - (100 / (1 + rs))
-    return rsi.iloc[-1]
+    return (100 - (100 / (1 + rs))).to_numpy()
 
 
-def bollinger_bands(prices: List[float], window: int = 20, num_std: float = 2) -> Tuple[float, float]:
-    """Return upper and lower Bollinger Bands."""
-    series = pd.Series(prices)
-    sma = series.rolling(window=window).mean()
-    std = series.rolling(window=window).std()
-    upper = sma + num_std * std
-    lower = sma - num_std * std
-    return upper.iloc[-1], lower.iloc[-1]
+def bollinger_series(prices: Prices, window: int = 20, num_std: float = 2) -> Tuple[np.ndarray, np.ndarray]:
+    """Upper and lower Bollinger Bands at every element of ``prices``."""
+    a = np.asarray(prices, dtype=np.float64)
+    upper = np.full(a.shape[0], math.nan)
+    lower = np.full(a.shape[0], math.nan)
+    if a.shape[0] < window or window < 2:
+        return upper, lower
+    # Vista de ventanas deslizantes (sin copia): media y std de cada ventana en una pasada
+    windows = np.lib.stride_tricks.sliding_window_view(a, window)
+    sma = windows.mean(axis=-1)
+    std = windows.std(axis=-1, ddof=1)
+    upper[window - 1:] = sma + num_std * std
+    lower[window - 1:] = sma - num_std * std
+    return upper, lower
+
+
+class IncrementalIndicators:
+    """Online EMA12/EMA50/SMA20/RSI14/Bollinger(20, 2) accumulator.
+
+    Each ``update`` is O(1) and yields the same values as the pandas helpers
+    above applied to the full price history: EMAs use the ``adjust=False``
+    recurrence, RSI keeps running sums over its rolling window and the bands
+    use Welford's rolling mean/variance (sample std, like pandas). Values that
+    are not yet defined are returned as NaN.
+    """
+
+    def __init__(self, rsi_window: int = 14, bb_window: int = 20, num_std: float = 2):
+        self.alpha12 = 2 / (12 + 1)
+        self.alpha50 = 2 / (50 + 1)
+        self.num_std = num_std
+        self.ema12 = math.nan
+        self.ema50 = math.nan
+        self.last_price = None
+
+        # SMA20 / Bollinger share the same price window
+        self.sma20_window: deque = deque(maxlen=bb_window)
+        self.sma20_sum = 0.0
+        self.bb_mean = 0.0
+        self.bb_m2 = 0.0
+        self.bb_count = 0
+
+        # RSI: rolling window of gains/losses (first delta counts as 0, like pandas)
+        self.rsi_gains: deque = deque(maxlen=rsi_window)
+        self.rsi_losses: deque = deque(maxlen=rsi_window)
+        self.rsi_avg_gain = 0.0
+        self.rsi_avg_loss = 0.0
+
+    def update(self, price: float) -> Dict[str, float]:
+        """Feed one price and return the updated indicators."""
+        price = float(price)
+
+        if self.last_price is None:
+            self.ema12 = price
+            self.ema50 = price
+            delta = 0.0
+        else:
+            self.ema12 += self.alpha12 * (price - self.ema12)
+            self.ema50 += self.alpha50 * (price - self.ema50)
+            delta = price - self.last_price
+        self.last_price = price
+
+        self._update_rsi(delta)
+        self._update_bands(price)
+        return self.as_dict()
+
+    def _update_rsi(self, delta: float) -> None:
+        window = self.rsi_gains.maxlen
+        gain = delta if delta > 0 else 0.0
+        loss = -delta if delta < 0 else 0.0
+        if len(self.rsi_gains) == window:
+            self.rsi_avg_gain -= self.rsi_gains[0] / window
+            self.rsi_avg_loss -= self.rsi_losses[0] / window
+        self.rsi_gains.append(gain)
+        self.rsi_losses.append(loss)
+        self.rsi_avg_gain = max(self.rsi_avg_gain + gain / window, 0.0)
+        self.rsi_avg_loss = max(self.rsi_avg_loss + loss / window, 0.0)
+
+    def _update_bands(self, price: float) -> None:
+        window = self.sma20_window
+        if len(window) == window.maxlen:
+            oldest = window[0]
+            old_mean = self.bb_mean
+            self.bb_mean += (price - oldest) / self.bb_count
+            self.bb_m2 += (price - oldest) * (price - self.bb_mean + oldest - old_mean)
+            self.sma20_sum += price - oldest
+        else:
+            self.bb_count += 1
+            delta = price - self.bb_mean
+            self.bb_mean += delta / self.bb_count
+            self.bb_m2 += delta * (price - self.bb_mean)
+            self.sma20_sum += price
+        self.bb_m2 = max(self.bb_m2, 0.0)
+        window.append(price)
+
+    @property
+    def rsi(self) -> float:
+        if len(self.rsi_gains) < self.rsi_gains.maxlen:
+            return math.nan
+        if self.rsi_avg_loss == 0:
+            return 100.0 if self.rsi_avg_gain > 0 else math.nan
+        rs = self.rsi_avg_gain / self.rsi_avg_loss
+        return 100 - (100 / (1 + rs))
+
+    def as_dict(self) -> Dict[str, float]:
+        """Return the current indicators with the keys of ``compute_indicators``."""
+        if self.bb_count < self.sma20_window.maxlen:
+            sma20 = upper_bb = lower_bb = math.nan
+        else:
+            sma20 = self.sma20_sum / self.bb_count
+            std = math.sqrt(self.bb_m2 / (self.bb_count - 1))
+            upper_bb = self.bb_mean + self.num_std * std
+            lower_bb = self.bb_mean - self.num_std * std
+
+        return {
+            "ema12": self.ema12,
+            "ema50": self.ema50,
+            "sma20": sma20,
+            "rsi": self.rsi,
+            "upper_bb": upper_bb,
+            "lower_bb": lower_bb,
+        }
+
+
+def indicator_values(prices: Prices) -> Tuple[float, float, float, float, float, float]:
+    """``(ema12, ema50, sma20, rsi, upper_bb, lower_bb)`` for the last price.
+
+    A single fused pass with the native kernels; the NumPy helpers otherwise.
+    """
+    a = np.asarray(prices, dtype=np.float64)
+    if _kernels.COMPILED:
+        return _kernels.all_indicators(a, 12, 50, 14, 20, 2.0)
+    upper_bb, lower_bb = bollinger_bands(a)
+    sma20 = float(a[-20:].mean()) if a.shape[0] >= 20 else math.nan
+    return ema(a, 12), ema(a, 50), sma20, rsi(a, 14), upper_bb, lower_bb
+
 
+def compute_indicators(prices: Prices) -> dict:
+    """Return a dictionary with key technical indicators for the price series.
 
-def compute_indicators(prices: List[float]) -> dict:
-    """Return a dictionary with key technical indicators for the price series."""
-    if not prices:
+    One-shot computation through :func:`indicator_values`; long-running
+    callers should keep an :class:`IncrementalIndicators` and call ``update``
+    per price instead.
+    """
+    if len(prices) == 0:
         return {}
 
-    ema12_val = ema(prices, 12)
-    ema50_val = ema(prices, 50)
-    rsi_val = rsi(prices, 14)
-    upper_bb, lower_bb = bollinger_bands(prices)
-    sma20_val = pd.Series(prices).rolling(window=20).mean().iloc[-1]
-
-    return {
-        "ema12": float(ema12_val),
-        "ema50": float(ema50_val),
-        "sma20": float(sma20_val),
-        "rsi": float(rsi_val),
-        "upper_bb": float(upper_bb),
-        "lower_bb": float(lower_bb),
-    }
+    keys = ("ema12", "ema50", "sma20", "rsi", "upper_bb", "lower_bb")
+    return dict(zip(keys, indicator_values(prices)))
@@ -1,11 +1,17 @@
 """Basic risk management utilities."""
 
+import numpy as np
+
 from src.execution.portfolio import Portfolio
+from src.strategy import _kernels
 from src.config import settings
 
+# Umbral leído una vez al importar: la configuración no cambia en ejecución
+MAX_DRAWDOWN_PCT = settings.max_drawdown_pct
+
 
 def exceed_max_drawdown(portfolio: Portfolio, current_price: float) -> bool:
-    """Return ``True`` if the portfolio drawdown exceeds ``settings.max_drawdown_pct``.
+    """Return ``True`` if the portfolio drawdown exceeds ``MAX_DRAWDOWN_PCT``.
 
     The portfolio tracks the peak total value (USD) seen so far. When the
     difference between this peak and the current value is larger than the
@@ -17,4 +23,38 @@ def exceed_max_drawdown(portfolio: Portfolio, current_price: float) -> bool:
         return False
 
     drawdown = (portfolio.peak_value - current_value) / portfolio.peak_value * 100
-    return drawdown >= settings.max_drawdown_pct
+    return drawdown >= MAX_DRAWDOWN_PCT
+
+
+def exceed_max_drawdown_batch(prices: np.ndarray, base_balance: float, quote_balance: float,
+                              max_drawdown_pct: float = MAX_DRAWDOWN_PCT,
+                              peak_value: float = 0.0) -> np.ndarray:
+    """``exceed_max_drawdown`` for every price of a series with fixed balances.
+
+    Element ``i`` is what the scalar function returns for ``prices[i]`` after
+    being called on ``prices[:i]`` with a portfolio whose peak starts at
+    ``peak_value``; the running peak is a prefix maximum instead of a loop.
+    """
+    equity = quote_balance + base_balance * np.asarray(prices, dtype=np.float64)
+    peaks = np.maximum.accumulate(np.maximum(equity, peak_value))
+    # Pico previo a cada precio: un nuevo máximo nunca cuenta como drawdown
+    prev_peaks = np.empty_like(peaks)
+    prev_peaks[:1] = peak_value
+    prev_peaks[1:] = peaks[:-1]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        drawdown = (peaks - equity) / peaks * 100
+    return (equity <= prev_peaks) & (drawdown >= max_drawdown_pct)
+
+
+def first_drawdown_breach(prices: np.ndarray, base_balance: float, quote_balance: float,
+                          max_drawdown_pct: float = MAX_DRAWDOWN_PCT,
+                          peak_value: float = 0.0) -> int:
+    """Index of the first price where ``exceed_max_drawdown_batch`` is ``True``, or ``-1``.
+
+    With native kernels this is a single pass that stops at the breach.
+    """
+    if _kernels.COMPILED:
+        equity = quote_balance + base_balance * np.asarray(prices, dtype=np.float64)
+        return int(_kernels.scan_drawdown(equity, float(peak_value), float(max_drawdown_pct)))
+    hits = exceed_max_drawdown_batch(prices, base_balance, quote_balance, max_drawdown_pct, peak_value)
+    return int(hits.argmax()) if hits.any() else -1
@@ -1,18 +1,32 @@
-from typing import List
-from .indicators import ema, rsi, bollinger_bands
+from typing import Dict
 
+import numpy as np
 
-def generate_signal(prices: List[float]) -> str:
+from .indicators import Prices, bollinger_series, indicator_values, rsi_series
+
+
+def generate_signal(prices: Prices) -> str:
     """Return BUY, SELL or HOLD based on simple indicator rules."""
     if len(prices) < 50:
         return "HOLD"
 
-    last_price = prices[-1]
-    ema12 = ema(prices, 12)
-    ema50 = ema(prices, 50)
-    rsi_val = rsi(prices, 14)
-    upper_bb, lower_bb = bollinger_bands(prices)
+    ema12, ema50, _, rsi_val, upper_bb, lower_bb = indicator_values(prices)
+    return _signal(prices[-1], ema12, ema50, rsi_val, upper_bb, lower_bb)
+
+
+def signal_from_indicators(price: float, indicators: Dict[str, float], n_prices: int) -> str:
+    """``generate_signal`` from precomputed indicators (e.g. ``IncrementalIndicators``).
+
+    ``n_prices`` is the number of prices the indicators have seen.
+    """
+    if n_prices < 50:
+        return "HOLD"
+    return _signal(price, indicators["ema12"], indicators["ema50"], indicators["rsi"],
+                   indicators["upper_bb"], indicators["lower_bb"])
+
 
+def _signal(last_price: float, ema12: float, ema50: float, rsi_val: float,
+            upper_bb: float, lower_bb: float) -> str:
     if rsi_val > 70 and last_price >= upper_bb:
         return "SELL"
     if rsi_val < 30 and last_price <= lower_bb:
@@ -20,3 +34,26 @@ def generate_signal(prices: List[float]) -> str:
     if ema12 > ema50 and rsi_val < 70:
         return "HOLD"
     return "HOLD"
+
+
+def generate_signals(prices: Prices) -> np.ndarray:
+    """``generate_signal(prices[:i + 1])`` for every ``i``, in one vectorized pass.
+
+    The indicators are causal, so each one is computed once over the whole
+    series instead of once per prefix (O(N) instead of O(N²)).
+    """
+    prices = np.asarray(prices, dtype=np.float64)
+    signals = np.full(len(prices), "HOLD", dtype=object)
+    if len(prices) < 50:
+        return signals
+
+    rsi_val = rsi_series(prices, 14)
+    upper_bb, lower_bb = bollinger_series(prices)
+    # Las comparaciones con NaN (warm-up) son False, igual que en generate_signal
+    with np.errstate(invalid="ignore"):
+        sell = (rsi_val > 70) & (prices >= upper_bb)
+        buy = ~sell & (rsi_val < 30) & (prices <= lower_bb)
+    sell[:49] = buy[:49] = False
+    signals[sell] = "SELL"
+    signals[buy] = "BUY"
+    return signals
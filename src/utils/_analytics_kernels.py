@@ -0,0 +1,65 @@
+"""Kernels numba para las estadísticas del reporte de ``data_analytics``.
+
+Cada kernel junta en una sola pasada sobre un array ``float64`` las reducciones
+NumPy que hacía su llamador. Sin numba el decorador no hace nada y
+``data_analytics`` sigue usando sus expresiones NumPy.
+"""
+
+import math
+
+from ..strategy._kernels import njit
+
+
+@njit(cache=True)
+def price_stats(prices):
+    """``(min, max, mean, std, first_half_mean, second_half_mean)`` de ``prices``.
+
+    ``std`` es la desviación poblacional (``np.std``); las mitades se parten en
+    ``n // 2`` como en ``analyze_price_data``. Necesita al menos dos precios.
+    """
+    n = prices.shape[0]
+    mid = n // 2
+    mn = prices[0]
+    mx = prices[0]
+    mean = 0.0
+    m2 = 0.0
+    first_sum = 0.0
+    second_sum = 0.0
+    for i in range(n):
+        p = prices[i]
+        if p < mn:
+            mn = p
+        if p > mx:
+            mx = p
+        # Welford: media y varianza en la misma pasada
+        delta = p - mean
+        mean += delta / (i + 1)
+        m2 += delta * (p - mean)
+        if i < mid:
+            first_sum += p
+        else:
+            second_sum += p
+    first_half = first_sum / mid if mid > 0 else 0.0
+    return mn, mx, mean, math.sqrt(m2 / n), first_half, second_sum / (n - mid)
+
+
+@njit(cache=True)
+def drawdown(values):
+    """``(min, max, max_drawdown)`` con el pico acumulado empezando en 0."""
+    mn = values[0]
+    mx = values[0]
+    peak = 0.0
+    max_dd = 0.0
+    for i in range(values.shape[0]):
+        v = values[i]
+        if v < mn:
+            mn = v
+        if v > mx:
+            mx = v
+        if v > peak:
+            peak = v
+        if peak > 0.0:
+            dd = (peak - v) / peak
+            if dd > max_dd:
+                max_dd = dd
+    return mn, mx, max_dd
@@ -1,18 +1,23 @@
 """Simple back-testing helper for the strategy."""
 
 import csv
+import warnings
 from dataclasses import dataclass
 from pathlib import Path
-from typing import Iterable, List
+from typing import Iterable
 
+import numpy as np
 
-def load_prices_csv(path: Path) -> List[float]:
-    """Load a list of prices from a CSV file with one price per line."""
-    with path.open() as f:
-        reader = csv.reader(f)
-        return [float(row[0]) for row in reader if row]
 
-from src.strategy.simple_strategy import generate_signal
+def load_prices_csv(path: Path) -> np.ndarray:
+    """Load prices (first column, one per line) from a CSV file into a float64 array."""
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", UserWarning)  # fichero vacío -> array vacío
+        return np.loadtxt(path, delimiter=",", usecols=(0,), dtype=np.float64, ndmin=1)
+
+from src.config import settings
+from src.strategy import _kernels
+from src.strategy.simple_strategy import generate_signals
 from src.execution.portfolio import Portfolio
 
 
@@ -23,14 +28,26 @@ class BacktestResult:
 
 
 def run_backtest(price_series: Iterable[float], starting_cash: float = 1000.0) -> BacktestResult:
-    prices: List[float] = list(price_series)
+    if isinstance(price_series, np.ndarray):
+        prices = np.ascontiguousarray(price_series, dtype=np.float64)  # sin copia si ya es float64
+    else:
+        prices = np.fromiter(price_series, dtype=np.float64)
+    # Señales de todas las barras en una sola pasada
+    signals = generate_signals(prices)
+
+    if not settings.simulation_mode:
+        # Sin simulador el portfolio es aritmética pura: máquina de estados en un kernel
+        codes = np.where(signals == "BUY", _kernels.BUY, np.where(signals == "SELL", _kernels.SELL, _kernels.HOLD)).astype(np.int8)
+        cash, trades = _kernels.backtest_fsm(prices, codes, float(starting_cash), 50)
+        return BacktestResult(returns=float(cash) - starting_cash, trades=int(trades))
+
+    # Modo simulación: cada fill pasa por el simulador (fees, slippage, posición)
     portfolio = Portfolio(quote_balance=starting_cash)
     trades = 0
 
     for i in range(50, len(prices)):
-        window = prices[: i + 1]
-        signal = generate_signal(window)
-        price = prices[i]
+        signal = signals[i]
+        price = float(prices[i])
         qty = 1  # fixed 1 SOL for demo
         if signal == "BUY" and portfolio.quote_balance >= price:
             portfolio.update_from_trade("BUY", qty, price)
@@ -42,6 +59,19 @@ def run_backtest(price_series: Iterable[float], starting_cash: float = 1000.0) -
     return BacktestResult(returns=portfolio.quote_balance - starting_cash, trades=trades)
 
 
+def equity_curve(prices: Iterable[float], fills: np.ndarray, starting_cash: float = 1000.0) -> np.ndarray:
+    """Portfolio value at every bar given the signed base quantity filled at each bar.
+
+    ``fills[i]`` is positive for a BUY and negative for a SELL executed at
+    ``prices[i]`` (0 when nothing traded); fees are ignored.
+    """
+    prices = np.asarray(prices, dtype=np.float64)
+    fills = np.asarray(fills, dtype=np.float64)
+    base = np.cumsum(fills)
+    quote = starting_cash - np.cumsum(fills * prices)
+    return quote + base * prices
+
+
 def export_report(result: BacktestResult, path: Path) -> None:
     with path.open("w", newline="") as f:
         writer = csv.writer(f)
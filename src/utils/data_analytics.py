@@ -2,12 +2,20 @@
 Utilidades para análisis de datos históricos y reporting.
 """
 
-import json
+import copy
+import functools
+import os
+import time
+from dataclasses import dataclass
 from datetime import datetime, timedelta
 from typing import Dict, List, Optional
 from pathlib import Path
 
-from ..data.data_manager import data_manager
+import numpy as np
+
+from ..data.data_manager import data_manager, write_json
+from ..strategy._kernels import NUMBA_AVAILABLE
+from . import _analytics_kernels
 
 # Optional imports for advanced analytics
 try:
@@ -22,6 +30,13 @@ try:
 except ImportError:
     MATPLOTLIB_AVAILABLE = False
 
+# Un reporte sobre datos sin cambios se reutiliza dentro de esta ventana (la ventana
+# de ``hours`` avanza con el reloj, así que tampoco puede reutilizarse indefinidamente)
+REPORT_CACHE_TTL_SEC = 5.0
+
+# A partir de aquí compensa construir un DataFrame y agregar en C
+PANDAS_MIN_TRADES = 1000
+
 
 def generate_trading_report(hours: int = 24, export_path: str = None) -> Dict:
     """
@@ -32,8 +47,38 @@ def generate_trading_report(hours: int = 24, export_path: str = None) -> Dict:
         export_path: Ruta donde guardar el reporte (opcional)
     
     Returns:
-        Dict con el reporte completo
+        Dict con el reporte completo (se reutiliza mientras la DB no cambie,
+        como mucho ``REPORT_CACHE_TTL_SEC``)
     """
+    report = copy.deepcopy(_cached_report(hours, *_db_version()))
+    
+    # Exportar si se especifica ruta (fuera de la cache: es un efecto secundario)
+    if export_path:
+        write_json(report, export_path)
+        print(f"📤 Reporte exportado a: {export_path}")
+    
+    return report
+
+
+def _db_version() -> tuple:
+    """``(base de datos, filas escritas, mtime_ns/tamaño de la DB y su -wal, bucket de tiempo)`` para la cache de reportes"""
+    # change_count vuelca el buffer y cubre lo escrito por este proceso (también en memoria);
+    # el stat de los ficheros, lo escrito por otros procesos. Todas las bases en memoria
+    # tienen db_path ":memory:": se distinguen por su URI (dm-N, única por gestor)
+    version = [data_manager._uri or data_manager.db_path, data_manager.change_count]
+    if not data_manager.in_memory:
+        for path in (data_manager.db_path, f"{data_manager.db_path}-wal"):
+            try:
+                st = os.stat(path)
+                version += [st.st_mtime_ns, st.st_size]
+            except OSError:
+                version += [None, None]
+    version.append(int(time.time() // REPORT_CACHE_TTL_SEC))
+    return tuple(version)
+
+
+@functools.lru_cache(maxsize=8)
+def _cached_report(hours: int, *db_version) -> Dict:
     print(f"📊 Generando reporte de trading para las últimas {hours} horas...")
     
     # Obtener datos históricos
@@ -49,7 +94,7 @@ def generate_trading_report(hours: int = 24, export_path: str = None) -> Dict:
     trading_analysis = analyze_trading_performance(trade_history, portfolio_history)
     
     # Compilar reporte
-    report = {
+    return {
         "generated_at": datetime.now().isoformat(),
         "period_hours": hours,
         "database_stats": stats,
@@ -61,14 +106,6 @@ def generate_trading_report(hours: int = 24, export_path: str = None) -> Dict:
             "portfolio_snapshots": len(portfolio_history)
         }
     }
-    
-    # Exportar si se especifica ruta
-    if export_path:
-        with open(export_path, 'w') as f:
-            json.dump(report, f, indent=2, default=str)
-        print(f"📤 Reporte exportado a: {export_path}")
-    
-    return report
 
 
 def analyze_price_data(price_history: List[Dict]) -> Dict:
@@ -76,37 +113,31 @@ def analyze_price_data(price_history: List[Dict]) -> Dict:
     if not price_history:
         return {"error": "No hay datos de precios disponibles"}
     
-    prices = [p["price"] for p in price_history]
-    timestamps = [p["timestamp"] for p in price_history]
-    
-    if len(prices) < 2:
+    if len(price_history) < 2:
         return {"error": "Insuficientes datos para análisis"}
     
-    # Estadísticas básicas
-    min_price = min(prices)
-    max_price = max(prices)
-    avg_price = sum(prices) / len(prices)
-    current_price = prices[-1]
+    # Un solo array: las estadísticas son reducciones en C en vez de bucles Python
+    prices = np.fromiter((p["price"] for p in price_history), dtype=np.float64, count=len(price_history))
+    
+    # Estadísticas básicas, volatilidad (desviación estándar poblacional) y medias por mitades
+    min_price, max_price, avg_price, volatility, first_half_avg, second_half_avg = _price_stats(prices)
+    first_price = float(prices[0])
+    current_price = float(prices[-1])
     
     # Cambios de precio
-    price_change = current_price - prices[0]
-    price_change_pct = (price_change / prices[0]) * 100 if prices[0] > 0 else 0
+    price_change = current_price - first_price
+    price_change_pct = (price_change / first_price) * 100 if first_price > 0 else 0
     
-    # Volatilidad (desviación estándar)
-    variance = sum((p - avg_price) ** 2 for p in prices) / len(prices)
-    volatility = variance ** 0.5
     volatility_pct = (volatility / avg_price) * 100 if avg_price > 0 else 0
     
-    # Análisis de tendencia (simple)
-    mid_point = len(prices) // 2
-    first_half_avg = sum(prices[:mid_point]) / mid_point if mid_point > 0 else 0
-    second_half_avg = sum(prices[mid_point:]) / (len(prices) - mid_point)
+    # Análisis de tendencia (simple) y pendiente de la recta de regresión por muestra
     trend = "ALCISTA" if second_half_avg > first_half_avg else "BAJISTA"
+    trend_slope = _trend_slope(prices)
     
     return {
-        "data_points": len(prices),
-        "period_start": datetime.fromtimestamp(timestamps[0]).isoformat(),
-        "period_end": datetime.fromtimestamp(timestamps[-1]).isoformat(),
+        "data_points": prices.size,
+        "period_start": datetime.fromtimestamp(price_history[0]["timestamp"]).isoformat(),
+        "period_end": datetime.fromtimestamp(price_history[-1]["timestamp"]).isoformat(),
         "min_price": round(min_price, 4),
         "max_price": round(max_price, 4),
         "avg_price": round(avg_price, 4),
@@ -115,7 +146,8 @@ def analyze_price_data(price_history: List[Dict]) -> Dict:
         "price_change_pct": round(price_change_pct, 2),
         "volatility": round(volatility, 4),
         "volatility_pct": round(volatility_pct, 2),
-        "trend": trend
+        "trend": trend,
+        "trend_slope": round(trend_slope, 6)
     }
 
 
@@ -124,57 +156,157 @@ def analyze_trading_performance(trade_history: List[Dict], portfolio_history: Li
     if not trade_history:
         return {"message": "No hay trades para analizar"}
     
-    # Separar trades por simulación vs real
-    sim_trades = [t for t in trade_history if t.get("simulation")]
-    real_trades = [t for t in trade_history if not t.get("simulation")]
+    if PANDAS_AVAILABLE and len(trade_history) >= PANDAS_MIN_TRADES:
+        analysis = _analyze_trades_df(_trades_to_frame(trade_history))
+    else:
+        analysis = _analyze_trades(trade_history)
+    
+    # Análisis de portfolio si hay datos
+    if portfolio_history:
+        analysis["portfolio_analysis"] = _analyze_portfolio_performance(portfolio_history)
+    
+    return analysis
+
+
+def _analyze_trades(trade_history: List[Dict]) -> Dict:
+    # Una sola pasada: cada trade se acumula en su conjunto sin construir listas intermedias
+    sim_stats, real_stats = _TradeSetStats(), _TradeSetStats()
+    for t in trade_history:
+        (sim_stats if t.get("simulation") else real_stats).add(t)
     
     # Análisis por tipo
     analysis = {
         "total_trades": len(trade_history),
-        "simulation_trades": len(sim_trades),
-        "real_trades": len(real_trades)
+        "simulation_trades": sim_stats.count,
+        "real_trades": real_stats.count
     }
     
-    if sim_trades:
-        analysis["simulation_analysis"] = _analyze_trade_set(sim_trades)
+    if sim_stats.count:
+        analysis["simulation_analysis"] = sim_stats.as_dict()
     
-    if real_trades:
-        analysis["real_analysis"] = _analyze_trade_set(real_trades)
+    if real_stats.count:
+        analysis["real_analysis"] = real_stats.as_dict()
     
-    # Análisis de portfolio si hay datos
-    if portfolio_history:
-        analysis["portfolio_analysis"] = _analyze_portfolio_performance(portfolio_history)
+    return analysis
+
+
+def _trades_to_frame(trades: List[Dict]) -> "pd.DataFrame":
+    """Trades como columnas: ``side`` categórico y ``simulation`` booleano.
+
+    Los importes se quedan en float64: son sumas de dinero y float32 perdería
+    céntimos en los totales.
+    """
+    df = pd.DataFrame(trades)
+    if "side" in df:
+        df["side"] = df["side"].astype("category")
+    if "simulation" in df:
+        df["simulation"] = df["simulation"].fillna(False).astype(bool)
+    for column in ("price", "amount_sol", "value_usd", "fees_sol"):
+        if column in df:
+            df[column] = pd.to_numeric(df[column])
+    return df
+
+
+def _analyze_trades_df(df: "pd.DataFrame") -> Dict:
+    """Versión vectorizada de ``_analyze_trades`` sobre un DataFrame de trades"""
+    if "simulation" in df:
+        is_sim = df["simulation"].fillna(False).astype(bool)
+    else:
+        is_sim = pd.Series(False, index=df.index)
+    sim_df = df[is_sim]
+    real_df = df[~is_sim]
+    
+    analysis = {
+        "total_trades": len(df),
+        "simulation_trades": len(sim_df),
+        "real_trades": len(real_df)
+    }
+    
+    if len(sim_df):
+        analysis["simulation_analysis"] = _analyze_trade_set_df(sim_df)
+    
+    if len(real_df):
+        analysis["real_analysis"] = _analyze_trade_set_df(real_df)
     
     return analysis
 
 
+@dataclass(slots=True)
+class _TradeSetStats:
+    """Acumuladores de ``_analyze_trade_set``, alimentados trade a trade"""
+    count: int = 0
+    buy_n: int = 0
+    sell_n: int = 0
+    buy_price_sum: float = 0.0
+    sell_price_sum: float = 0.0
+    total_volume_sol: float = 0.0
+    total_volume_usd: float = 0.0
+    total_fees: float = 0.0
+    
+    def add(self, t: Dict) -> None:
+        self.count += 1
+        side = t["side"]
+        if side == "BUY":
+            self.buy_n += 1
+            self.buy_price_sum += t["price"]
+        elif side == "SELL":
+            self.sell_n += 1
+            self.sell_price_sum += t["price"]
+        self.total_volume_sol += t["amount_sol"]
+        self.total_volume_usd += t["value_usd"]
+        self.total_fees += t.get("fees_sol", 0)
+    
+    def as_dict(self) -> Dict:
+        # Precio promedio de compras y ventas
+        avg_buy_price = self.buy_price_sum / self.buy_n if self.buy_n else 0
+        avg_sell_price = self.sell_price_sum / self.sell_n if self.sell_n else 0
+        
+        return {
+            "total_trades": self.count,
+            "buy_trades": self.buy_n,
+            "sell_trades": self.sell_n,
+            "total_volume_sol": round(self.total_volume_sol, 4),
+            "total_volume_usd": round(self.total_volume_usd, 2),
+            "total_fees_sol": round(self.total_fees, 4),
+            "avg_buy_price": round(avg_buy_price, 2),
+            "avg_sell_price": round(avg_sell_price, 2),
+            "avg_trade_size_sol": round(self.total_volume_sol / self.count, 4)
+        }
+
+
 def _analyze_trade_set(trades: List[Dict]) -> Dict:
     """Analiza un conjunto de trades"""
     if not trades:
         return {}
     
-    buy_trades = [t for t in trades if t["side"] == "BUY"]
-    sell_trades = [t for t in trades if t["side"] == "SELL"]
-    
-    total_volume_sol = sum(t["amount_sol"] for t in trades)
-    total_volume_usd = sum(t["value_usd"] for t in trades)
-    
-    total_fees = sum(t.get("fees_sol", 0) for t in trades)
+    stats = _TradeSetStats()
+    for t in trades:
+        stats.add(t)
+    return stats.as_dict()
+
+
+def _analyze_trade_set_df(df: "pd.DataFrame") -> Dict:
+    """Como ``_analyze_trade_set`` pero con agregaciones de pandas"""
+    if df.empty:
+        return {}
     
-    # Precio promedio de compras y ventas
-    avg_buy_price = sum(t["price"] for t in buy_trades) / len(buy_trades) if buy_trades else 0
-    avg_sell_price = sum(t["price"] for t in sell_trades) / len(sell_trades) if sell_trades else 0
+    by_side = df.groupby("side", observed=True)["price"].agg(["size", "mean"])
+    sizes = by_side["size"]
+    means = by_side["mean"]
+    totals = df[["amount_sol", "value_usd"]].sum()
+    total_volume_sol = float(totals["amount_sol"])
+    total_fees = float(df["fees_sol"].fillna(0).sum()) if "fees_sol" in df else 0.0
     
     return {
-        "total_trades": len(trades),
-        "buy_trades": len(buy_trades),
-        "sell_trades": len(sell_trades),
+        "total_trades": len(df),
+        "buy_trades": int(sizes.get("BUY", 0)),
+        "sell_trades": int(sizes.get("SELL", 0)),
         "total_volume_sol": round(total_volume_sol, 4),
-        "total_volume_usd": round(total_volume_usd, 2),
+        "total_volume_usd": round(float(totals["value_usd"]), 2),
         "total_fees_sol": round(total_fees, 4),
-        "avg_buy_price": round(avg_buy_price, 2),
-        "avg_sell_price": round(avg_sell_price, 2),
-        "avg_trade_size_sol": round(total_volume_sol / len(trades), 4) if trades else 0
+        "avg_buy_price": round(float(means.get("BUY", 0)), 2),
+        "avg_sell_price": round(float(means.get("SELL", 0)), 2),
+        "avg_trade_size_sol": round(total_volume_sol / len(df), 4)
     }
 
 
@@ -198,20 +330,10 @@ def _analyze_portfolio_performance(portfolio_history: List[Dict]) -> Dict:
     final_unrealized_pnl = last_snapshot.get("unrealized_pnl", 0)
     total_pnl = final_realized_pnl + final_unrealized_pnl
     
-    # Máximo y mínimo valor del portfolio
-    all_values = [s.get("total_value_usd", 0) for s in portfolio_history]
-    max_value = max(all_values)
-    min_value = min(all_values)
-    
-    # Drawdown máximo
-    max_drawdown = 0
-    peak_value = 0
-    
-    for value in all_values:
-        if value > peak_value:
-            peak_value = value
-        drawdown = (peak_value - value) / peak_value if peak_value > 0 else 0
-        max_drawdown = max(max_drawdown, drawdown)
+    # Máximo, mínimo y drawdown máximo sobre los valores del portfolio
+    values = np.fromiter((s.get("total_value_usd", 0) for s in portfolio_history),
+                         dtype=np.float64, count=len(portfolio_history))
+    min_value, max_value, max_drawdown = _drawdown(values)
     
     return {
         "snapshots_analyzed": len(portfolio_history),
@@ -228,6 +350,34 @@ def _analyze_portfolio_performance(portfolio_history: List[Dict]) -> Dict:
     }
 
 
+def _price_stats(prices: np.ndarray) -> tuple:
+    """``(min, max, mean, std, first_half_mean, second_half_mean)``: kernel numba o NumPy"""
+    if NUMBA_AVAILABLE:
+        return tuple(float(v) for v in _analytics_kernels.price_stats(prices))
+    mid_point = prices.size // 2
+    first_half_avg = float(prices[:mid_point].mean()) if mid_point > 0 else 0
+    return (float(prices.min()), float(prices.max()), float(prices.mean()), float(prices.std()),
+            first_half_avg, float(prices[mid_point:].mean()))
+
+
+def _trend_slope(prices: np.ndarray) -> float:
+    """Pendiente de mínimos cuadrados de ``prices`` frente a su índice (la de ``np.polyfit(x, y, 1)``)"""
+    # x centrado: forma cerrada con dos productos escalares, sin el lstsq de polyfit
+    x = np.arange(prices.size, dtype=np.float64) - (prices.size - 1) / 2.0
+    return float(x @ prices / (x @ x))
+
+
+def _drawdown(values: np.ndarray) -> tuple:
+    """``(min, max, max_drawdown)``: kernel numba o NumPy"""
+    if NUMBA_AVAILABLE:
+        return tuple(float(v) for v in _analytics_kernels.drawdown(values))
+    # Drawdown máximo respecto al pico acumulado (picos <= 0 no cuentan)
+    peaks = np.maximum.accumulate(np.maximum(values, 0.0))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        drawdowns = np.where(peaks > 0, (peaks - values) / peaks, 0.0)
+    return float(values.min()), float(values.max()), float(drawdowns.max())
+
+
 def export_data_for_analysis(filepath: str = None) -> str:
     """
     Exporta todos los datos en formato CSV para análisis externo.
@@ -268,9 +418,9 @@ def backup_database(backup_path: str = None) -> str:
     Path(backup_path).parent.mkdir(parents=True, exist_ok=True)
     
     try:
-        # Copiar archivo de base de datos
-        import shutil
-        shutil.copy2(data_manager.db_path, backup_path)
+        # API de backup de SQLite (tras volcar el buffer): copiar solo el .db
+        # perdería lo que aún está en el -wal
+        data_manager.backup(backup_path)
         
         print(f"💾 Backup creado: {backup_path}")
         return backup_path
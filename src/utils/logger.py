@@ -1,32 +1,39 @@
+import atexit
 import csv
 import logging
+import os
+import queue
+import threading
+import time
 from pathlib import Path
-from typing import Dict
-from logging.handlers import RotatingFileHandler
+from typing import Any, Dict, List, Optional, TextIO, Tuple
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
 
 from rich.logging import RichHandler
 
 
-LOG_DIR = Path("logs")
-LOG_DIR.mkdir(exist_ok=True)
+# LOG_DIR cambia el directorio de logs (p. ej. en los tests)
+LOG_DIR = Path(os.getenv("LOG_DIR", "logs"))
+LOG_DIR.mkdir(parents=True, exist_ok=True)
 LOG_FILE = LOG_DIR / "trades.csv"
 APP_LOG_FILE = LOG_DIR / "trading_bot.log"
 
+# Columnas de trades.csv si el fichero es nuevo (las de un fichero existente se respetan)
+TRADE_FIELDS = ("side", "price", "quantity")
 
-def setup_logger() -> logging.Logger:
-    """Configure a logger with both console and file output with rotation."""
-    logger = logging.getLogger("bot")
-    logger.setLevel(logging.INFO)
-    
-    # Clear any existing handlers to avoid duplicates
-    logger.handlers.clear()
-    
+# Las filas se acumulan en memoria y se escriben juntas: al llegar a TRADE_FLUSH_BATCH
+# o, como mucho, TRADE_FLUSH_INTERVAL_SEC después de la primera pendiente
+TRADE_FLUSH_BATCH = 64
+TRADE_FLUSH_INTERVAL_SEC = 1.0
+
+
+def _build_handlers() -> List[logging.Handler]:
+    """Console (Rich) and rotating file handlers that do the actual log I/O."""
     # Console handler with Rich formatting
     console_handler = RichHandler(markup=True)
     console_handler.setLevel(logging.INFO)
     console_formatter = logging.Formatter("%(message)s")
     console_handler.setFormatter(console_formatter)
-    logger.addHandler(console_handler)
     
     # File handler with rotation - cuando el archivo llega a 10MB, 
     # se crea trading_bot.log.1, trading_bot.log.2, etc. 
@@ -43,16 +50,123 @@ def setup_logger() -> logging.Logger:
         datefmt="%Y-%m-%d %H:%M:%S"
     )
     file_handler.setFormatter(file_formatter)
-    logger.addHandler(file_handler)
+    return [console_handler, file_handler]
+
+
+# Un único QueueListener por proceso: las escrituras a consola/fichero ocurren en su
+# hilo, fuera del event loop; los loggers solo encolan registros
+_queue_handler: Optional[QueueHandler] = None
+_listener: Optional[QueueListener] = None
+
+
+def _get_queue_handler() -> QueueHandler:
+    global _queue_handler, _listener
+    if _queue_handler is None:
+        log_queue: "queue.SimpleQueue[logging.LogRecord]" = queue.SimpleQueue()
+        _listener = QueueListener(log_queue, *_build_handlers(), respect_handler_level=True)
+        _listener.start()
+        atexit.register(_listener.stop)  # vaciar la cola al salir
+        _queue_handler = QueueHandler(log_queue)
+    return _queue_handler
+
+
+def setup_logger() -> logging.Logger:
+    """Configure a logger with both console and file output with rotation.
+
+    Records are handed to a background ``QueueListener`` so handler I/O does
+    not block the caller (the bot's event loop).
+    """
+    logger = logging.getLogger("bot")
+    logger.setLevel(logging.INFO)
+    
+    # Clear any existing handlers to avoid duplicates
+    logger.handlers.clear()
+    logger.addHandler(_get_queue_handler())
     
     return logger
 
 
+# Fichero y writer de trades.csv abiertos una vez: sin stat()/open()/close() por trade
+_csv_fh: Optional[TextIO] = None
+_csv_writer: Optional[Any] = None  # csv.writer
+_csv_fields: Tuple[str, ...] = ()
+_csv_lock = threading.Lock()
+_pending: List[Dict[str, str]] = []
+_last_flush = time.monotonic()
+_flush_timer: Optional[threading.Timer] = None
+# Claves fuera de la cabecera ya avisadas (un aviso por clave, no por fila)
+_dropped_fields: set = set()
+
+
+def _open_trade_log(first_row: Dict[str, str]) -> Any:
+    global _csv_fh, _csv_writer, _csv_fields
+    _csv_fh = LOG_FILE.open("a+", newline="", buffering=1 << 16)
+    _csv_fh.seek(0)
+    header = _csv_fh.readline()
+    _csv_fh.seek(0, 2)
+    if header:
+        fieldnames = next(csv.reader([header]))
+    else:
+        fieldnames = list(TRADE_FIELDS) + [key for key in first_row if key not in TRADE_FIELDS]
+    # Cabecera fija: un csv.writer plano sobre esas columnas (sin la alineación por fila
+    # de DictWriter); filas con menos columnas quedan vacías, las desconocidas se descartan
+    # (con un aviso en el log, ver _flush_locked)
+    _csv_fields = tuple(fieldnames)
+    _csv_writer = csv.writer(_csv_fh)
+    if not header:
+        _csv_writer.writerow(_csv_fields)
+    return _csv_writer
+
+
 def log_trade(data: Dict[str, str]) -> None:
-    """Append trade information to the CSV log."""
-    write_header = not LOG_FILE.exists()
-    with LOG_FILE.open("a", newline="") as f:
-        writer = csv.DictWriter(f, fieldnames=data.keys())
-        if write_header:
-            writer.writeheader()
-        writer.writerow(data)
+    """Queue trade information for the CSV log (written in batches)."""
+    global _flush_timer
+    with _csv_lock:
+        _pending.append(dict(data))
+        if len(_pending) >= TRADE_FLUSH_BATCH or time.monotonic() - _last_flush >= TRADE_FLUSH_INTERVAL_SEC:
+            _flush_locked()
+        elif _flush_timer is None:
+            # Si no llegan más trades, el temporizador acota cuánto tarda en verse la fila
+            _flush_timer = threading.Timer(TRADE_FLUSH_INTERVAL_SEC, flush_trade_log)
+            _flush_timer.daemon = True
+            _flush_timer.start()
+
+
+def flush_trade_log() -> None:
+    """Write every pending trade row to the CSV now."""
+    with _csv_lock:
+        _flush_locked()
+
+
+def _flush_locked() -> None:
+    global _flush_timer, _last_flush
+    if _flush_timer is not None:
+        _flush_timer.cancel()
+        _flush_timer = None
+    _last_flush = time.monotonic()
+    if not _pending:
+        return
+    writer = _csv_writer or _open_trade_log(_pending[0])
+    fields = _csv_fields
+    unknown = {key for row in _pending for key in row}.difference(fields, _dropped_fields)
+    if unknown:
+        _dropped_fields.update(unknown)
+        logging.getLogger("bot").warning(
+            "Columnas no presentes en %s, se descartan: %s", LOG_FILE, ", ".join(sorted(unknown)))
+    writer.writerows([[row.get(name, "") for name in fields] for row in _pending])
+    _csv_fh.flush()
+    _pending.clear()
+
+
+@atexit.register
+def close_trade_log() -> None:
+    """Flush and close the trade CSV (reopened on the next ``log_trade``)."""
+    global _csv_fh, _csv_writer, _csv_fields
+    with _csv_lock:
+        _flush_locked()
+        if _csv_fh is not None:
+            _csv_fh.close()
+        _csv_fh = None
+        _csv_writer = None
+        _csv_fields = ()
+        _dropped_fields.clear()
@@ -2,16 +2,35 @@
 Wallet management with support for multiple derivation methods.
 """
 
+import asyncio
+import functools
 import os
 from typing import Optional, List, Dict
 from dataclasses import dataclass
 from solders.keypair import Keypair
+from solders.pubkey import Pubkey
 from solana.rpc.async_api import AsyncClient
 from solana.rpc.commitment import Confirmed
-from mnemonic import Mnemonic
+from .keys import english_mnemonic
 import hashlib
 import hmac
 
+# Peticiones getBalance simultáneas si hay que comprobar las cuentas una a una
+MAX_CONCURRENT_BALANCE_CHECKS = 8
+
+
+@functools.lru_cache(maxsize=64)
+def _seed_with_passphrase(mnemonic: str, passphrase: str = "") -> bytes:
+    # PBKDF2-HMAC-SHA512 con 2048 iteraciones: lo caro de cada derivación
+    return english_mnemonic().to_seed(mnemonic, passphrase)
+
+
+@functools.lru_cache(maxsize=1024)
+def _keypair_from_seed(seed: bytes) -> Keypair:
+    # La clave ed25519 (multiplicación escalar) cuesta ~8x el SHA256/HMAC que produce la semilla;
+    # la cache va por semilla derivada, nunca por el mnemonic
+    return Keypair.from_seed(seed)
+
 
 @dataclass
 class WalletAccount:
@@ -40,16 +59,28 @@ class MultiWallet:
         self.mnemonic = mnemonic
         self.rpc_endpoint = rpc_endpoint
         self.client = AsyncClient(rpc_endpoint)
-        self.mnemo = Mnemonic("english")
+        self.mnemo = english_mnemonic()
         self.accounts: List[WalletAccount] = []
+        self._standard_accounts: Dict[int, WalletAccount] = {}
         
         # Validate mnemonic
         if not self.mnemo.check(mnemonic):
             raise ValueError("Invalid mnemonic phrase")
     
+    @functools.cached_property
+    def _base_seed(self) -> bytes:
+        """BIP39 seed without passphrase, computed once per wallet"""
+        return _seed_with_passphrase(self.mnemonic, "")
+    
     def derive_standard_account(self, account_index: int = 0) -> WalletAccount:
         """Derive account using Phantom's standard ED25519 method"""
-        from src.config import derive_private_key_from_mnemonic
+        cached = self._standard_accounts.get(account_index)
+        if cached is None:
+            cached = self._standard_accounts[account_index] = self._derive_standard_account(account_index)
+        return cached
+    
+    def _derive_standard_account(self, account_index: int) -> WalletAccount:
+        from src.keys import derive_private_key_from_mnemonic
         
         # Use the same derivation logic as config.py
         private_key_array = derive_private_key_from_mnemonic(self.mnemonic)
@@ -62,8 +93,7 @@ class MultiWallet:
             )
         else:
             # Fallback to old method
-            seed = self.mnemo.to_seed(self.mnemonic)
-            keypair = Keypair.from_seed(seed[:32])
+            keypair = _keypair_from_seed(self._base_seed[:32])
             return WalletAccount(
                 keypair=keypair,
                 derivation_method="standard_fallback",
@@ -73,12 +103,12 @@ class MultiWallet:
     def derive_phantom_style_accounts(self, max_accounts: int = 10) -> List[WalletAccount]:
         """Derive multiple accounts using Phantom-style derivation methods"""
         accounts = []
-        base_seed = self.mnemo.to_seed(self.mnemonic)
+        base_seed = self._base_seed
         
         for account_index in range(max_accounts):
             # Method 1: SHA256 hash with account index
             account_seed = hashlib.sha256(base_seed + account_index.to_bytes(4, 'little')).digest()
-            keypair1 = Keypair.from_seed(account_seed[:32])
+            keypair1 = _keypair_from_seed(account_seed[:32])
             accounts.append(WalletAccount(
                 keypair=keypair1,
                 derivation_method=f"sha256_account_{account_index}",
@@ -87,7 +117,7 @@ class MultiWallet:
             
             # Method 2: HMAC derivation
             hmac_seed = hmac.new(base_seed, account_index.to_bytes(4, 'big'), hashlib.sha256).digest()
-            keypair2 = Keypair.from_seed(hmac_seed[:32])
+            keypair2 = _keypair_from_seed(hmac_seed[:32])
             accounts.append(WalletAccount(
                 keypair=keypair2,
                 derivation_method=f"hmac_account_{account_index}",
@@ -97,7 +127,7 @@ class MultiWallet:
             # Method 3: Seed offset (if available)
             offset = account_index * 32
             if offset + 32 <= len(base_seed):
-                keypair3 = Keypair.from_seed(base_seed[offset:offset+32])
+                keypair3 = _keypair_from_seed(base_seed[offset:offset+32])
                 accounts.append(WalletAccount(
                     keypair=keypair3,
                     derivation_method=f"offset_account_{account_index}",
@@ -112,8 +142,8 @@ class MultiWallet:
         
         for passphrase in passphrases:
             try:
-                seed = self.mnemo.to_seed(self.mnemonic, passphrase)
-                keypair = Keypair.from_seed(seed[:32])
+                seed = _seed_with_passphrase(self.mnemonic, passphrase)
+                keypair = _keypair_from_seed(seed[:32])
                 accounts.append(WalletAccount(
                     keypair=keypair,
                     derivation_method=f"passphrase_{passphrase or 'empty'}",
@@ -145,29 +175,23 @@ class MultiWallet:
         logger = setup_logger()
         logger.info(f"🔍 Scanning {len(all_accounts)} derived accounts...")
         
+        # Comparar con la dirección objetivo no requiere red: primero
+        # (decodificada una vez: se comparan los 32 bytes, sin codificar cada clave en base58)
+        target = _parse_pubkey(target_address) if target_address else None
+        if target is not None:
+            for account in all_accounts:
+                if account.public_key == target:
+                    logger.info(f"✅ Found target address: {target_address}")
+                    logger.info(f"   Derivation: {account.derivation_method}")
+                    return account
+        
         found_accounts = []
         
-        for account in all_accounts:
-            address = str(account.public_key)
-            
-            # Check if this matches target address
-            if target_address and address == target_address:
-                logger.info(f"✅ Found target address: {address}")
+        for account, balance_sol in zip(all_accounts, await self._get_balances(all_accounts, logger)):
+            if balance_sol:
+                found_accounts.append((account, balance_sol))
+                logger.info(f"💰 Found account with {balance_sol:.6f} SOL: {account.public_key}")
                 logger.info(f"   Derivation: {account.derivation_method}")
-                return account
-            
-            # Check balance
-            try:
-                response = await self.client.get_balance(account.public_key, commitment=Confirmed)
-                balance_sol = response.value / 1e9
-                
-                if balance_sol > 0:
-                    found_accounts.append((account, balance_sol))
-                    logger.info(f"💰 Found account with {balance_sol:.6f} SOL: {address}")
-                    logger.info(f"   Derivation: {account.derivation_method}")
-            except Exception as e:
-                logger.error(f"❌ Error checking {address}: {e}")
-                continue
         
         # Return account with highest balance, or target address match
         if found_accounts:
@@ -176,6 +200,32 @@ class MultiWallet:
         
         return None
     
+    async def _get_balances(self, accounts: List[WalletAccount], logger) -> List[Optional[float]]:
+        """SOL balance per account (``None`` where the lookup failed)"""
+        from src.execution.capital_manager import get_balances_batch
+        
+        pubkeys = [account.public_key for account in accounts]
+        try:
+            # Una sola llamada getMultipleAccounts para todas las derivaciones
+            # (algunos métodos coinciden en la misma clave: se piden una vez)
+            balances = await get_balances_batch(self.client, list(dict.fromkeys(pubkeys)))
+            return [balances[pk] for pk in pubkeys]
+        except Exception as e:
+            logger.warning(f"⚠️ Batch balance lookup failed ({e}), checking accounts one by one")
+        
+        semaphore = asyncio.Semaphore(MAX_CONCURRENT_BALANCE_CHECKS)
+        
+        async def check(pubkey) -> Optional[float]:
+            async with semaphore:
+                try:
+                    response = await self.client.get_balance(pubkey, commitment=Confirmed)
+                    return response.value / 1e9
+                except Exception as e:
+                    logger.error(f"❌ Error checking {pubkey}: {e}")
+                    return None
+        
+        return await asyncio.gather(*(check(pk) for pk in pubkeys))
+    
     async def get_account_info(self, account: WalletAccount) -> Dict:
         """Get detailed account information"""
         try:
@@ -202,6 +252,14 @@ class MultiWallet:
         await self.client.close()
 
 
+def _parse_pubkey(address: str) -> Optional[Pubkey]:
+    """Pubkey for a base58 ``address``, ``None`` if it is not a valid one"""
+    try:
+        return Pubkey.from_string(address)
+    except ValueError:
+        return None
+
+
 # Helper function for config integration
 def find_correct_private_key_from_mnemonic(mnemonic: str, rpc_endpoint: str, target_address: str) -> Optional[str]:
     """
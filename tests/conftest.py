@@ -0,0 +1,36 @@
+import os
+import shutil
+import tempfile
+
+import pytest
+
+# Antes de importar src: la DataManager global y los logs van a un directorio temporal,
+# no a data/storage ni a logs/ del repo
+_TEST_ROOT = tempfile.mkdtemp(prefix="trade_agent_tests_")
+os.environ.setdefault("DATA_DIR", os.path.join(_TEST_ROOT, "storage"))
+os.environ.setdefault("LOG_DIR", os.path.join(_TEST_ROOT, "logs"))
+
+
+def pytest_addoption(parser):
+    parser.addoption(
+        "--run-network", action="store_true", default=False,
+        help="run the tests marked 'network' (live Jupiter/Pyth/RPC requests)",
+    )
+
+
+def pytest_configure(config):
+    config.addinivalue_line("markers", "network: test talks to live external services (opt in with --run-network)")
+
+
+def pytest_collection_modifyitems(config, items):
+    # Las peticiones reales añaden latencia y fallos intermitentes: solo bajo demanda
+    if config.getoption("--run-network"):
+        return
+    skip_network = pytest.mark.skip(reason="network test: pass --run-network to run it")
+    for item in items:
+        if "network" in item.keywords:
+            item.add_marker(skip_network)
+
+
+def pytest_unconfigure(config):
+    shutil.rmtree(_TEST_ROOT, ignore_errors=True)
@@ -5,6 +5,12 @@ from src.execution.capital_manager import TradingCapitalManager, CapitalStatus
 from src.config import settings
 
 
+@pytest.fixture(scope="module")
+def portfolio():
+    """Portfolio shared by the read-only tests (tests that trade build their own)."""
+    return Portfolio()
+
+
 def test_portfolio_capital_management():
     """Test portfolio capital management functionality."""
     
@@ -27,15 +33,6 @@ def test_portfolio_capital_management():
     print(f"  Max Trade Size: {max_trade_size:.4f} SOL")
     print(f"  Available Capital: {available_capital:.4f} SOL")
     
-    # Test trade validation
-    test_trade_sizes = [0.01, 0.05, 0.08, 0.1, 0.15]
-    
-    print(f"\nTrade Size Validation:")
-    for trade_size in test_trade_sizes:
-        validation = portfolio.validate_trade_size(trade_size)
-        status = "✅" if validation["valid"] else "❌"
-        print(f"  {trade_size:.3f} SOL: {status} {validation['reason']}")
-    
     # Test position tracking
     print(f"\nTesting Position Tracking:")
     
@@ -58,7 +55,43 @@ def test_portfolio_capital_management():
     print(f"✅ Capital management test passed!")
 
 
-def test_trading_capital_configuration():
+# (tamaño, válido) con 0.1 SOL de capital y 80% de posición máxima: límite 0.08 SOL
+TRADE_SIZES = [(0.01, True), (0.05, True), (0.08, True), (0.1, False), (0.15, False)]
+
+
+@pytest.mark.parametrize("trade_size, expected", TRADE_SIZES)
+def test_trade_size_validation(trade_size, expected):
+    """Test that a trade is valid exactly when it fits the position limit (0.08 SOL)."""
+    with pytest.MonkeyPatch.context() as mp:
+        mp.setattr(settings, "trading_capital_sol", 0.1)
+        mp.setattr(settings, "max_position_size_pct", 80.0)
+        portfolio = Portfolio()
+        validation = portfolio.validate_trade_size(trade_size)
+    assert validation.valid is expected, validation.reason
+    if not expected:
+        assert validation.suggested_size == pytest.approx(0.08)
+
+
+def test_portfolio_limits_follow_trading_capital():
+    """Test that the portfolio limits use the current trading capital, not the one at creation."""
+    with pytest.MonkeyPatch.context() as mp:
+        mp.setattr(settings, "trading_capital_sol", 0.1)
+        mp.setattr(settings, "max_position_size_pct", 80.0)
+        portfolio = Portfolio()
+        portfolio.trading_capital = 1.0
+        assert portfolio.calculate_max_trade_size() == 0.8
+        assert portfolio.validate_trade_size(0.5).valid, "Raised capital should allow larger trades"
+        rejected = portfolio.validate_trade_size(0.9)
+        assert not rejected.valid and rejected.reason.startswith("Exceeds max position size")
+        assert rejected.suggested_size == 0.8
+        
+        mp.setattr(settings, "max_position_size_pct", 150.0)
+        rejected = portfolio.validate_trade_size(1.2)
+        assert rejected.reason.startswith("Exceeds trading capital")
+        assert rejected.suggested_size == 1.0
+
+
+def test_trading_capital_configuration(portfolio):
     """Test trading capital configuration from environment."""
     
     print(f"\n🔧 TESTING CAPITAL CONFIGURATION")
@@ -75,7 +108,6 @@ def test_trading_capital_configuration():
     assert settings.reserve_balance_sol >= 0, "Reserve balance must be non-negative"
     
     # Test that portfolio uses these settings
-    portfolio = Portfolio()
     assert portfolio.trading_capital == settings.trading_capital_sol, "Portfolio should use configured trading capital"
     
     max_position_sol = portfolio.trading_capital * (settings.max_position_size_pct / 100.0)
@@ -85,24 +117,22 @@ def test_trading_capital_configuration():
     print(f"✅ Configuration validation passed!")
 
 
-def test_capital_safety_limits():
+def test_capital_safety_limits(portfolio):
     """Test that capital management prevents over-allocation."""
     
     print(f"\n🛡️ TESTING SAFETY LIMITS")
     print("=" * 50)
     
-    portfolio = Portfolio()
-    
     # Try to make a trade larger than trading capital
     oversized_trade = portfolio.trading_capital + 0.01
     validation = portfolio.validate_trade_size(oversized_trade)
     
     print(f"Oversized trade validation:")
     print(f"  Trade size: {oversized_trade:.4f} SOL")
-    print(f"  Valid: {validation['valid']}")
-    print(f"  Reason: {validation['reason']}")
+    print(f"  Valid: {validation.valid}")
+    print(f"  Reason: {validation.reason}")
     
-    assert not validation["valid"], "Oversized trades should be rejected"
+    assert not validation.valid, "Oversized trades should be rejected"
     
     # Try to exceed max position size
     max_position_pct = settings.max_position_size_pct
@@ -114,22 +144,21 @@ def test_capital_safety_limits():
     print(f"\nMax position size validation:")
     print(f"  Trade size: {oversized_position:.4f} SOL")
     print(f"  Max allowed: {max_position_sol:.4f} SOL")
-    print(f"  Valid: {validation2['valid']}")
-    print(f"  Reason: {validation2['reason']}")
+    print(f"  Valid: {validation2.valid}")
+    print(f"  Reason: {validation2.reason}")
     
-    assert not validation2["valid"], "Trades exceeding max position should be rejected"
+    assert not validation2.valid, "Trades exceeding max position should be rejected"
     
     print(f"✅ Safety limits test passed!")
 
 
-def test_capital_management_with_real_config():
+def test_capital_management_with_real_config(portfolio):
     """Test capital management with real configuration."""
     
     print(f"\n💼 TESTING WITH REAL CONFIG")
     print("=" * 50)
     
     # Show current configuration
-    portfolio = Portfolio()
     capital_info = portfolio.as_dict()
     
     print(f"Current Configuration:")
@@ -150,14 +179,166 @@ def test_capital_management_with_real_config():
     for name, pct in scenarios:
         trade_size = portfolio.trading_capital * pct
         validation = portfolio.validate_trade_size(trade_size)
-        status = "✅" if validation["valid"] else "❌"
+        status = "✅" if validation.valid else "❌"
         print(f"  {name} ({pct*100}%): {trade_size:.4f} SOL {status}")
     
     print(f"✅ Real config test completed!")
 
 
+def test_portfolio_snapshot_cache():
+    """Test that the cached snapshot is rebuilt only when the portfolio changes."""
+    
+    print(f"\n🗂️ TESTING PORTFOLIO SNAPSHOT CACHE")
+    print("=" * 50)
+    
+    portfolio = Portfolio()
+    
+    first = portfolio.snapshot
+    assert portfolio.snapshot is first, "Snapshot should be reused while nothing changes"
+    assert first == portfolio.as_dict(), "Snapshot should match as_dict()"
+    
+    portfolio.update_from_trade("BUY", 0.05, 200.0)
+    second = portfolio.snapshot
+    assert second is not first, "Trades should invalidate the snapshot"
+    assert second == portfolio.as_dict(), "Rebuilt snapshot should match as_dict()"
+    
+    portfolio.update_price(210.0)
+    if settings.simulation_mode:
+        assert portfolio.snapshot is not second, "Price updates should invalidate the snapshot"
+    
+    print(f"✅ Snapshot cache test passed!")
+
+
+def test_wallet_balance_cache():
+    """Test that the wallet balance is fetched once per TTL and refreshed after swaps."""
+    import asyncio
+    from types import SimpleNamespace
+    from solders.keypair import Keypair
+    from src.execution import capital_manager
+    
+    print(f"\n💰 TESTING WALLET BALANCE CACHE")
+    print("=" * 50)
+    
+    class FakeRpc:
+        def __init__(self):
+            self.calls = 0
+        
+        async def get_balance(self, pubkey, commitment=None):
+            self.calls += 1
+            await asyncio.sleep(0.01)
+            return SimpleNamespace(value=int(0.5e9) * self.calls)
+    
+    async def run():
+        rpc = FakeRpc()
+        manager = TradingCapitalManager(Keypair(), rpc)
+        statuses = await asyncio.gather(*(manager.get_capital_status() for _ in range(3)))
+        assert [s.total_wallet_balance for s in statuses] == [0.5, 0.5, 0.5]
+        assert rpc.calls == 1, "Concurrent status queries should share one RPC call"
+        
+        await manager.get_capital_status()
+        assert rpc.calls == 1, "Balance should be reused within the TTL"
+        
+        capital_manager.invalidate_balances()
+        assert (await manager.get_capital_status()).total_wallet_balance == 1.0
+        manager.invalidate_balance()
+        assert (await manager.get_capital_status()).total_wallet_balance == 1.5
+        assert rpc.calls == 3, "Invalidation should force a fresh RPC call"
+    
+    asyncio.run(run())
+    print(f"✅ Wallet balance cache test passed!")
+
+
+def test_batch_balance_refresh():
+    """Test that the registry refreshes several wallets with one RPC call."""
+    import asyncio
+    from types import SimpleNamespace
+    from solders.keypair import Keypair
+    from src.execution.capital_manager import CapitalManagerRegistry, TradingCapitalManager
+    
+    print(f"\n💰 TESTING BATCHED BALANCE REFRESH")
+    print("=" * 50)
+    
+    class FakeRpc:
+        def __init__(self, lamports):
+            self.lamports = lamports
+            self.batch_calls = 0
+            self.balance_calls = 0
+        
+        async def get_multiple_accounts(self, pubkeys, commitment=None, data_slice=None):
+            self.batch_calls += 1
+            return SimpleNamespace(value=[
+                SimpleNamespace(lamports=self.lamports[pk]) if pk in self.lamports else None
+                for pk in pubkeys
+            ])
+        
+        async def get_balance(self, pubkey, commitment=None):
+            self.balance_calls += 1
+            return SimpleNamespace(value=self.lamports.get(pubkey, 0))
+    
+    async def run():
+        keypairs = [Keypair() for _ in range(3)]
+        rpc = FakeRpc({keypairs[0].pubkey(): int(1e9), keypairs[1].pubkey(): int(2.5e9)})
+        registry = CapitalManagerRegistry()
+        managers = [registry.register(TradingCapitalManager(kp, rpc)) for kp in keypairs]
+        
+        balances = await registry.refresh()
+        assert rpc.batch_calls == 1, "All wallets should be fetched in one RPC call"
+        assert balances[keypairs[1].pubkey()] == 2.5
+        assert balances[keypairs[2].pubkey()] == 0.0, "Missing accounts should report 0 SOL"
+        
+        statuses = [await m.get_capital_status() for m in managers]
+        assert [s.total_wallet_balance for s in statuses] == [1.0, 2.5, 0.0]
+        assert rpc.balance_calls == 0, "Refreshed balances should be served from the cache"
+    
+    asyncio.run(run())
+    print(f"✅ Batched balance refresh test passed!")
+
+
+
+def test_manager_validation_reads_current_limits():
+    """Test that TradingCapitalManager derives its limits from the current attributes."""
+    from solders.keypair import Keypair
+    
+    print(f"\n📏 TESTING MANAGER TRADE VALIDATION")
+    print("=" * 50)
+    
+    manager = TradingCapitalManager(Keypair(), None)
+    manager.trading_capital = 1.0
+    manager.max_position_size_pct = 50.0
+    
+    assert manager.validate_trade_size(0.4) == (True, "Trade size is valid", 0.5, 0.4)
+    rejected = manager.validate_trade_size(0.4, current_position=0.2)
+    assert not rejected.valid and "max position size" in rejected.reason
+    assert rejected.suggested_size == pytest.approx(0.3)
+    print(f"✅ Max position size limit applied: {rejected.reason}")
+    
+    # Tamaño de posición y resumen salen de los mismos valores actuales
+    manager.reserve_balance = 0.1
+    assert manager.calculate_position_size(1.0) == 0.5
+    summary = manager.get_capital_summary()
+    assert summary["max_position_size_sol"] == 0.5
+    assert summary["min_wallet_balance_needed"] == 1.1
+    
+    # Con más del 100% manda el capital de trading
+    manager.max_position_size_pct = 200.0
+    assert manager.validate_trade_size(0.6).valid, "Raised limit should be picked up without rebuilding"
+    rejected = manager.validate_trade_size(1.2)
+    assert not rejected.valid and "trading capital" in rejected.reason
+    assert rejected.suggested_size == 1.0
+    print(f"✅ Trading capital limit applied: {rejected.reason}")
+    
+    print(f"✅ Manager trade validation test passed!")
+
 if __name__ == "__main__":
-    test_trading_capital_configuration()
+    shared = Portfolio()
+    test_trading_capital_configuration(shared)
     test_portfolio_capital_management()
-    test_capital_safety_limits()
-    test_capital_management_with_real_config()
\ No newline at end of file
+    for size, expected in TRADE_SIZES:
+        test_trade_size_validation(size, expected)
+    test_portfolio_limits_follow_trading_capital()
+    test_capital_safety_limits(shared)
+    test_capital_management_with_real_config(shared)
+    test_portfolio_snapshot_cache()
+    test_wallet_balance_cache()
+    test_batch_balance_refresh()
+    test_manager_validation_reads_current_limits()
@@ -1,279 +1,537 @@
 import pytest
+import json
 import os
 import tempfile
 import sqlite3
 import time
+from pathlib import Path
 from src.data.data_manager import DataManager, PriceData, TradeData, PortfolioSnapshot
 from src.utils.data_analytics import generate_trading_report, backup_database, print_quick_stats
 
 
-def test_data_manager_initialization():
+@pytest.fixture
+def db_path(tmp_path):
+    """Fresh database per test: in memory with FAST_TESTS=1, otherwise a file under tmp_path.
+
+    Every test gets its own database, so the module is safe to run in parallel
+    (``pytest -n auto`` with pytest-xdist).
+    """
+    return ":memory:" if os.getenv("FAST_TESTS") else str(tmp_path / "trading_data.db")
+
+
+def _fresh_tmp_path() -> Path:
+    """``tmp_path`` equivalent for running this file directly."""
+    return Path(tempfile.mkdtemp())
+
+
+def _fresh_db_path() -> str:
+    """``db_path`` equivalent for running this file directly."""
+    return ":memory:" if os.getenv("FAST_TESTS") else str(_fresh_tmp_path() / "trading_data.db")
+
+
+def test_data_manager_initialization(tmp_path):
     """Test DataManager initialization and database creation."""
     
     print(f"\n💾 TESTING DATA MANAGER INITIALIZATION")
     print("=" * 50)
     
     # Create temporary database for testing
-    with tempfile.NamedTemporaryFile(suffix='.db', delete=False) as tmp_file:
-        temp_db_path = tmp_file.name
+    temp_db_path = str(tmp_path / "test.db")
     
-    try:
-        # Initialize DataManager with custom path
-        dm = DataManager(db_path=temp_db_path)
-        
-        print(f"Database created at: {temp_db_path}")
-        print(f"Database exists: {os.path.exists(temp_db_path)}")
-        
-        # Verify database file was created
-        assert os.path.exists(temp_db_path), "Database file should be created"
-        
-        # Verify tables were created
-        with sqlite3.connect(temp_db_path) as conn:
-            cursor = conn.execute("SELECT name FROM sqlite_master WHERE type='table';")
-            tables = [row[0] for row in cursor.fetchall()]
-            
-            expected_tables = ['price_data', 'trade_data', 'portfolio_snapshots']
-            for table in expected_tables:
-                assert table in tables, f"Table {table} should exist"
-                print(f"✅ Table {table} created")
-        
-        print(f"✅ DataManager initialization test passed!")
-        
-    finally:
-        # Clean up
-        if os.path.exists(temp_db_path):
-            os.unlink(temp_db_path)
+    # Initialize DataManager with custom path
+    dm = DataManager(db_path=temp_db_path)
+    
+    print(f"Database created at: {temp_db_path}")
+    print(f"Database exists: {os.path.exists(temp_db_path)}")
+    
+    # Verify database file was created
+    assert os.path.exists(temp_db_path), "Database file should be created"
+    
+    # Verify tables were created
+    with sqlite3.connect(temp_db_path) as conn:
+        cursor = conn.execute("SELECT name FROM sqlite_master WHERE type='table';")
+        tables = [row[0] for row in cursor.fetchall()]
+        
+        expected_tables = ['price_data', 'trade_data', 'portfolio_snapshots']
+        for table in expected_tables:
+            assert table in tables, f"Table {table} should exist"
+            print(f"✅ Table {table} created")
+        
+        # WAL es persistente en el fichero: cualquier conexión nueva lo ve
+        journal_mode = conn.execute("PRAGMA journal_mode").fetchone()[0]
+        print(f"Journal mode: {journal_mode}")
+        assert journal_mode == "wal", "DataManager should switch the database to WAL"
+    
+    print(f"✅ DataManager initialization test passed!")
 
 
-def test_price_data_persistence():
+def test_price_data_persistence(db_path):
     """Test saving and retrieving price data."""
     
     print(f"\n💰 TESTING PRICE DATA PERSISTENCE")
     print("=" * 50)
     
-    with tempfile.NamedTemporaryFile(suffix='.db', delete=False) as tmp_file:
-        temp_db_path = tmp_file.name
+    dm = DataManager(db_path=db_path)
     
-    try:
-        dm = DataManager(db_path=temp_db_path)
-        
-        # Save test price data
-        test_prices = [
-            (200.50, "mock", 1000000, 50000000),
-            (201.25, "aggregated", 1100000, 51000000),
-            (199.80, "pyth", 950000, 49000000)
-        ]
-        
-        for price, source, volume, market_cap in test_prices:
-            success = dm.save_price_data(
-                price=price,
-                source=source,
-                volume_24h=volume,
-                market_cap=market_cap,
-                metadata={"test": True}
-            )
-            assert success, f"Should save price {price} from {source}"
-            print(f"💾 Saved: {price} USD from {source}")
-        
-        # Retrieve price history
-        price_history = dm.get_price_history(hours=1)  # Last hour
-        
-        print(f"Retrieved {len(price_history)} price records")
-        assert len(price_history) == 3, "Should retrieve all 3 price records"
-        
-        # Verify data integrity
-        for i, record in enumerate(price_history):
-            expected_price, expected_source, _, _ = test_prices[i]
-            assert record["price"] == expected_price, f"Price should match"
-            assert record["source"] == expected_source, f"Source should match"
-            assert record["metadata"]["test"] == True, f"Metadata should be preserved"
-            print(f"✅ Record {i+1}: {record['price']} USD from {record['source']}")
-        
-        print(f"✅ Price data persistence test passed!")
-        
-    finally:
-        if os.path.exists(temp_db_path):
-            os.unlink(temp_db_path)
+    # Save test price data
+    test_prices = [
+        (200.50, "mock", 1000000, 50000000),
+        (201.25, "aggregated", 1100000, 51000000),
+        (199.80, "pyth", 950000, 49000000)
+    ]
+    
+    for price, source, volume, market_cap in test_prices:
+        success = dm.save_price_data(
+            price=price,
+            source=source,
+            volume_24h=volume,
+            market_cap=market_cap,
+            metadata={"test": True}
+        )
+        assert success, f"Should save price {price} from {source}"
+        print(f"💾 Saved: {price} USD from {source}")
+    
+    # Retrieve price history
+    price_history = dm.get_price_history(hours=1)  # Last hour
+    
+    print(f"Retrieved {len(price_history)} price records")
+    assert len(price_history) == 3, "Should retrieve all 3 price records"
+    
+    # Verify data integrity
+    for i, record in enumerate(price_history):
+        expected_price, expected_source, _, _ = test_prices[i]
+        assert record["price"] == expected_price, f"Price should match"
+        assert record["source"] == expected_source, f"Source should match"
+        assert record["metadata"]["test"] == True, f"Metadata should be preserved"
+        print(f"✅ Record {i+1}: {record['price']} USD from {record['source']}")
+    
+    print(f"✅ Price data persistence test passed!")
 
 
-def test_trade_data_persistence():
+def test_trade_data_persistence(db_path):
     """Test saving and retrieving trade data."""
     
     print(f"\n🔄 TESTING TRADE DATA PERSISTENCE")
     print("=" * 50)
     
-    with tempfile.NamedTemporaryFile(suffix='.db', delete=False) as tmp_file:
-        temp_db_path = tmp_file.name
+    dm = DataManager(db_path=db_path)
     
-    try:
-        dm = DataManager(db_path=temp_db_path)
-        
-        # Save test trade data
-        test_trades = [
-            ("BUY", 0.5, 200.0, 100.0, 0.0025, True, 0.2),   # Simulation buy
-            ("SELL", 0.3, 210.0, 63.0, 0.0015, True, 0.1),   # Simulation sell
-            ("BUY", 0.1, 205.0, 20.5, 0.0005, False, 0.15)   # Real buy
-        ]
-        
-        for side, amount, price, value, fees, simulation, slippage in test_trades:
-            success = dm.save_trade_data(
-                side=side,
-                amount_sol=amount,
-                price=price,
-                value_usd=value,
-                fees_sol=fees,
-                simulation=simulation,
-                slippage_pct=slippage,
-                portfolio_value_before=100.0,
-                portfolio_value_after=110.0,
-                metadata={"test_trade": True}
-            )
-            assert success, f"Should save {side} trade"
-            print(f"💾 Saved: {side} {amount} SOL @ ${price} ({'SIM' if simulation else 'REAL'})")
-        
-        # Retrieve all trades
-        all_trades = dm.get_trade_history(hours=1)
-        assert len(all_trades) == 3, "Should retrieve all 3 trades"
-        print(f"Retrieved {len(all_trades)} total trades")
-        
-        # Retrieve only simulation trades
-        sim_trades = dm.get_trade_history(simulation=True, hours=1)
-        assert len(sim_trades) == 2, "Should retrieve 2 simulation trades"
-        print(f"Retrieved {len(sim_trades)} simulation trades")
-        
-        # Retrieve only real trades
-        real_trades = dm.get_trade_history(simulation=False, hours=1)
-        assert len(real_trades) == 1, "Should retrieve 1 real trade"
-        print(f"Retrieved {len(real_trades)} real trades")
-        
-        # Verify trade data
-        for trade in all_trades:
-            assert trade["side"] in ["BUY", "SELL"], "Valid trade side"
-            assert trade["amount_sol"] > 0, "Positive amount"
-            assert trade["price"] > 0, "Positive price"
-            print(f"✅ Trade: {trade['side']} {trade['amount_sol']} SOL @ ${trade['price']}")
-        
-        print(f"✅ Trade data persistence test passed!")
-        
-    finally:
-        if os.path.exists(temp_db_path):
-            os.unlink(temp_db_path)
+    # Save test trade data
+    test_trades = [
+        ("BUY", 0.5, 200.0, 100.0, 0.0025, True, 0.2),   # Simulation buy
+        ("SELL", 0.3, 210.0, 63.0, 0.0015, True, 0.1),   # Simulation sell
+        ("BUY", 0.1, 205.0, 20.5, 0.0005, False, 0.15)   # Real buy
+    ]
+    
+    for side, amount, price, value, fees, simulation, slippage in test_trades:
+        success = dm.save_trade_data(
+            side=side,
+            amount_sol=amount,
+            price=price,
+            value_usd=value,
+            fees_sol=fees,
+            simulation=simulation,
+            slippage_pct=slippage,
+            portfolio_value_before=100.0,
+            portfolio_value_after=110.0,
+            metadata={"test_trade": True}
+        )
+        assert success, f"Should save {side} trade"
+        print(f"💾 Saved: {side} {amount} SOL @ ${price} ({'SIM' if simulation else 'REAL'})")
+    
+    # Retrieve all trades
+    all_trades = dm.get_trade_history(hours=1)
+    assert len(all_trades) == 3, "Should retrieve all 3 trades"
+    print(f"Retrieved {len(all_trades)} total trades")
+    
+    # Retrieve only simulation trades
+    sim_trades = dm.get_trade_history(simulation=True, hours=1)
+    assert len(sim_trades) == 2, "Should retrieve 2 simulation trades"
+    print(f"Retrieved {len(sim_trades)} simulation trades")
+    
+    # Retrieve only real trades
+    real_trades = dm.get_trade_history(simulation=False, hours=1)
+    assert len(real_trades) == 1, "Should retrieve 1 real trade"
+    print(f"Retrieved {len(real_trades)} real trades")
+    
+    # Verify trade data
+    for trade in all_trades:
+        assert trade["side"] in ["BUY", "SELL"], "Valid trade side"
+        assert trade["amount_sol"] > 0, "Positive amount"
+        assert trade["price"] > 0, "Positive price"
+        print(f"✅ Trade: {trade['side']} {trade['amount_sol']} SOL @ ${trade['price']}")
+    
+    print(f"✅ Trade data persistence test passed!")
 
 
-def test_portfolio_snapshot_persistence():
+def test_bulk_trade_persistence(db_path):
+    """Test inserting trade rows built column by column with one executemany."""
+    import numpy as np
+    
+    print(f"\n📦 TESTING BULK TRADE PERSISTENCE")
+    print("=" * 50)
+    
+    dm = DataManager(db_path=db_path)
+    
+    # Columnas (struct-of-arrays) en vez de una tupla/kwargs por trade
+    n = 1000
+    now = time.time()
+    timestamps = now - np.arange(n, 0, -1) * 1e-3
+    sides = np.where(np.arange(n) % 2 == 0, "BUY", "SELL")
+    amounts = np.full(n, 0.1)
+    prices = 200.0 + np.arange(n) * 0.01
+    simulation = np.arange(n) % 4 != 0
+    # tolist(): sqlite3 solo acepta tipos Python (np.bool_ no es int)
+    rows = list(zip(timestamps.tolist(), sides.tolist(), amounts.tolist(), prices.tolist(),
+                    (amounts * prices).tolist(), [0.0005] * n, simulation.tolist(),
+                    [None] * n, [None] * n, [None] * n, [None] * n))
+    assert dm.save_many_trades(rows), "Bulk insert should succeed"
+    
+    trades = dm.get_trade_history(hours=1)
+    assert len(trades) == n, "Every row should be stored"
+    assert [t["price"] for t in trades] == prices.tolist(), "Rows should come back in timestamp order"
+    assert len(dm.get_trade_history(simulation=False, hours=1)) == n // 4
+    print(f"✅ Saved {n} trades in one transaction")
+    
+    print(f"✅ Bulk trade persistence test passed!")
+
+
+def test_portfolio_snapshot_persistence(db_path):
     """Test saving and retrieving portfolio snapshots."""
     
     print(f"\n📈 TESTING PORTFOLIO SNAPSHOT PERSISTENCE")
     print("=" * 50)
     
-    with tempfile.NamedTemporaryFile(suffix='.db', delete=False) as tmp_file:
-        temp_db_path = tmp_file.name
+    dm = DataManager(db_path=db_path)
+    
+    # Save test portfolio snapshots
+    test_snapshots = [
+        (1.0, 0.0, 200.0, 0.0, 0.0, True),    # Initial state (simulation)
+        (0.5, 100.0, 200.0, 0.0, 10.0, True), # After buy (simulation)  
+        (0.0, 210.0, 210.0, 10.0, 0.0, True), # After sell (simulation)
+        (0.8, 40.0, 200.0, 0.0, 5.0, False)   # Real trade
+    ]
+    
+    start = time.time()
+    for i, (sol_bal, usd_bal, total_val, real_pnl, unreal_pnl, simulation) in enumerate(test_snapshots):
+        success = dm.save_portfolio_snapshot(
+            sol_balance=sol_bal,
+            usd_balance=usd_bal,
+            total_value_usd=total_val,
+            realized_pnl=real_pnl,
+            unrealized_pnl=unreal_pnl,
+            simulation=simulation,
+            metadata={"test_snapshot": True},
+            timestamp=start + i * 1e-3  # timestamps distintos y ordenados sin esperar
+        )
+        assert success, "Should save portfolio snapshot"
+        print(f"💾 Snapshot: {sol_bal} SOL, {usd_bal} USD, Total: ${total_val} ({'SIM' if simulation else 'REAL'})")
+    
+    # Retrieve portfolio history
+    portfolio_history = dm.get_portfolio_history(hours=1)
+    assert len(portfolio_history) == 4, "Should retrieve all 4 snapshots"
+    print(f"Retrieved {len(portfolio_history)} portfolio snapshots")
+    
+    # Retrieve only simulation snapshots
+    sim_snapshots = dm.get_portfolio_history(simulation=True, hours=1)
+    assert len(sim_snapshots) == 3, "Should retrieve 3 simulation snapshots"
+    print(f"Retrieved {len(sim_snapshots)} simulation snapshots")
+    
+    # Verify data progression
+    for i, snapshot in enumerate(portfolio_history):
+        expected = test_snapshots[i]
+        assert abs(snapshot["sol_balance"] - expected[0]) < 0.001, "SOL balance should match"
+        assert abs(snapshot["total_value_usd"] - expected[2]) < 0.001, "Total value should match"
+        print(f"✅ Snapshot {i+1}: {snapshot['sol_balance']} SOL, ${snapshot['total_value_usd']}")
+    
+    print(f"✅ Portfolio snapshot persistence test passed!")
+
+
+def test_batch_persistence(db_path):
+    """Test saving prices, trades and snapshots in a single transaction."""
+    
+    print(f"\n📦 TESTING BATCH PERSISTENCE")
+    print("=" * 50)
+    
+    dm = DataManager(db_path=db_path)
+    now = time.time()
+    
+    prices = [PriceData(timestamp=now + i, price=200.0 + i, source="batch") for i in range(5)]
+    trades = [TradeData(timestamp=now, side="BUY", amount_sol=0.5, price=200.0,
+                        value_usd=100.0, fees_sol=0.0, simulation=True)]
+    snapshots = [PortfolioSnapshot(timestamp=now, sol_balance=0.5, usd_balance=100.0,
+                                   total_value_usd=200.0, realized_pnl=0.0,
+                                   unrealized_pnl=0.0, simulation=True,
+                                   metadata={"current_price": 200.0})]
+    
+    success = dm.save_batch(prices=prices, trades=trades, snapshots=snapshots)
+    assert success, "Batch save should succeed"
+    assert dm.save_batch(), "Empty batch should be a no-op"
+    
+    price_history = dm.get_price_history(source="batch", hours=1)
+    assert [p["price"] for p in price_history] == [p.price for p in prices], "All batched prices should be stored in order"
+    assert len(dm.get_trade_history(hours=1)) == 1, "Batched trade should be stored"
+    
+    portfolio_history = dm.get_portfolio_history(hours=1)
+    assert len(portfolio_history) == 1, "Batched snapshot should be stored"
+    assert portfolio_history[0]["total_value_usd"] == 200.0, "Snapshot values should match"
+    
+    rows = [(now + 10 + i, 300.0 + i, "many", None, None, None) for i in range(3)]
+    assert dm.save_many_prices(rows), "Raw price rows should be saved"
+    assert [p["price"] for p in dm.get_price_history(source="many", hours=1)] == [300.0, 301.0, 302.0]
+    
+    print(f"✅ Batch persistence test passed!")
+
+
+def test_buffered_writes(tmp_path):
+    """Test that single save_* calls are buffered and flushed in the background."""
+    
+    print(f"\n🧺 TESTING BUFFERED WRITES")
+    print("=" * 50)
+    
+    temp_db_path = str(tmp_path / "test.db")
+    
+    def raw_count(table):
+        with sqlite3.connect(temp_db_path) as conn:
+            return conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+    
+    dm = DataManager(db_path=temp_db_path)
     
+    for price in (200.0, 201.0, 202.0):
+        assert dm.save_price_data(price, "buffered")
+    assert dm.save_trade_data("BUY", 0.5, 200.0, 100.0, 0.0025, True)
+    
+    # Las lecturas del propio DataManager vuelcan antes de consultar
+    assert len(dm.get_price_history(source="buffered", hours=1)) == 3
+    assert raw_count("price_data") == 3 and raw_count("trade_data") == 1
+    
+    # Sin lecturas, el hilo de fondo vuelca en ~FLUSH_INTERVAL_SEC
+    dm.save_portfolio_snapshot(1.0, 0.0, 200.0, 0.0, 0.0, True)
+    deadline = time.time() + 5
+    while raw_count("portfolio_snapshots") == 0 and time.time() < deadline:
+        time.sleep(0.1)
+    assert raw_count("portfolio_snapshots") == 1, "Background flusher should write pending rows"
+    
+    dm.save_price_data(203.0, "buffered")
+    dm.close()
+    assert raw_count("price_data") == 4, "close() should flush pending rows"
+    
+    print(f"✅ Buffered writes test passed!")
+
+
+def test_failed_flush_keeps_pending_rows(tmp_path):
+    """Test that rows stay buffered when a flush hits a locked database."""
+    
+    print(f"\n🔒 TESTING FLUSH RETRY ON LOCKED DATABASE")
+    print("=" * 50)
+    
+    temp_db_path = str(tmp_path / "test.db")
+    dm = DataManager(db_path=temp_db_path)
+    dm._conn.execute("PRAGMA busy_timeout=50")  # no esperar los 5 s por defecto
+    
+    for price in (200.0, 201.0, 202.0):
+        assert dm.save_price_data(price, "locked")
+    
+    # Otra conexión retiene el bloqueo de escritura
+    blocker = sqlite3.connect(temp_db_path, isolation_level=None)
+    blocker.execute("BEGIN EXCLUSIVE")
     try:
-        dm = DataManager(db_path=temp_db_path)
-        
-        # Save test portfolio snapshots
-        test_snapshots = [
-            (1.0, 0.0, 200.0, 0.0, 0.0, True),    # Initial state (simulation)
-            (0.5, 100.0, 200.0, 0.0, 10.0, True), # After buy (simulation)  
-            (0.0, 210.0, 210.0, 10.0, 0.0, True), # After sell (simulation)
-            (0.8, 40.0, 200.0, 0.0, 5.0, False)   # Real trade
-        ]
-        
-        for sol_bal, usd_bal, total_val, real_pnl, unreal_pnl, simulation in test_snapshots:
-            success = dm.save_portfolio_snapshot(
-                sol_balance=sol_bal,
-                usd_balance=usd_bal,
-                total_value_usd=total_val,
-                realized_pnl=real_pnl,
-                unrealized_pnl=unreal_pnl,
-                simulation=simulation,
-                metadata={"test_snapshot": True}
-            )
-            assert success, "Should save portfolio snapshot"
-            print(f"💾 Snapshot: {sol_bal} SOL, {usd_bal} USD, Total: ${total_val} ({'SIM' if simulation else 'REAL'})")
-            
-            # Small delay to ensure different timestamps
-            time.sleep(0.01)
-        
-        # Retrieve portfolio history
-        portfolio_history = dm.get_portfolio_history(hours=1)
-        assert len(portfolio_history) == 4, "Should retrieve all 4 snapshots"
-        print(f"Retrieved {len(portfolio_history)} portfolio snapshots")
-        
-        # Retrieve only simulation snapshots
-        sim_snapshots = dm.get_portfolio_history(simulation=True, hours=1)
-        assert len(sim_snapshots) == 3, "Should retrieve 3 simulation snapshots"
-        print(f"Retrieved {len(sim_snapshots)} simulation snapshots")
-        
-        # Verify data progression
-        for i, snapshot in enumerate(portfolio_history):
-            expected = test_snapshots[i]
-            assert abs(snapshot["sol_balance"] - expected[0]) < 0.001, "SOL balance should match"
-            assert abs(snapshot["total_value_usd"] - expected[2]) < 0.001, "Total value should match"
-            print(f"✅ Snapshot {i+1}: {snapshot['sol_balance']} SOL, ${snapshot['total_value_usd']}")
-        
-        print(f"✅ Portfolio snapshot persistence test passed!")
-        
+        assert not dm.flush(), "Flush should report the locked database"
     finally:
-        if os.path.exists(temp_db_path):
-            os.unlink(temp_db_path)
+        blocker.execute("ROLLBACK")
+        blocker.close()
+    
+    assert dm.flush(), "Retried flush should succeed once the lock is released"
+    assert len(dm.get_price_history(source="locked", hours=1)) == 3, "No buffered row should be lost"
+    dm.close()
+    
+    print(f"✅ Flush retry test passed!")
+
+
+def test_compressed_price_metadata(tmp_path):
+    """Test that large price metadata round-trips through zstd compression."""
+    
+    print(f"\n🗜️  TESTING COMPRESSED METADATA")
+    print("=" * 50)
+    
+    from src.data import data_manager as dm_module
+    if not dm_module.ZSTD_AVAILABLE:
+        pytest.skip("zstandard not installed")
+    
+    temp_db_path = str(tmp_path / "test.db")
+    
+    dm = DataManager(db_path=temp_db_path)
+    large = {"feeds": [{"source": f"feed{i}", "price": 200.0 + i} for i in range(20)]}
+    small = {"current_price": 200.0}
+    dm.save_price_data(200.0, "zstd", metadata=large)
+    dm.save_price_data(201.0, "zstd", metadata=small)
+    
+    history = dm.get_price_history(source="zstd", hours=1)
+    assert [p["metadata"] for p in history] == [large, small], "Metadata should round-trip"
+    with sqlite3.connect(temp_db_path) as conn:
+        types = [t for (t,) in conn.execute("SELECT typeof(metadata) FROM price_data ORDER BY timestamp")]
+    assert types == ["blob", "text"], "Only large payloads should be compressed"
+    
+    print(f"✅ Compressed metadata test passed!")
+
+
+def test_compressed_metadata_without_zstd():
+    """Test that reading a zstd BLOB without zstandard fails with a clear error."""
+    from src.data import data_manager as dm_module
+    
+    with pytest.MonkeyPatch.context() as mp:
+        mp.setattr(dm_module, "ZSTD_AVAILABLE", False)
+        with pytest.raises(RuntimeError, match="zstandard"):
+            dm_module._loads(b"\x28\xb5\x2f\xfd")
+        assert dm_module._loads('{"a": 1}') == {"a": 1}, "Text metadata needs no zstandard"
+    
+    print(f"✅ Missing zstandard test passed!")
+
+
+def test_aggregate_stats(db_path):
+    """Test SQL-side aggregates and limited/descending history queries."""
+    
+    print(f"\n🧮 TESTING AGGREGATE STATS")
+    print("=" * 50)
+    
+    dm = DataManager(db_path=db_path)
+    now = time.time()
+    assert dm.get_portfolio_stats(hours=1) == {"count": 0}, "Empty DB should report no snapshots"
+    assert dm.get_price_stats(hours=1)["count"] == 0
+    
+    prices = [PriceData(timestamp=now + i, price=p, source="agg") for i, p in enumerate([100.0, 120.0, 80.0, 110.0])]
+    trades = [TradeData(timestamp=now, side="BUY", amount_sol=0.5, price=100.0, value_usd=50.0, fees_sol=0.0, simulation=True),
+              TradeData(timestamp=now + 1, side="SELL", amount_sol=0.5, price=110.0, value_usd=55.0, fees_sol=0.0, simulation=False)]
+    snapshots = [PortfolioSnapshot(timestamp=now + i, sol_balance=0.0, usd_balance=v, total_value_usd=v,
+                                   realized_pnl=float(i), unrealized_pnl=0.0, simulation=True)
+                 for i, v in enumerate([100.0, 90.0, 130.0, 105.0])]
+    assert dm.save_batch(prices=prices, trades=trades, snapshots=snapshots)
+    
+    price_stats = dm.get_price_stats(hours=1)
+    assert price_stats["count"] == 4
+    assert (price_stats["min_price"], price_stats["max_price"], price_stats["avg_price"]) == (80.0, 120.0, 102.5)
+    
+    trade_stats = dm.get_trade_stats(hours=1)
+    assert trade_stats == {"count": 2, "total_volume_usd": 105.0, "simulation_count": 1, "real_count": 1}
+    
+    portfolio_stats = dm.get_portfolio_stats(hours=1)
+    assert portfolio_stats["initial_value"] == 100.0 and portfolio_stats["final_value"] == 105.0
+    assert (portfolio_stats["min_value"], portfolio_stats["max_value"]) == (90.0, 130.0)
+    assert portfolio_stats["realized_pnl"] == 3.0
+    
+    recent = dm.get_price_history(hours=1, limit=2, order="desc")
+    assert [p["price"] for p in recent] == [110.0, 80.0], "Newest prices should come first"
+    
+    frame = dm.get_price_history(hours=1, as_frame=True)
+    assert frame["price"].tolist() == [100.0, 120.0, 80.0, 110.0], "DataFrame should match the dict API"
+    assert str(frame["datetime"].dt.tz) == "UTC"
+    assert len(dm.get_trade_history(simulation=True, hours=1, as_frame=True)) == 1
+    assert dm.get_portfolio_history(hours=1, as_frame=True)["total_value_usd"].max() == 130.0
+    
+    print(f"✅ Aggregate stats test passed!")
 
 
-def test_statistics_and_export():
+def test_history_queries_use_indexes(db_path):
+    """Test that the history queries search an index instead of scanning the tables."""
+    
+    print(f"\n🔎 TESTING HISTORY QUERY PLANS")
+    print("=" * 50)
+    
+    dm = DataManager(db_path=db_path)
+    queries = {
+        "trades (simulation)": dm._history_query("trade_data", True, 24, None, "asc"),
+        "snapshots": dm._history_query("portfolio_snapshots", None, 24, 10, "desc"),
+        "prices": dm._price_history_query(None, 24, None, "asc"),
+        "prices (source)": dm._price_history_query("jupiter", 24, None, "asc"),
+    }
+    for name, (query, params) in queries.items():
+        plan = [row[3] for row in dm._conn.execute(f"EXPLAIN QUERY PLAN {query}", params)]
+        print(f"  {name}: {[step for step in plan if step.startswith(('SEARCH', 'SCAN'))]}")
+        assert not [step for step in plan if step.startswith("SCAN")], f"{name} should not scan a table: {plan}"
+        assert any("USING INDEX" in step for step in plan), f"{name} should use an index: {plan}"
+    
+    print(f"✅ Query plan test passed!")
+
+
+def test_statistics_and_export(tmp_path):
     """Test statistics generation and data export."""
     
     print(f"\n📊 TESTING STATISTICS AND EXPORT")
     print("=" * 50)
     
-    with tempfile.NamedTemporaryFile(suffix='.db', delete=False) as tmp_file:
-        temp_db_path = tmp_file.name
+    # Solo lectura/export: en memoria, sin WAL ni fsync
+    dm = DataManager(db_path=":memory:")
     
-    try:
-        dm = DataManager(db_path=temp_db_path)
-        
-        # Add some test data
-        dm.save_price_data(200.0, "test", 1000000, 50000000)
-        dm.save_trade_data("BUY", 0.5, 200.0, 100.0, 0.0025, True)
-        dm.save_portfolio_snapshot(1.0, 0.0, 200.0, 0.0, 0.0, True)
-        
-        # Get statistics
-        stats = dm.get_statistics()
-        
-        print(f"Statistics retrieved:")
-        print(f"  Price records: {stats['price_data']['total_records']}")
-        print(f"  Trade records: {sum(stats['trade_data'].values())}")
-        print(f"  Portfolio snapshots: {stats['portfolio_snapshots']['total_records']}")
-        print(f"  DB size: {stats['database']['file_size_mb']} MB")
-        
-        assert stats["price_data"]["total_records"] >= 1, "Should have price data"
-        assert sum(stats["trade_data"].values()) >= 1, "Should have trade data"
-        assert stats["portfolio_snapshots"]["total_records"] >= 1, "Should have portfolio data"
-        assert stats["database"]["file_size_mb"] > 0, "Database should have size"
-        
-        # Test export
-        with tempfile.NamedTemporaryFile(suffix='.json', delete=False) as export_file:
-            export_path = export_file.name
-        
-        try:
-            success = dm.export_data(export_path)
-            assert success, "Export should succeed"
-            assert os.path.exists(export_path), "Export file should exist"
-            
-            # Verify export file has content
-            file_size = os.path.getsize(export_path)
-            assert file_size > 100, "Export file should have substantial content"
-            print(f"✅ Export file created: {file_size} bytes")
-            
-        finally:
-            if os.path.exists(export_path):
-                os.unlink(export_path)
-        
-        print(f"✅ Statistics and export test passed!")
-        
-    finally:
-        if os.path.exists(temp_db_path):
-            os.unlink(temp_db_path)
+    # Add some test data
+    dm.save_price_data(200.0, "test", 1000000, 50000000)
+    dm.save_trade_data("BUY", 0.5, 200.0, 100.0, 0.0025, True)
+    dm.save_portfolio_snapshot(1.0, 0.0, 200.0, 0.0, 0.0, True)
+    
+    # Get statistics
+    stats = dm.get_statistics()
+    
+    print(f"Statistics retrieved:")
+    print(f"  Price records: {stats['price_data']['total_records']}")
+    print(f"  Trade records: {sum(stats['trade_data'].values())}")
+    print(f"  Portfolio snapshots: {stats['portfolio_snapshots']['total_records']}")
+    print(f"  DB size: {stats['database']['file_size_mb']} MB")
+    
+    assert stats["price_data"]["total_records"] >= 1, "Should have price data"
+    assert sum(stats["trade_data"].values()) >= 1, "Should have trade data"
+    assert stats["portfolio_snapshots"]["total_records"] >= 1, "Should have portfolio data"
+    assert stats["database"]["file_size_mb"] > 0, "Database should have size"
+    
+    # Test export
+    export_path = str(tmp_path / "export.json")
+    success = dm.export_data(export_path)
+    assert success, "Export should succeed"
+    assert os.path.exists(export_path), "Export file should exist"
+    
+    # Verify export file has content
+    file_size = os.path.getsize(export_path)
+    assert file_size > 100, "Export file should have substantial content"
+    
+    # El export se escribe en streaming: debe seguir siendo JSON válido
+    with open(export_path) as f:
+        exported = json.load(f)
+    assert exported["price_history"] == list(dm.iter_price_history(hours=24 * 30))
+    assert len(exported["trade_history"]) == 1 and len(exported["portfolio_history"]) == 1
+    print(f"✅ Export file created: {file_size} bytes")
+    
+    # La base en memoria se persiste de una vez con la API de backup
+    backup_path = str(tmp_path / "backup.db")
+    dm.backup(backup_path)
+    with sqlite3.connect(backup_path) as conn:
+        assert conn.execute("SELECT COUNT(*) FROM trade_data").fetchone()[0] == 1, "Backup should hold the trades"
+    print(f"✅ In-memory backup written to disk")
+    
+    print(f"✅ Statistics and export test passed!")
+
+
+def test_backup_database_includes_wal(tmp_path):
+    """Test that backup_database captures buffered and WAL-only rows of an on-disk DB."""
+    from src.utils import data_analytics
+    
+    print(f"\n💾 TESTING ON-DISK BACKUP")
+    print("=" * 50)
+    
+    dm = DataManager(db_path=str(tmp_path / "live.db"))
+    start = time.time()
+    for i in range(50):
+        dm.save_price_data(200.0 + i, "backup", timestamp=start + i * 1e-3)
+    dm.save_trade_data("BUY", 0.5, 200.0, 100.0, 0.0025, True, timestamp=start)
+    
+    with pytest.MonkeyPatch.context() as mp:
+        mp.setattr(data_analytics, "data_manager", dm)
+        backup_path = backup_database(str(tmp_path / "backups" / "backup.db"))
+    
+    assert backup_path is not None, "Backup should succeed"
+    with sqlite3.connect(backup_path) as conn:
+        assert conn.execute("SELECT COUNT(*) FROM price_data").fetchone()[0] == 50
+        assert conn.execute("SELECT COUNT(*) FROM trade_data").fetchone()[0] == 1
+    dm.close()
+    
+    print(f"✅ On-disk backup test passed!")
 
 
 def test_data_analytics_integration():
@@ -282,123 +540,343 @@ def test_data_analytics_integration():
     print(f"\n🎯 TESTING DATA ANALYTICS INTEGRATION")
     print("=" * 50)
     
-    with tempfile.NamedTemporaryFile(suffix='.db', delete=False) as tmp_file:
-        temp_db_path = tmp_file.name
+    # El informe solo lee: la base en memoria evita el coste de WAL/fsync
+    dm = DataManager(db_path=":memory:")
+    
+    # Add comprehensive test data (explicit, increasing timestamps instead of sleeping)
+    start = time.time()
+    prices = [190.0, 195.0, 200.0, 205.0, 210.0]
+    for i, price in enumerate(prices):
+        dm.save_price_data(price, "test", timestamp=start + i * 1e-3)
+    
+    # Add some trades
+    dm.save_trade_data("BUY", 0.5, 200.0, 100.0, 0.0025, True, timestamp=start)
+    dm.save_trade_data("SELL", 0.3, 210.0, 63.0, 0.0015, True, timestamp=start + 1e-3)
+    
+    # Add portfolio snapshots
+    dm.save_portfolio_snapshot(1.0, 0.0, 200.0, 0.0, 0.0, True, timestamp=start)
+    dm.save_portfolio_snapshot(0.5, 100.0, 205.0, 0.0, 5.0, True, timestamp=start + 1e-3)
+    
+    # Test analytics report generation
+    # Pass the custom DataManager to generate_trading_report by temporarily replacing the global one
+    from src.utils import data_analytics
+    original_dm = data_analytics.data_manager
+    data_analytics.data_manager = dm
     
     try:
-        dm = DataManager(db_path=temp_db_path)
-        
-        # Add comprehensive test data
-        prices = [190.0, 195.0, 200.0, 205.0, 210.0]
-        for i, price in enumerate(prices):
-            dm.save_price_data(price, "test")
-            time.sleep(0.01)  # Small delay for different timestamps
-        
-        # Add some trades
-        dm.save_trade_data("BUY", 0.5, 200.0, 100.0, 0.0025, True)
-        time.sleep(0.01)
-        dm.save_trade_data("SELL", 0.3, 210.0, 63.0, 0.0015, True)
-        
-        # Add portfolio snapshots
-        dm.save_portfolio_snapshot(1.0, 0.0, 200.0, 0.0, 0.0, True)
-        time.sleep(0.01)
-        dm.save_portfolio_snapshot(0.5, 100.0, 205.0, 0.0, 5.0, True)
-        
-        # Test analytics report generation
-        # Pass the custom DataManager to generate_trading_report by temporarily replacing the global one
-        from src.utils import data_analytics
-        original_dm = data_analytics.data_manager
-        data_analytics.data_manager = dm
-        
-        try:
-            report = generate_trading_report(hours=1)
-        finally:
-            data_analytics.data_manager = original_dm
-        
-        print(f"Analytics report generated:")
-        print(f"  Price data points: {report['raw_data']['price_count']}")
-        print(f"  Trades analyzed: {report['raw_data']['trade_count']}")
-        print(f"  Portfolio snapshots: {report['raw_data']['portfolio_snapshots']}")
-        
-        assert report["raw_data"]["price_count"] >= 5, "Should have price data"
-        assert report["raw_data"]["trade_count"] >= 2, "Should have trade data"
-        assert "price_analysis" in report, "Should have price analysis"
-        assert "trading_analysis" in report, "Should have trading analysis"
-        
-        # Test price analysis
-        price_analysis = report["price_analysis"]
-        if "error" not in price_analysis:
-            assert price_analysis["min_price"] == 190.0, "Min price should be correct"
-            assert price_analysis["max_price"] == 210.0, "Max price should be correct"
-            print(f"✅ Price analysis: {price_analysis['trend']} trend, {price_analysis['volatility_pct']:.2f}% volatility")
-        
-        print(f"✅ Data analytics integration test passed!")
-        
+        report = generate_trading_report(hours=1)
     finally:
-        if os.path.exists(temp_db_path):
-            os.unlink(temp_db_path)
+        data_analytics.data_manager = original_dm
+    
+    print(f"Analytics report generated:")
+    print(f"  Price data points: {report['raw_data']['price_count']}")
+    print(f"  Trades analyzed: {report['raw_data']['trade_count']}")
+    print(f"  Portfolio snapshots: {report['raw_data']['portfolio_snapshots']}")
+    
+    assert report["raw_data"]["price_count"] >= 5, "Should have price data"
+    assert report["raw_data"]["trade_count"] >= 2, "Should have trade data"
+    assert "price_analysis" in report, "Should have price analysis"
+    assert "trading_analysis" in report, "Should have trading analysis"
+    
+    # Test price analysis
+    price_analysis = report["price_analysis"]
+    if "error" not in price_analysis:
+        assert price_analysis["min_price"] == 190.0, "Min price should be correct"
+        assert price_analysis["max_price"] == 210.0, "Max price should be correct"
+        assert price_analysis["trend_slope"] == pytest.approx(5.0), "Prices rise 5 per sample"
+        print(f"✅ Price analysis: {price_analysis['trend']} trend, {price_analysis['volatility_pct']:.2f}% volatility")
+    
+    print(f"✅ Data analytics integration test passed!")
+
+
+def test_report_cache(tmp_path):
+    """Test that cached reports are invalidated by new writes and isolated from callers."""
+    from src.utils import data_analytics
+
+    print(f"\n🗂️ TESTING REPORT CACHE")
+    print("=" * 50)
+
+    dm = DataManager(db_path=str(tmp_path / "report.db"))
+    start = time.time()
+    for i, price in enumerate([190.0, 200.0, 210.0]):
+        dm.save_price_data(price, "test", timestamp=start + i * 1e-3)
+
+    data_analytics._cached_report.cache_clear()
+    with pytest.MonkeyPatch.context() as mp:
+        mp.setattr(data_analytics, "data_manager", dm)
+        # Ventana muy larga: solo una escritura puede invalidar el reporte durante el test
+        mp.setattr(data_analytics, "REPORT_CACHE_TTL_SEC", 1e9)
+
+        first = generate_trading_report(hours=1)
+        first["raw_data"]["price_count"] = 999
+        first["price_analysis"].clear()
+        second = generate_trading_report(hours=1)
+        assert data_analytics._cached_report.cache_info().hits == 1, "Unchanged DB should reuse the report"
+        assert second["raw_data"]["price_count"] == 3, "Mutating a report must not touch the cache"
+        assert second["price_analysis"]["max_price"] == 210.0
+        print(f"✅ Cached report reused and isolated")
+
+        dm.save_price_data(220.0, "test", timestamp=start + 1.0)
+        third = generate_trading_report(hours=1)
+        assert data_analytics._cached_report.cache_info().misses == 2, "A new write should rebuild the report"
+        assert third["raw_data"]["price_count"] == 4
+        assert third["price_analysis"]["max_price"] == 220.0
+        print(f"✅ New write invalidated the cache")
+
+    data_analytics._cached_report.cache_clear()
+    dm.close()
+
+    print(f"✅ Report cache test passed!")
 
 
-def test_cleanup_functionality():
+
+def test_report_cache_per_memory_database():
+    """Test that two in-memory managers with the same write count get their own reports."""
+    from src.utils import data_analytics
+
+    print(f"\n🗂️ TESTING REPORT CACHE PER IN-MEMORY DATABASE")
+    print("=" * 50)
+
+    start = time.time()
+    managers = [DataManager(db_path=":memory:") for _ in range(2)]
+    for dm, base in zip(managers, (100.0, 500.0)):
+        for i in range(3):
+            dm.save_price_data(base + i, "test", timestamp=start + i * 1e-3)
+
+    data_analytics._cached_report.cache_clear()
+    with pytest.MonkeyPatch.context() as mp:
+        mp.setattr(data_analytics, "REPORT_CACHE_TTL_SEC", 1e9)
+        max_prices = []
+        for dm in managers:
+            mp.setattr(data_analytics, "data_manager", dm)
+            max_prices.append(generate_trading_report(hours=1)["price_analysis"]["max_price"])
+    data_analytics._cached_report.cache_clear()
+    for dm in managers:
+        dm.close()
+
+    assert max_prices == [102.0, 502.0], "Each database should get its own cached report"
+    print(f"✅ Report cache per in-memory database test passed!")
+
+def test_trade_analysis_pandas_path():
+    """Test that the pandas trade aggregation matches the per-trade loop."""
+    import random
+    from src.utils import data_analytics
+    
+    print(f"\n🐼 TESTING PANDAS TRADE ANALYSIS")
+    print("=" * 50)
+    
+    rng = random.Random(7)
+    trades = [
+        {
+            "side": rng.choice(["BUY", "SELL"]),
+            "price": rng.uniform(150.0, 250.0),
+            "amount_sol": rng.uniform(0.01, 1.0),
+            "value_usd": rng.uniform(1.0, 200.0),
+            "fees_sol": rng.uniform(0.0, 0.01),
+            "simulation": rng.choice([0, 1]),
+        }
+        for _ in range(500)
+    ]
+    
+    expected = data_analytics._analyze_trades(trades)
+    frame = data_analytics._trades_to_frame(trades)
+    assert frame["side"].dtype == "category" and frame["simulation"].dtype == bool
+    result = data_analytics._analyze_trades_df(frame)
+    print(f"  Simulation analysis: {result['simulation_analysis']}")
+    assert result == expected, "DataFrame aggregation should match the dict-based analysis"
+    
+    only_real_buys = [t for t in trades if not t["simulation"] and t["side"] == "BUY"]
+    assert data_analytics._analyze_trades_df(data_analytics._trades_to_frame(only_real_buys)) == data_analytics._analyze_trades(only_real_buys)
+    
+    print(f"✅ Pandas trade analysis test passed!")
+
+
+def test_analytics_kernels_match_numpy():
+    """Test that the single-sweep analytics kernels agree with the NumPy reductions."""
+    import numpy as np
+    from src.utils import _analytics_kernels
+    
+    print(f"\n📐 TESTING ANALYTICS KERNELS")
+    print("=" * 50)
+    
+    rng = np.random.default_rng(11)
+    prices = 200.0 + np.cumsum(rng.normal(0.0, 1.0, 501))
+    mid = prices.size // 2
+    expected = (prices.min(), prices.max(), prices.mean(), prices.std(),
+                prices[:mid].mean(), prices[mid:].mean())
+    stats = _analytics_kernels.price_stats(prices)
+    print(f"  Price stats: {tuple(round(float(v), 4) for v in stats)}")
+    assert np.allclose(stats, expected), "Kernel stats should match NumPy"
+    
+    values = np.array([0.0, -5.0, 100.0, 80.0, 120.0, 60.0, 90.0])
+    assert _analytics_kernels.drawdown(values) == pytest.approx((-5.0, 120.0, 0.5))
+    
+    print(f"✅ Analytics kernels test passed!")
+
+
+def test_cleanup_functionality(db_path):
     """Test data cleanup functionality."""
     
     print(f"\n🧹 TESTING DATA CLEANUP")
     print("=" * 50)
     
-    with tempfile.NamedTemporaryFile(suffix='.db', delete=False) as tmp_file:
-        temp_db_path = tmp_file.name
+    dm = DataManager(db_path=db_path)
     
-    try:
-        dm = DataManager(db_path=temp_db_path)
-        
-        # Add current data
-        dm.save_price_data(200.0, "current")
-        dm.save_trade_data("BUY", 0.5, 200.0, 100.0, 0.0025, True)
-        
-        # Simulate old data by manually inserting with old timestamp
-        old_timestamp = time.time() - (35 * 24 * 3600)  # 35 days ago
-        
-        with sqlite3.connect(temp_db_path) as conn:
-            conn.execute("""
-                INSERT INTO price_data (timestamp, price, source) 
-                VALUES (?, ?, ?)
-            """, (old_timestamp, 180.0, "old"))
-            conn.commit()
-        
-        # Verify we have both old and new data
-        stats_before = dm.get_statistics()
-        price_count_before = stats_before["price_data"]["total_records"]
-        print(f"Records before cleanup: {price_count_before}")
-        
-        assert price_count_before >= 2, "Should have both old and new records"
-        
-        # Cleanup old data (older than 30 days)
-        success = dm.cleanup_old_data(days=30)
-        assert success, "Cleanup should succeed"
-        
-        # Verify cleanup worked
-        stats_after = dm.get_statistics()
-        price_count_after = stats_after["price_data"]["total_records"]
-        print(f"Records after cleanup: {price_count_after}")
-        
-        assert price_count_after < price_count_before, "Should have fewer records after cleanup"
-        assert price_count_after >= 1, "Should still have recent records"
-        
-        print(f"✅ Data cleanup test passed!")
-        
-    finally:
-        if os.path.exists(temp_db_path):
-            os.unlink(temp_db_path)
+    # Add current data
+    dm.save_price_data(200.0, "current")
+    dm.save_trade_data("BUY", 0.5, 200.0, 100.0, 0.0025, True)
+    
+    # Simulate old data: seed 10k rows with old timestamps in one executemany transaction
+    old_timestamp = time.time() - (35 * 24 * 3600)  # 35 days ago
+    old_rows = 10_000
+    
+    assert dm.save_many_prices([(old_timestamp - i, 180.0 + i * 0.01, "old", None, None, None)
+                                for i in range(old_rows)])
+    
+    # Verify we have both old and new data
+    stats_before = dm.get_statistics()
+    price_count_before = stats_before["price_data"]["total_records"]
+    print(f"Records before cleanup: {price_count_before}")
+    
+    assert price_count_before == old_rows + 1, "Should have both old and new records"
+    
+    # Cleanup old data (older than 30 days)
+    success = dm.cleanup_old_data(days=30)
+    assert success, "Cleanup should succeed"
+    
+    # Verify cleanup worked
+    stats_after = dm.get_statistics()
+    price_count_after = stats_after["price_data"]["total_records"]
+    print(f"Records after cleanup: {price_count_after}")
+    
+    assert price_count_after < price_count_before, "Should have fewer records after cleanup"
+    assert price_count_after == 1, "Only the recent record should remain"
+    
+    print(f"✅ Data cleanup test passed!")
+
+
+def test_price_history_resolution(db_path):
+    """Test that price history is read at the coarsest resolution covering the window."""
+    
+    print(f"\n🔭 TESTING PRICE HISTORY RESOLUTION")
+    print("=" * 50)
+    
+    dm = DataManager(db_path=db_path)
+    now = time.time()
+    # Ticks crudos de una vela de 5m de hace una hora y uno reciente (sin downsampling)
+    bucket = (now - 3600) // 3600 * 3600
+    ticks = [(bucket + i * 60, p) for i, p in enumerate([100.0, 130.0, 90.0, 110.0])] + [(now - 30, 120.0)]
+    assert dm.save_many_prices([(ts, p, "agg", None, None, None) for ts, p in ticks])
+    
+    assert [p["price"] for p in dm.get_price_history(hours=24)] == [p for _, p in ticks], "24h reads raw ticks"
+    
+    week = dm.get_price_history(hours=48)
+    assert [p["price"] for p in week] == [110.0, 120.0], "48h reads 5m candles"
+    assert week[0]["metadata"] == {"bucket": "5m", "open": 100.0, "high": 130.0, "low": 90.0, "count": 4}
+    
+    month = dm.get_price_history(hours=24 * 30, as_frame=True)
+    assert month["bucket"].tolist() == ["1h"] * len(month)
+    assert month["tick_count"].sum() == 5, "Every tick is counted in exactly one candle"
+    
+    print(f"✅ Price history resolution test passed!")
+
+
+def test_cleanup_honors_retention(db_path):
+    """Test that cleanup_old_data keeps raw ticks when days is within the rollup window."""
+    
+    print(f"\n🧽 TESTING CLEANUP RETENTION")
+    print("=" * 50)
+    
+    dm = DataManager(db_path=db_path)
+    now = time.time()
+    rows = [(now - 2 * 24 * 3600 + i, 100.0 + i, "agg", None, None, None) for i in range(3)]
+    rows.append((now - 5 * 24 * 3600, 90.0, "agg", None, None, None))
+    assert dm.save_many_prices(rows)
+    
+    # days=3: los ticks de hace 2 días no se compactan ni se borran; el de hace 5, sí
+    assert dm.cleanup_old_data(days=3, raw_hours=24 * 3)
+    assert dm.get_statistics()["price_data"]["total_records"] == 3, "Raw ticks within `days` should stay raw"
+    
+    # Con la retención por defecto se compactan a velas de 5m, no se pierden
+    assert dm.cleanup_old_data(days=30)
+    assert dm.get_statistics()["price_data"]["total_records"] == 0
+    assert dm.get_price_stats(hours=24 * 30)["count"] == 3
+    
+    print(f"✅ Cleanup retention test passed!")
+
+
+def test_price_downsampling(tmp_path):
+    """Test rolling old ticks into 5m/1h OHLC buckets."""
+    
+    print(f"\n🗜️  TESTING PRICE DOWNSAMPLING")
+    print("=" * 50)
+    
+    temp_db_path = str(tmp_path / "test.db")
+    
+    dm = DataManager(db_path=temp_db_path)
+    now = time.time()
+    
+    # Dos días atrás, alineado a un bucket de 5 minutos: 4 ticks en la misma vela
+    day_old = (now - 2 * 24 * 3600) // 300 * 300
+    old_prices = [PriceData(timestamp=day_old + i * 60, price=p, source="agg")
+                  for i, p in enumerate([100.0, 130.0, 90.0, 110.0])]
+    # Diez días atrás: acaba en velas de 1 hora
+    week_old = (now - 10 * 24 * 3600) // 3600 * 3600
+    older_prices = [PriceData(timestamp=week_old + i * 600, price=50.0 + i, source="agg") for i in range(6)]
+    recent = [PriceData(timestamp=now - 60, price=120.0, source="agg")]
+    assert dm.save_batch(prices=old_prices + older_prices + recent)
+    stats_before = dm.get_price_stats(hours=24 * 30)
+    
+    assert dm.downsample_older_than(hours=24, bucket="5m") == 10, "All ticks older than 24h should be rolled up"
+    assert dm.downsample_older_than(hours=24 * 7, bucket="1h") == 6, "5m buckets older than 7 days should be rolled up"
+    
+    with sqlite3.connect(temp_db_path) as conn:
+        assert conn.execute("SELECT COUNT(*) FROM price_data").fetchone()[0] == 1, "Only recent raw ticks remain"
+        candle = conn.execute("SELECT open, high, low, close, avg_price, tick_count FROM price_history_5m").fetchone()
+        assert candle == (100.0, 130.0, 90.0, 110.0, 107.5, 4), "5m candle should hold OHLC of its ticks"
+        candle_1h = conn.execute("SELECT open, high, low, close, tick_count FROM price_history_1h").fetchone()
+        assert candle_1h == (50.0, 55.0, 50.0, 55.0, 6), "1h candle should merge its 5m candles"
+    
+    # 30 días: todo en velas de 1h (la de 5m y el tick reciente se agregan al vuelo)
+    history = dm.get_price_history(hours=24 * 30)
+    assert [p["price"] for p in history] == [55.0, 110.0, 120.0], "History should stitch 1h, 5m and raw rows"
+    assert {p["metadata"]["bucket"] for p in history} == {"1h"}, "Coarsest tier covering the window"
+    assert history[1]["metadata"]["high"] == 130.0 and history[1]["metadata"]["count"] == 4
+    # Stored tiers are exported as they are
+    assert [p["metadata"]["bucket"] if p["metadata"] else None for p in dm.iter_price_history(hours=24 * 30)] == ["1h", "5m", None]
+    
+    stats_after = dm.get_price_stats(hours=24 * 30)
+    assert stats_after["count"] == stats_before["count"] == 11
+    assert (stats_after["min_price"], stats_after["max_price"]) == (stats_before["min_price"], stats_before["max_price"])
+    assert abs(stats_after["avg_price"] - stats_before["avg_price"]) < 1e-9, "Averages should be preserved"
+    
+    print(f"✅ Price downsampling test passed!")
 
 
 if __name__ == "__main__":
-    test_data_manager_initialization()
-    test_price_data_persistence()
-    test_trade_data_persistence()
-    test_portfolio_snapshot_persistence()
-    test_statistics_and_export()
+    test_data_manager_initialization(_fresh_tmp_path())
+    test_price_data_persistence(_fresh_db_path())
+    test_trade_data_persistence(_fresh_db_path())
+    test_bulk_trade_persistence(_fresh_db_path())
+    test_portfolio_snapshot_persistence(_fresh_db_path())
+    test_batch_persistence(_fresh_db_path())
+    test_buffered_writes(_fresh_tmp_path())
+    test_failed_flush_keeps_pending_rows(_fresh_tmp_path())
+    test_compressed_price_metadata(_fresh_tmp_path())
+    test_compressed_metadata_without_zstd()
+    test_aggregate_stats(_fresh_db_path())
+    test_history_queries_use_indexes(_fresh_db_path())
+    test_statistics_and_export(_fresh_tmp_path())
+    test_backup_database_includes_wal(_fresh_tmp_path())
     test_data_analytics_integration()
-    test_cleanup_functionality()
+    test_report_cache(_fresh_tmp_path())
+    test_report_cache_per_memory_database()
+    test_trade_analysis_pandas_path()
+    test_analytics_kernels_match_numpy()
+    test_cleanup_functionality(_fresh_db_path())
+    test_price_history_resolution(_fresh_db_path())
+    test_cleanup_honors_retention(_fresh_db_path())
+    test_price_downsampling(_fresh_tmp_path())
     
     print(f"\n🎉 ALL DATA PERSISTENCE TESTS PASSED!")
     print("📊 El sistema de persistencia está funcionando correctamente")
@@ -0,0 +1,151 @@
+import math
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.strategy.indicators import (
+    IncrementalIndicators,
+    bollinger_bands,
+    compute_indicators,
+    ema,
+    rsi,
+)
+
+
+def _reference(prices):
+    """Indicators computed from scratch with the pandas helpers."""
+    upper_bb, lower_bb = bollinger_bands(prices)
+    return {
+        "ema12": float(ema(prices, 12)),
+        "ema50": float(ema(prices, 50)),
+        "sma20": float(pd.Series(prices).rolling(window=20).mean().iloc[-1]),
+        "rsi": float(rsi(prices, 14)),
+        "upper_bb": float(upper_bb),
+        "lower_bb": float(lower_bb),
+    }
+
+
+def _assert_same(actual, expected):
+    assert actual.keys() == expected.keys()
+    for key, value in expected.items():
+        if math.isnan(value):
+            assert math.isnan(actual[key]), f"{key} should be NaN"
+        else:
+            assert actual[key] == pytest.approx(value, rel=1e-9), f"{key} mismatch"
+
+
+def test_incremental_indicators_match_pandas():
+    """Online accumulator must agree with the pandas implementation tick by tick."""
+    rng = np.random.default_rng(42)
+    prices = 200.0 * np.cumprod(1 + rng.normal(0, 0.01, 500))
+
+    indicators = IncrementalIndicators()
+    for n, price in enumerate(prices, start=1):
+        result = indicators.update(price)
+        if n in (1, 13, 14, 19, 20, 21, 50, 200, 500):
+            _assert_same(result, _reference(prices[:n]))
+
+
+def test_compute_indicators_wrapper():
+    """compute_indicators keeps its contract for lists and arrays."""
+    assert compute_indicators([]) == {}
+
+    prices = [100.0 + (i % 7) for i in range(60)]
+    _assert_same(compute_indicators(prices), _reference(prices))
+    _assert_same(compute_indicators(np.asarray(prices)), _reference(prices))
+
+
+def test_kernels_match_pandas():
+    """Numba kernels (plain Python without numba) must match the pandas helpers."""
+    from src.strategy import _kernels
+
+    rng = np.random.default_rng(7)
+    prices = 100 + np.cumsum(rng.normal(0, 1, 120))
+    for n in (1, 13, 14, 15, 19, 20, 21, 60, 120):
+        window = prices[:n]
+        series = pd.Series(window)
+        expected_ema = series.ewm(span=12, adjust=False).mean().iloc[-1]
+        assert _kernels.ema(window, 12) == pytest.approx(expected_ema, rel=1e-9)
+
+        delta = series.diff()
+        avg_gain = delta.where(delta > 0, 0.0).rolling(window=14).mean().iloc[-1]
+        avg_loss = (-delta.where(delta < 0, 0.0)).rolling(window=14).mean().iloc[-1]
+        expected_rsi = (100 - (100 / (1 + avg_gain / avg_loss)))
+        if math.isnan(expected_rsi):
+            assert math.isnan(_kernels.rsi(window, 14))
+        else:
+            assert _kernels.rsi(window, 14) == pytest.approx(expected_rsi, rel=1e-9)
+
+        sma = series.rolling(window=20).mean().iloc[-1]
+        std = series.rolling(window=20).std().iloc[-1]
+        upper, lower = _kernels.bollinger(window, 20, 2.0)
+        if math.isnan(sma):
+            assert math.isnan(upper) and math.isnan(lower)
+        else:
+            assert upper == pytest.approx(sma + 2 * std, rel=1e-9)
+            assert lower == pytest.approx(sma - 2 * std, rel=1e-9)
+
+
+def test_generate_signals_match_per_bar():
+    """Vectorized signals must equal generate_signal on every growing prefix."""
+    from src.strategy.simple_strategy import generate_signal, generate_signals
+
+    rng = np.random.default_rng(3)
+    prices = 100 * np.cumprod(1 + rng.normal(0, 0.02, 400))
+    signals = generate_signals(prices)
+    assert list(signals) == [generate_signal(prices[: i + 1]) for i in range(len(prices))]
+    assert {"BUY", "SELL"} <= set(signals), "Sample series should exercise both branches"
+    assert list(generate_signals(prices[:30])) == ["HOLD"] * 30
+
+
+def test_signal_from_incremental_indicators():
+    """Signals from the incremental state must match generate_signal on the history."""
+    from src.strategy.simple_strategy import generate_signal, signal_from_indicators
+
+    rng = np.random.default_rng(5)
+    prices = 100 * np.cumprod(1 + rng.normal(0, 0.02, 400))
+    indicators = IncrementalIndicators()
+    signals = []
+    for n, price in enumerate(prices, start=1):
+        signals.append(signal_from_indicators(price, indicators.update(price), n))
+    assert signals == [generate_signal(prices[: i + 1]) for i in range(len(prices))]
+    assert {"BUY", "SELL"} <= set(signals)
+
+
+def test_fused_kernel_matches_separate_kernels():
+    """The single-pass kernel must return exactly what the separate kernels do."""
+    from src.strategy import _kernels
+
+    rng = np.random.default_rng(11)
+    prices = 100 + np.cumsum(rng.normal(0, 1, 80))
+    for n in (0, 1, 13, 14, 15, 19, 20, 21, 80):
+        window = prices[:n]
+        fused = _kernels.all_indicators(window, 12, 50, 14, 20, 2.0)
+        expected = (
+            _kernels.ema(window, 12),
+            _kernels.ema(window, 50),
+            float(window[-20:].sum() / 20) if n >= 20 else math.nan,
+            _kernels.rsi(window, 14),
+            *_kernels.bollinger(window, 20, 2.0),
+        )
+        for value, reference in zip(fused, expected):
+            if math.isnan(reference):
+                assert math.isnan(value)
+            else:
+                assert value == pytest.approx(reference, rel=1e-12)
+
+
+def test_build_kernels_are_plain_python():
+    """The AOT build compiles from the pure-Python kernels, whatever _kernels loaded."""
+    import inspect
+
+    from src.strategy import _kernels
+
+    assert set(_kernels.PY_KERNELS) == {"ema", "rsi", "bollinger", "all_indicators", "backtest_fsm", "scan_drawdown"}
+    for func in _kernels.PY_KERNELS.values():
+        assert inspect.isfunction(func) and not hasattr(func, "py_func")
+
+    prices = 100 + np.cumsum(np.random.default_rng(13).normal(0, 1, 40))
+    assert _kernels.PY_KERNELS["ema"](prices, 12) == pytest.approx(_kernels.ema(prices, 12), rel=1e-12)
+    assert _kernels.PY_KERNELS["rsi"](prices, 14) == pytest.approx(_kernels.rsi(prices, 14), rel=1e-12)
@@ -0,0 +1,77 @@
+import csv
+import logging
+import time
+
+import pytest
+
+from src.utils import logger as trade_logger
+
+
+@pytest.fixture
+def trade_log(tmp_path, monkeypatch):
+    """trades.csv redirected to ``tmp_path``, with a clean writer state."""
+    trade_logger.close_trade_log()
+    path = tmp_path / "trades.csv"
+    monkeypatch.setattr(trade_logger, "LOG_FILE", path)
+    monkeypatch.setattr(trade_logger, "TRADE_FLUSH_BATCH", 3)
+    monkeypatch.setattr(trade_logger, "TRADE_FLUSH_INTERVAL_SEC", 60.0)
+    monkeypatch.setattr(trade_logger, "_last_flush", time.monotonic())
+    yield path
+    trade_logger.close_trade_log()
+
+
+def _rows(path):
+    with path.open(newline="") as f:
+        return list(csv.reader(f))
+
+
+def test_trades_are_written_in_batches(trade_log):
+    trade_logger.log_trade({"side": "BUY", "price": "100", "quantity": "1"})
+    trade_logger.log_trade({"side": "SELL", "price": "101", "quantity": "1"})
+    assert not trade_log.exists(), "Rows below the batch size should stay in memory"
+
+    trade_logger.log_trade({"side": "BUY", "price": "102", "quantity": "2"})
+    assert _rows(trade_log) == [
+        ["side", "price", "quantity"],
+        ["BUY", "100", "1"],
+        ["SELL", "101", "1"],
+        ["BUY", "102", "2"],
+    ]
+
+
+def test_timer_flushes_a_lone_trade(trade_log, monkeypatch):
+    monkeypatch.setattr(trade_logger, "TRADE_FLUSH_INTERVAL_SEC", 0.05)
+    monkeypatch.setattr(trade_logger, "_last_flush", time.monotonic())
+    trade_logger.log_trade({"side": "BUY", "price": "100", "quantity": "1"})
+    timer = trade_logger._flush_timer
+    assert timer is not None, "A pending row should arm the flush timer"
+
+    timer.join(timeout=5)
+    assert _rows(trade_log)[1:] == [["BUY", "100", "1"]]
+    assert trade_logger._flush_timer is None
+
+
+def test_close_flushes_and_reopens(trade_log):
+    trade_logger.log_trade({"side": "BUY", "price": "100", "quantity": "1"})
+    trade_logger.close_trade_log()
+    assert _rows(trade_log)[1:] == [["BUY", "100", "1"]], "close() should flush pending rows"
+    assert trade_logger._csv_fh is None
+
+    trade_logger.log_trade({"side": "SELL", "price": "101", "quantity": "1"})
+    trade_logger.flush_trade_log()
+    assert _rows(trade_log) == [["side", "price", "quantity"], ["BUY", "100", "1"], ["SELL", "101", "1"]], \
+        "Reopening an existing file should keep its header"
+
+
+def test_unknown_fields_are_reported(trade_log, caplog):
+    trade_logger.log_trade({"side": "BUY", "price": "100", "quantity": "1"})
+    trade_logger.flush_trade_log()
+
+    with caplog.at_level(logging.WARNING, logger="bot"):
+        trade_logger.log_trade({"side": "SELL", "price": "101", "quantity": "1", "fee": "0.1"})
+        trade_logger.log_trade({"side": "SELL", "price": "102", "quantity": "1", "fee": "0.1"})
+        trade_logger.flush_trade_log()
+
+    warnings = [r.getMessage() for r in caplog.records if "fee" in r.getMessage()]
+    assert len(warnings) == 1, "Each dropped column should be reported once"
+    assert _rows(trade_log)[-1] == ["SELL", "102", "1"]
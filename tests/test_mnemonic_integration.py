@@ -1,10 +1,19 @@
 import pytest
 import asyncio
+import functools
+import json
 import os
 from solders.keypair import Keypair
 from solana.rpc.async_api import AsyncClient
 from solana.rpc.commitment import Confirmed
 from src.config import settings, derive_private_key_from_mnemonic
+from src.keys import english_mnemonic
+
+
+@functools.lru_cache(maxsize=32)
+def _mnemonic_to_seed(mnemonic: str) -> bytes:
+    """BIP39 seed (PBKDF2 with 2048 rounds), computed once per phrase."""
+    return english_mnemonic().to_seed(mnemonic)
 
 
 class MnemonicWallet:
@@ -19,15 +28,12 @@ class MnemonicWallet:
     def _derive_keypair_from_mnemonic(self, mnemonic: str) -> Keypair:
         """Derive keypair from mnemonic phrase."""
         try:
-            from mnemonic import Mnemonic
-            mnemo = Mnemonic("english")
-            
             # Validate mnemonic
-            if not mnemo.check(mnemonic):
+            if not english_mnemonic().check(mnemonic):
                 raise ValueError("Invalid mnemonic phrase")
             
             # Generate seed and keypair
-            seed = mnemo.to_seed(mnemonic)
+            seed = _mnemonic_to_seed(mnemonic)
             keypair = Keypair.from_seed(seed[:32])
             return keypair
             
@@ -90,17 +96,18 @@ async def test_mnemonic_processing():
         assert settings.private_key != "CHANGE_ME", "Settings should process mnemonic correctly"
         
         # Parse the private key from settings
-        config_private_key = eval(settings.private_key)
+        config_private_key = bytes(json.loads(settings.private_key))
         assert len(config_private_key) == 64, f"Config private key should be 64 bytes, got {len(config_private_key)}"
-        assert config_private_key == private_key_array, "Config and direct processing should match"
+        assert config_private_key == bytes(private_key_array), "Config and direct processing should match"
         
         print(f"✅ Config system processing: SUCCESS")
         print(f"   Settings private key length: {len(settings.private_key)} chars")
-        print(f"   Parsed key matches direct: {config_private_key == private_key_array}")
+        print(f"   Parsed key matches direct: {config_private_key == bytes(private_key_array)}")
     except Exception as e:
         pytest.fail(f"Config system processing failed: {e}")
 
 
+@pytest.mark.network
 @pytest.mark.asyncio
 async def test_mnemonic_wallet_integration():
     """Full integration test: mnemonic -> keypair -> wallet -> balance."""
@@ -141,8 +148,8 @@ async def test_mnemonic_wallet_integration():
         print(f"   RPC Endpoint: {settings.rpc_endpoint}")
         
         # Test consistency with config system
-        config_key_array = eval(settings.private_key)
-        assert private_key == config_key_array, "Wallet and config keys should match"
+        config_key_array = json.loads(settings.private_key)
+        assert bytes(private_key) == bytes(config_key_array), "Wallet and config keys should match"
         
         print(f"✅ Config consistency: SUCCESS")
         print(f"   Keys match: {private_key[:3] == config_key_array[:3]}")
@@ -165,43 +172,51 @@ async def test_mnemonic_wallet_integration():
 
 
 @pytest.mark.asyncio
-async def test_mnemonic_vs_private_key_priority():
+async def test_mnemonic_vs_private_key_priority(monkeypatch):
     """Test that PRIVATE_KEY takes precedence over MNEMONIC when both are set."""
     
-    import tempfile
-    import os
-    from dotenv import load_dotenv
-    
-    # Create temporary .env file with both PRIVATE_KEY and MNEMONIC
     test_private_key = "[1,2,3,4,5,6,7,8,9,10,11,12,13,14,15,16,17,18,19,20,21,22,23,24,25,26,27,28,29,30,31,32,33,34,35,36,37,38,39,40,41,42,43,44,45,46,47,48,49,50,51,52,53,54,55,56,57,58,59,60,61,62,63,64]"
     test_mnemonic = "abandon abandon abandon abandon abandon abandon abandon abandon abandon abandon abandon about"
     
-    with tempfile.NamedTemporaryFile(mode='w', suffix='.env', delete=False) as f:
-        f.write(f'PRIVATE_KEY="{test_private_key}"\n')
-        f.write(f'MNEMONIC="{test_mnemonic}"\n')
-        f.write(f'RPC_ENDPOINT="https://api.mainnet-beta.solana.com"\n')
-        temp_env_file = f.name
+    # Settings lee las variables en __post_init__: basta con el entorno, sin .env temporal
+    # (monkeypatch restaura los valores originales al terminar)
+    monkeypatch.setenv("PRIVATE_KEY", test_private_key)
+    monkeypatch.setenv("MNEMONIC", test_mnemonic)
     
-    try:
-        # Load the test environment
-        load_dotenv(temp_env_file, override=True)
-        
-        # Create new settings instance to test
-        from src.config import Settings
-        test_settings = Settings()
-        
-        # Should use PRIVATE_KEY, not derive from MNEMONIC
-        assert test_settings.private_key == test_private_key, "Should use PRIVATE_KEY when both are present"
-        
-        print(f"✅ Priority test: PRIVATE_KEY correctly takes precedence over MNEMONIC")
-        
-    finally:
-        # Cleanup
-        os.unlink(temp_env_file)
-        # Reload original environment and clear variables
-        load_dotenv(override=True)
-        os.environ.pop("MNEMONIC", None)
-        os.environ.pop("PRIVATE_KEY", None)
+    from src.config import Settings
+    test_settings = Settings()
+    
+    # Should use PRIVATE_KEY, not derive from MNEMONIC
+    assert test_settings.private_key == test_private_key, "Should use PRIVATE_KEY when both are present"
+    
+    print(f"✅ Priority test: PRIVATE_KEY correctly takes precedence over MNEMONIC")
+
+
+def test_key_cache_is_opt_in(monkeypatch, tmp_path):
+    """Test that the derived key is only cached with KEY_CACHE=true, under XDG_CACHE_HOME."""
+    from src.keys import key_cache_file, private_key_from_mnemonic
+    
+    test_mnemonic = "abandon abandon abandon abandon abandon abandon abandon abandon abandon abandon abandon about"
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path))
+    cache_file = key_cache_file()
+    assert cache_file.is_relative_to(tmp_path), "Cache should live under XDG_CACHE_HOME"
+    
+    monkeypatch.delenv("KEY_CACHE", raising=False)
+    derived = private_key_from_mnemonic(test_mnemonic)
+    assert derived and not cache_file.exists(), "Nothing should be written by default"
+    
+    monkeypatch.setenv("KEY_CACHE", "true")
+    assert private_key_from_mnemonic(test_mnemonic) == derived
+    assert cache_file.exists(), "KEY_CACHE=true should write the cache"
+    assert cache_file.stat().st_mode & 0o777 == 0o600, "Cache must only be readable by the owner"
+    
+    # Entrada truncada: se vuelve a derivar y se reescribe
+    cache_file.write_text(cache_file.read_text()[:-8])
+    assert private_key_from_mnemonic(test_mnemonic) == derived, "A corrupt cache should fall back to deriving"
+    from src.keys import load_cached_private_key
+    assert load_cached_private_key(test_mnemonic) == derived
+    
+    print(f"✅ Key cache opt-in test passed!")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,15 @@
+from pathlib import Path
+
+SRC = Path(__file__).resolve().parent.parent / "src"
+
+
+def test_single_config_module():
+    """Only one config.py may exist under src/ (a stale copy would shadow settings)."""
+    configs = sorted(SRC.rglob("config.py"))
+    print(f"   config.py encontrados: {[str(p.relative_to(SRC)) for p in configs]}")
+    assert len(configs) == 1, f"Expected a single config.py, found {configs}"
+
+
+if __name__ == "__main__":
+    test_single_config_module()
+    print("✅ Solo existe un config.py")
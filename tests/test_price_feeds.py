@@ -1,19 +1,29 @@
 import asyncio
 import pytest
+import pytest_asyncio
+from src.data.http import close_session, get_session
 from src.data.jupiter_quote import fetch_sol_price
 from src.data.pyth_feed import fetch_pyth_sol_price
 from src.data.aggregated_feed import AggregatedPriceFeed
 from src.data.mock_feed import MockPriceFeed  # Solo para testing
 
 
+@pytest_asyncio.fixture(scope="module", loop_scope="module")
+async def http_session():
+    """Keep-alive session shared by the real-feed tests (one TLS handshake per host)."""
+    yield await get_session()
+    await close_session()
+
+
 class TestPriceFeedsIntegration:
     """Integration tests for price feed functionality with real services."""
 
-    @pytest.mark.asyncio
-    async def test_jupiter_price_feed_real(self):
+    @pytest.mark.network
+    @pytest.mark.asyncio(loop_scope="module")
+    async def test_jupiter_price_feed_real(self, http_session):
         """Test Jupiter price feed with real API call."""
         print("\n=== Testing Jupiter Price Feed ===")
-        price = await fetch_sol_price()
+        price = await fetch_sol_price(http_session)
         print(f"Jupiter SOL price: ${price}")
         
         # Allow None if service is down, but validate structure if available
@@ -24,11 +34,12 @@ class TestPriceFeedsIntegration:
         else:
             print("Jupiter API not available - this may be due to network issues")
 
-    @pytest.mark.asyncio
-    async def test_pyth_price_feed_real(self):
+    @pytest.mark.network
+    @pytest.mark.asyncio(loop_scope="module")
+    async def test_pyth_price_feed_real(self, http_session):
         """Test Pyth price feed with real API call."""
         print("\n=== Testing Pyth Price Feed ===")
-        price = await fetch_pyth_sol_price()
+        price = await fetch_pyth_sol_price(http_session)
         print(f"Pyth SOL price: ${price}")
 
         # Allow None if service is down, but validate structure if available
@@ -39,12 +50,13 @@ class TestPriceFeedsIntegration:
         else:
             print("Pyth API not available - this may be due to network issues")
 
-    @pytest.mark.asyncio
-    async def test_aggregated_feed_real(self):
+    @pytest.mark.network
+    @pytest.mark.asyncio(loop_scope="module")
+    async def test_aggregated_feed_real(self, http_session):
         """Test aggregated feed with real API calls."""
         print("\n=== Testing Aggregated Price Feed ===")
         feed = AggregatedPriceFeed()
-        price = await feed.get_price()
+        price = await feed.get_price(http_session)
         print(f"Aggregated SOL price: ${price}")
         
         # Allow None if both services are down
@@ -71,14 +83,24 @@ class TestPriceFeedsIntegration:
         # Check that prices vary (not all the same)
         assert len(set(prices)) > 1, "Mock feed should generate varying prices"
 
-    @pytest.mark.asyncio
-    async def test_price_feed_comparison(self):
+    def test_mock_feed_batch(self):
+        """Batch generation is reproducible, bounded and continues the walk."""
+        feed = MockPriceFeed(seed=42, delay=0)
+        prices = feed.get_prices_batch(10_000)
+        assert prices.shape == (10_000,)
+        assert prices.min() >= 100.0 and prices.max() <= 400.0, "Prices should stay within 0.5x-2x"
+        assert feed.current_price == pytest.approx(prices[-1], abs=0.01)
+        assert (MockPriceFeed(seed=42).get_prices_batch(10_000) == prices).all(), "Same seed, same path"
+
+    @pytest.mark.network
+    @pytest.mark.asyncio(loop_scope="module")
+    async def test_price_feed_comparison(self, http_session):
         """Compare prices from different feeds."""
         print("\n=== Comparing Price Feeds ===")
         
         # Get prices from all sources
-        jupiter_task = asyncio.create_task(fetch_sol_price())
-        pyth_task = asyncio.create_task(fetch_pyth_sol_price())
+        jupiter_task = asyncio.create_task(fetch_sol_price(http_session))
+        pyth_task = asyncio.create_task(fetch_pyth_sol_price(http_session))
         mock_feed = MockPriceFeed()
         mock_task = asyncio.create_task(mock_feed.get_price())
         
@@ -102,6 +124,130 @@ class TestPriceFeedsIntegration:
         else:
             print("One or both real feeds unavailable - comparison skipped")
 
+    @pytest.mark.asyncio
+    async def test_aggregated_feed_does_not_wait_for_slow_source(self, monkeypatch):
+        """A late source must not delay the tick; its request is reused next call."""
+        from src.data import aggregated_feed as agg
+        calls = {"jupiter": 0}
+        # Jupiter no responde hasta que el test lo libera: sin depender del reloj
+        release = asyncio.Event()
+
+        async def fast_pyth(session=None):
+            return 100.0
+
+        async def slow_jupiter(session=None):
+            calls["jupiter"] += 1
+            await release.wait()
+            return 102.0
+
+        monkeypatch.setattr(agg, "fetch_pyth_sol_price", fast_pyth)
+        monkeypatch.setattr(agg, "fetch_sol_price", slow_jupiter)
+        feed = AggregatedPriceFeed(grace_window=0.01)
+
+        assert await feed.get_price() == 100.0, "Should not wait for the slow feed"
+        inflight = feed._inflight["jupiter"]
+        assert not inflight.done(), "The late request should keep running"
+        assert await feed.get_price() == 100.0
+        assert feed._inflight["jupiter"] is inflight
+        assert calls["jupiter"] == 1, "In-flight Jupiter request should be reused"
+
+        release.set()
+        assert await inflight == 102.0
+        # La petición anterior ya terminó: se lanza otra, que ahora responde a tiempo
+        assert await feed.get_price() == 101.0, "Both feeds in time should be averaged"
+        assert calls["jupiter"] == 2
+
+    @pytest.mark.asyncio
+    async def test_ttl_cache_coalesces_fetches(self):
+        """Concurrent calls share one request and results are reused within the TTL."""
+        from src.data.ttl_cache import ttl_cached
+        calls = {"n": 0}
+
+        @ttl_cached(ttl=0.2)
+        async def fetch():
+            calls["n"] += 1
+            await asyncio.sleep(0.01)
+            return 150.0 + calls["n"]
+
+        assert await asyncio.gather(fetch(), fetch(), fetch()) == [151.0, 151.0, 151.0]
+        assert await fetch() == 151.0
+        assert calls["n"] == 1, "Calls within the TTL should not hit the source"
+
+        await asyncio.sleep(0.25)
+        assert await fetch() == 152.0, "Expired entry should be refreshed"
+        fetch.cache_clear()
+        assert await fetch() == 153.0
+
+    @pytest.mark.asyncio
+    async def test_quote_requester(self):
+        """Quote URLs carry the fixed pair/slippage plus the amount; failures return None."""
+        from urllib.parse import parse_qs
+        from src.execution.jupiter_client import QuoteRequester, quote_requester
+
+        class FakeResponse:
+            status = 200
+
+            async def __aenter__(self):
+                return self
+
+            async def __aexit__(self, *exc):
+                return False
+
+            async def read(self):
+                return b'{"outAmount": "123"}'
+
+        class FakeSession:
+            def __init__(self):
+                self.urls = []
+
+            def get(self, url, headers=None):
+                self.urls.append(url)
+                return FakeResponse()
+
+        requester = QuoteRequester("MINT_IN", "MINT_OUT", slippage_bps=30)
+        session = FakeSession()
+        assert await requester.quote(1_000, session) == {"outAmount": "123"}
+        assert parse_qs(session.urls[0].query_string) == {
+            "inputMint": ["MINT_IN"], "outputMint": ["MINT_OUT"], "slippageBps": ["30"], "amount": ["1000"],
+        }
+        assert quote_requester("A", "B", 50) is quote_requester("A", "B", 50), "Requesters are shared per pair"
+
+        class BrokenSession:
+            def get(self, url, headers=None):
+                raise OSError("network down")
+
+        assert await requester.quote(1_000, BrokenSession()) is None
+
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize("body", [b'[1, 2]', b'null', b'{"data": [], "parsed": {}}',
+                                      b'{"parsed": ["x", {"id": 1}]}'])
+    async def test_malformed_bodies_return_none(self, body):
+        """A JSON body with an unexpected shape counts as a failed fetch, not an exception."""
+        class FakeResponse:
+            status = 200
+
+            async def __aenter__(self):
+                return self
+
+            async def __aexit__(self, *exc):
+                return False
+
+            async def read(self):
+                return body
+
+        class FakeSession:
+            def get(self, url, params=None):
+                return FakeResponse()
+
+        fetch_sol_price.cache_clear()
+        fetch_pyth_sol_price.cache_clear()
+        try:
+            assert await fetch_sol_price(FakeSession()) is None
+            assert await fetch_pyth_sol_price(FakeSession()) is None
+        finally:
+            fetch_sol_price.cache_clear()
+            fetch_pyth_sol_price.cache_clear()
+
     def test_price_feed_import_structure(self):
         """Test that all price feed modules can be imported correctly."""
         from src.data import jupiter_quote, pyth_feed, aggregated_feed, mock_feed
@@ -124,12 +270,16 @@ async def run_tests():
     test_class.test_price_feed_import_structure()
     print("✅ All imports successful\n")
     
-    # Test each feed
-    await test_class.test_jupiter_price_feed_real()
-    await test_class.test_pyth_price_feed_real()
-    await test_class.test_aggregated_feed_real()
-    await test_class.test_mock_feed_works()
-    await test_class.test_price_feed_comparison()
+    # Test each feed (same keep-alive session for every real request)
+    session = await get_session()
+    try:
+        await test_class.test_jupiter_price_feed_real(session)
+        await test_class.test_pyth_price_feed_real(session)
+        await test_class.test_aggregated_feed_real(session)
+        await test_class.test_mock_feed_works()
+        await test_class.test_price_feed_comparison(session)
+    finally:
+        await close_session()
     
     print("\n🎉 All tests completed!")
 
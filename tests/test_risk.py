@@ -1,6 +1,6 @@
 import pytest
 from src.execution.portfolio import Portfolio
-from src.strategy.risk import exceed_max_drawdown
+from src.strategy.risk import exceed_max_drawdown, exceed_max_drawdown_batch, first_drawdown_breach
 
 
 @pytest.mark.asyncio
@@ -21,8 +21,72 @@ async def test_exceed_max_drawdown_updates_peak():
 
     # price rises -> new peak
     assert not exceed_max_drawdown(portfolio, 120.0)
-    assert portfolio.peak_value == pytest.approx(1200.0)
+    assert abs(portfolio.peak_value - 1200.0) < 1e-9
 
     # small drop from new peak (5%) should not trigger
     assert not exceed_max_drawdown(portfolio, 114.0)
 
+
+def test_exceed_max_drawdown_batch_matches_scalar():
+    import numpy as np
+
+    prices = 100 * np.cumprod(1 + np.random.default_rng(7).normal(0, 0.03, 500))
+    portfolio = Portfolio(quote_balance=1000.0)
+    portfolio.base_balance = 10
+    portfolio.quote_balance = 0.0
+    peak = portfolio.peak_value
+
+    expected = [exceed_max_drawdown(portfolio, float(p)) for p in prices]
+    result = exceed_max_drawdown_batch(prices, 10, 0.0, peak_value=peak)
+    assert any(expected), "Series should breach the limit at some point"
+    assert result.tolist() == expected
+    assert first_drawdown_breach(prices, 10, 0.0, peak_value=peak) == expected.index(True)
+    assert first_drawdown_breach(prices, 10, 0.0, max_drawdown_pct=100.0, peak_value=peak) == -1
+
+    # El kernel (JIT/AOT, o Python puro sin numba) aplica la misma regla
+    from src.strategy import _kernels
+    assert _kernels.scan_drawdown(10 * prices, float(peak), 20.0) == first_drawdown_breach(prices, 10, 0.0, 20.0, peak)
+    # Equity a 0 sin pico previo: ni breach ni división por cero
+    flat = np.zeros(3)
+    assert _kernels.scan_drawdown(flat, 0.0, 20.0) == -1
+    assert first_drawdown_breach(flat, 0, 0.0, 20.0, 0.0) == -1
+
+
+def test_vectorized_portfolio_value():
+    import numpy as np
+    from src.utils.backtest import equity_curve
+
+    prices = np.array([100.0, 110.0, 120.0, 90.0])
+    portfolio = Portfolio(quote_balance=1000.0)
+    portfolio.base_balance = 2
+    expected = [portfolio.total_value(p) for p in prices]
+    assert portfolio.total_value_series(prices).tolist() == pytest.approx(expected)
+
+    # BUY 2 @ 110, SELL 1 @ 90
+    fills = np.array([0.0, 2.0, 0.0, -1.0])
+    assert equity_curve(prices, fills, starting_cash=1000.0).tolist() == pytest.approx([1000.0, 1000.0, 1020.0, 960.0])
+
+
+def test_backtest_state_machine_matches_portfolio(monkeypatch):
+    import numpy as np
+    from src.config import settings
+    from src.strategy.simple_strategy import generate_signals
+    from src.utils.backtest import run_backtest
+
+    monkeypatch.setattr(settings, "simulation_mode", False)
+    prices = 100 * np.cumprod(1 + np.random.default_rng(1).normal(0, 0.02, 1000))
+    result = run_backtest(prices)
+
+    # Reference: the scalar portfolio loop without simulator
+    portfolio = Portfolio(quote_balance=1000.0)
+    trades = 0
+    for signal, price in zip(generate_signals(prices)[50:], prices[50:]):
+        if signal == "BUY" and portfolio.quote_balance >= price:
+            portfolio.update_from_trade("BUY", 1, float(price))
+            trades += 1
+        elif signal == "SELL" and portfolio.base_balance >= 1:
+            portfolio.update_from_trade("SELL", 1, float(price))
+            trades += 1
+    assert trades > 0
+    assert result.trades == trades
+    assert result.returns == pytest.approx(portfolio.quote_balance - 1000.0)
@@ -1,41 +1,48 @@
 import pytest
 import os
+import tempfile
+from pathlib import Path
 from src.execution.simulation_client import TradingSimulator, SimulatedTrade, SimulatedPosition
 from src.execution.portfolio import Portfolio
 from src.config import settings
 
+# Salida de diagnóstico solo con VERBOSE_TESTS=1: por defecto no se escribe nada
+# (los argumentos de p(), f-strings incluidas, se siguen evaluando)
+VERBOSE = os.getenv("VERBOSE_TESTS") == "1"
+p = print if VERBOSE else (lambda *args, **kwargs: None)
+
 
 def test_simulation_mode_configuration():
     """Test simulation mode configuration from environment."""
     
-    print(f"\n🔧 TESTING SIMULATION CONFIGURATION")
-    print("=" * 50)
+    p(f"\n🔧 TESTING SIMULATION CONFIGURATION")
+    p("=" * 50)
     
-    print(f"Configuration from settings:")
-    print(f"  SIMULATION_MODE: {settings.simulation_mode}")
-    print(f"  SIMULATION_INITIAL_BALANCE: {settings.simulation_initial_balance}")
+    p(f"Configuration from settings:")
+    p(f"  SIMULATION_MODE: {settings.simulation_mode}")
+    p(f"  SIMULATION_INITIAL_BALANCE: {settings.simulation_initial_balance}")
     
     # Verify simulation is enabled by default
     assert settings.simulation_mode == True, "Simulation mode should be enabled by default"
     assert settings.simulation_initial_balance > 0, "Initial balance should be positive"
     
-    print(f"✅ Simulation configuration is valid!")
+    p(f"✅ Simulation configuration is valid!")
 
 
 def test_trading_simulator_initialization():
     """Test trading simulator initialization."""
     
-    print(f"\n🎮 TESTING SIMULATOR INITIALIZATION")
-    print("=" * 50)
+    p(f"\n🎮 TESTING SIMULATOR INITIALIZATION")
+    p("=" * 50)
     
     # Create simulator with custom balance
     simulator = TradingSimulator(initial_balance=2.0)
     
-    print(f"Simulator Configuration:")
-    print(f"  Initial Balance: {simulator.initial_balance} SOL")
-    print(f"  SOL Balance: {simulator.sol_balance} SOL")
-    print(f"  USD Balance: {simulator.usd_balance} USD")
-    print(f"  Total Trades: {len(simulator.trades)}")
+    p(f"Simulator Configuration:")
+    p(f"  Initial Balance: {simulator.initial_balance} SOL")
+    p(f"  SOL Balance: {simulator.sol_balance} SOL")
+    p(f"  USD Balance: {simulator.usd_balance} USD")
+    p(f"  Total Trades: {len(simulator.trades)}")
     
     assert simulator.initial_balance == 2.0, "Initial balance should match"
     assert simulator.sol_balance == 2.0, "SOL balance should equal initial balance"
@@ -43,14 +50,14 @@ def test_trading_simulator_initialization():
     assert len(simulator.trades) == 0, "Should start with no trades"
     assert simulator.position is None, "Should start with no position"
     
-    print(f"✅ Simulator initialization test passed!")
+    p(f"✅ Simulator initialization test passed!")
 
 
 def test_simulated_buy_operation():
     """Test simulated buy operation."""
     
-    print(f"\n💸 TESTING SIMULATED BUY")
-    print("=" * 50)
+    p(f"\n💸 TESTING SIMULATED BUY")
+    p("=" * 50)
     
     simulator = TradingSimulator(initial_balance=1.0)
     
@@ -58,16 +65,16 @@ def test_simulated_buy_operation():
     amount_sol = 0.5
     price = 200.0
     
-    print(f"Before buy:")
-    print(f"  SOL Balance: {simulator.sol_balance:.4f}")
-    print(f"  USD Balance: {simulator.usd_balance:.4f}")
+    p(f"Before buy:")
+    p(f"  SOL Balance: {simulator.sol_balance:.4f}")
+    p(f"  USD Balance: {simulator.usd_balance:.4f}")
     
     result = simulator.simulate_trade("BUY", amount_sol, price)
     
-    print(f"Buy result: {result['success']}")
-    print(f"After buy:")
-    print(f"  SOL Balance: {result['new_balance_sol']:.4f}")
-    print(f"  USD Balance: {result['new_balance_usd']:.4f}")
+    p(f"Buy result: {result['success']}")
+    p(f"After buy:")
+    p(f"  SOL Balance: {result['new_balance_sol']:.4f}")
+    p(f"  USD Balance: {result['new_balance_usd']:.4f}")
     
     assert result["success"] == True, "Buy should succeed"
     assert result["simulation"] == True, "Should be marked as simulation"
@@ -81,14 +88,14 @@ def test_simulated_buy_operation():
     assert trade.side == "BUY", "Trade should be BUY"
     assert trade.amount_sol == amount_sol, "Trade amount should match"
     
-    print(f"✅ Simulated buy test passed!")
+    p(f"✅ Simulated buy test passed!")
 
 
 def test_simulated_sell_operation():
     """Test simulated sell operation."""
     
-    print(f"\n💰 TESTING SIMULATED SELL")
-    print("=" * 50)
+    p(f"\n💰 TESTING SIMULATED SELL")
+    p("=" * 50)
     
     simulator = TradingSimulator(initial_balance=1.0)
     
@@ -96,7 +103,7 @@ def test_simulated_sell_operation():
     buy_result = simulator.simulate_trade("BUY", 0.5, 200.0)
     assert buy_result["success"], "Buy should succeed"
     
-    print(f"After buy - Position: {buy_result['position']['amount_sol']:.4f} SOL")
+    p(f"After buy - Position: {buy_result['position']['amount_sol']:.4f} SOL")
     
     # Now sell
     sell_amount = 0.3
@@ -104,8 +111,8 @@ def test_simulated_sell_operation():
     
     sell_result = simulator.simulate_trade("SELL", sell_amount, sell_price)
     
-    print(f"Sell result: {sell_result['success']}")
-    print(f"Realized P&L: {sell_result.get('realized_pnl', 0):.4f} USD")
+    p(f"Sell result: {sell_result['success']}")
+    p(f"Realized P&L: {sell_result.get('realized_pnl', 0):.4f} USD")
     
     assert sell_result["success"] == True, "Sell should succeed"
     assert sell_result["simulation"] == True, "Should be marked as simulation"
@@ -119,14 +126,14 @@ def test_simulated_sell_operation():
     # Verify we have 2 trades now
     assert len(simulator.trades) == 2, "Should have two trades"
     
-    print(f"✅ Simulated sell test passed!")
+    p(f"✅ Simulated sell test passed!")
 
 
 def test_insufficient_balance_handling():
     """Test handling of insufficient balance scenarios."""
     
-    print(f"\n⚠️  TESTING INSUFFICIENT BALANCE")
-    print("=" * 50)
+    p(f"\n⚠️  TESTING INSUFFICIENT BALANCE")
+    p("=" * 50)
     
     simulator = TradingSimulator(initial_balance=0.1)  # Small balance
     
@@ -136,8 +143,8 @@ def test_insufficient_balance_handling():
     
     result = simulator.simulate_trade("BUY", oversized_amount, price)
     
-    print(f"Oversized buy result: {result['success']}")
-    print(f"Error message: {result.get('error', 'N/A')}")
+    p(f"Oversized buy result: {result['success']}")
+    p(f"Error message: {result.get('error', 'N/A')}")
     
     assert result["success"] == False, "Oversized buy should fail"
     assert "Balance insuficiente" in result.get("error", ""), "Should have insufficient balance error"
@@ -146,26 +153,25 @@ def test_insufficient_balance_handling():
     # Try to sell without position
     sell_result = simulator.simulate_trade("SELL", 0.1, price)
     
-    print(f"Sell without position result: {sell_result['success']}")
-    print(f"Error message: {sell_result.get('error', 'N/A')}")
+    p(f"Sell without position result: {sell_result['success']}")
+    p(f"Error message: {sell_result.get('error', 'N/A')}")
     
     assert sell_result["success"] == False, "Sell without position should fail"
     assert "Posición insuficiente" in sell_result.get("error", ""), "Should have insufficient position error"
     
-    print(f"✅ Insufficient balance handling test passed!")
+    p(f"✅ Insufficient balance handling test passed!")
 
 
 def test_portfolio_simulation_integration():
     """Test portfolio integration with simulation mode."""
     
-    print(f"\n🔗 TESTING PORTFOLIO SIMULATION INTEGRATION")
-    print("=" * 50)
-    
-    # Ensure simulation mode is enabled
-    original_sim_mode = settings.simulation_mode
-    settings.simulation_mode = True
+    p(f"\n🔗 TESTING PORTFOLIO SIMULATION INTEGRATION")
+    p("=" * 50)
     
-    try:
+    # Ensure simulation mode is enabled (restored when the context exits)
+    with pytest.MonkeyPatch.context() as mp:
+        mp.setattr(settings, "simulation_mode", True)
+        
         portfolio = Portfolio()
         
         # Execute simulated trade through portfolio
@@ -173,32 +179,28 @@ def test_portfolio_simulation_integration():
         trade_amount = 0.05
         price = 200.0
         
-        print(f"Before trade:")
-        print(f"  Portfolio data: {portfolio.as_dict()}")
+        p(f"Before trade:")
+        p(f"  Portfolio data: {portfolio.as_dict()}")
         
         portfolio.update_from_trade("BUY", trade_amount, price)
         
-        print(f"After trade:")
+        p(f"After trade:")
         final_data = portfolio.as_dict()
-        print(f"  Portfolio data: {final_data}")
+        p(f"  Portfolio data: {final_data}")
         
         # Verify simulation mode is reflected
         assert final_data.get("simulation_mode") == True, "Portfolio should show simulation mode"
         assert "realized_pnl" in final_data, "Should have P&L tracking"
         assert "total_trades" in final_data, "Should have trade counting"
         
-        print(f"✅ Portfolio simulation integration test passed!")
-        
-    finally:
-        # Restore original setting
-        settings.simulation_mode = original_sim_mode
+        p(f"✅ Portfolio simulation integration test passed!")
 
 
 def test_portfolio_status_and_export():
     """Test portfolio status reporting and export functionality."""
     
-    print(f"\n📊 TESTING PORTFOLIO STATUS & EXPORT")
-    print("=" * 50)
+    p(f"\n📊 TESTING PORTFOLIO STATUS & EXPORT")
+    p("=" * 50)
     
     simulator = TradingSimulator(initial_balance=1.0)
     
@@ -210,12 +212,12 @@ def test_portfolio_status_and_export():
     # Get portfolio status
     status = simulator.get_portfolio_status()
     
-    print(f"Portfolio Status:")
+    p(f"Portfolio Status:")
     for key, value in status.items():
         if isinstance(value, float):
-            print(f"  {key}: {value:.4f}")
+            p(f"  {key}: {value:.4f}")
         else:
-            print(f"  {key}: {value}")
+            p(f"  {key}: {value}")
     
     assert status["simulation_mode"] == True, "Should be in simulation mode"
     assert status["total_trades"] == 2, "Should have 2 trades"
@@ -226,32 +228,155 @@ def test_portfolio_status_and_export():
     trade_history = simulator.get_trade_history()
     assert len(trade_history) == 2, "Should export 2 trades"
     
-    # Test log export (without actually writing file)
-    import tempfile
-    import os
+    # Test log export (in memory, no file on disk)
+    import io
+    import json
     
-    with tempfile.NamedTemporaryFile(mode='w', suffix='.json', delete=False) as f:
-        filename = f.name
+    buf = io.BytesIO()
+    assert simulator.export_simulation_log(buf) is buf, "File-like targets should be returned as-is"
+    log_data = json.loads(buf.getvalue())
     
-    try:
-        exported_file = simulator.export_simulation_log(filename)
-        assert os.path.exists(exported_file), "Log file should be created"
-        
-        # Verify file contains expected data
-        import json
-        with open(exported_file, 'r') as f:
-            log_data = json.load(f)
-        
-        assert "simulation_summary" in log_data, "Should have simulation summary"
-        assert "trade_history" in log_data, "Should have trade history"
-        assert len(log_data["trade_history"]) == 2, "Should have 2 trades in export"
-        
-        print(f"✅ Portfolio status and export test passed!")
-        
-    finally:
-        # Clean up
-        if os.path.exists(filename):
-            os.unlink(filename)
+    assert "simulation_summary" in log_data, "Should have simulation summary"
+    assert "trade_history" in log_data, "Should have trade history"
+    assert len(log_data["trade_history"]) == 2, "Should have 2 trades in export"
+    
+    p(f"✅ Portfolio status and export test passed!")
+
+
+def test_export_simulation_log_to_file(tmp_path):
+    """Test that exporting to a path writes the same JSON log to disk."""
+    import json
+    
+    p(f"\n📁 TESTING SIMULATION LOG FILE EXPORT")
+    p("=" * 50)
+    
+    simulator = TradingSimulator(initial_balance=1.0, seed=5)
+    simulator.simulate_trade("BUY", 0.5, 200.0)
+    
+    filename = str(tmp_path / "simulation_log.json")
+    assert simulator.export_simulation_log(filename) == filename
+    with open(filename) as f:
+        log_data = json.load(f)
+    
+    assert log_data["settings"]["initial_balance"] == 1.0
+    assert len(log_data["trade_history"]) == 1, "Should have 1 trade in export"
+    
+    p(f"✅ Simulation log file export test passed!")
+
+
+def test_batched_slippage_draws():
+    """Test that slippage comes from a seeded, refilled batch within range."""
+    from src.execution.simulation_client import SLIPPAGE_BATCH, SLIPPAGE_RANGE_PCT
+    
+    p(f"\n🎲 TESTING BATCHED SLIPPAGE")
+    p("=" * 50)
+    
+    first = TradingSimulator(initial_balance=1.0, seed=123)
+    second = TradingSimulator(initial_balance=1.0, seed=123)
+    draws = [first._next_slippage() for _ in range(SLIPPAGE_BATCH + 10)]
+    
+    p(f"  Draws: {len(draws)} (batch {SLIPPAGE_BATCH})")
+    p(f"  Range: {min(draws):.4f}% - {max(draws):.4f}%")
+    
+    low, high = SLIPPAGE_RANGE_PCT
+    assert all(low <= d <= high for d in draws), "Slippage should stay within the configured range"
+    assert draws[:10] == [second._next_slippage() for _ in range(10)], "Same seed should give same draws"
+    
+    result = first.simulate_trade("BUY", 0.1, 200.0)
+    assert low <= result["trade"]["slippage_pct"] <= high
+    
+    p(f"✅ Batched slippage test passed!")
+
+
+def test_trade_log_columns():
+    """Test that the column-wise trade log grows and matches the trade history."""
+    from src.execution.simulation_client import TradeLog
+    
+    p(f"\n📚 TESTING COLUMNAR TRADE LOG")
+    p("=" * 50)
+    
+    simulator = TradingSimulator(initial_balance=100.0, seed=1)
+    simulator.trades = TradeLog(capacity=2)
+    for i in range(5):
+        side = "BUY" if i % 2 == 0 else "SELL"
+        assert simulator.simulate_trade(side, 0.1, 200.0)["success"], f"{side} should succeed"
+    
+    history = simulator.get_trade_history()
+    p(f"  Trades: {len(simulator.trades)}")
+    p(f"  Fees (column sum): {simulator.trades.column('fees_sol').sum():.6f} SOL")
+    
+    assert len(simulator.trades) == len(history) == 5, "Log should grow past its initial capacity"
+    assert [t["side"] for t in history] == ["BUY", "SELL", "BUY", "SELL", "BUY"]
+    assert simulator.trades[-1].price == history[-1]["price"], "Indexing should match the history"
+    assert simulator.trades.column("fees_sol").sum() == pytest.approx(simulator.total_fees_paid)
+    
+    p(f"✅ Columnar trade log test passed!")
+
+
+def test_running_cost_basis():
+    """Test that averaging into a position keeps entry price and cost basis consistent."""
+    
+    p(f"\n🧮 TESTING RUNNING COST BASIS")
+    p("=" * 50)
+    
+    simulator = TradingSimulator(initial_balance=1.0, seed=2)
+    first = simulator.simulate_trade("BUY", 0.2, 100.0)["trade"]
+    second = simulator.simulate_trade("BUY", 0.2, 200.0)["trade"]
+    position = simulator.position
+    
+    expected_entry = (first["price"] * 0.2 + second["price"] * 0.2) / 0.4
+    p(f"  Entry price: {position.entry_price:.4f} (expected {expected_entry:.4f})")
+    assert position.entry_price == pytest.approx(expected_entry), "Entry should be the weighted average"
+    
+    simulator.simulate_trade("SELL", 0.1, 150.0)
+    assert position.entry_price == pytest.approx(expected_entry), "Selling should not move the entry price"
+    assert position.cost_usd == pytest.approx(expected_entry * position.amount_sol)
+    
+    p(f"✅ Running cost basis test passed!")
+
+
+def test_total_return_uses_usd_reference():
+    """Test that total return is P&L over the initial balance valued at the first fill."""
+    
+    p(f"\n📈 TESTING TOTAL RETURN")
+    p("=" * 50)
+    
+    simulator = TradingSimulator(initial_balance=1.0, seed=3)
+    assert simulator.get_portfolio_status()["total_return_pct"] == 0.0, "No trades means no return"
+    
+    buy = simulator.simulate_trade("BUY", 0.5, 200.0)["trade"]
+    simulator.update_current_price(220.0)
+    status = simulator.get_portfolio_status()
+    expected = 100.0 * status["total_pnl"] / (1.0 * buy["price"])
+    p(f"  Total return: {status['total_return_pct']:.4f}% (expected {expected:.4f}%)")
+    assert status["total_return_pct"] == pytest.approx(expected)
+    
+    simulator.update_current_price(180.0)
+    assert simulator.get_portfolio_status()["unrealized_pnl"] < 0, "Price updates should refresh the status"
+    
+    p(f"✅ Total return test passed!")
+
+
+def test_unchanged_price_skips_update():
+    """Test that repeating the last price leaves the position and status untouched."""
+    
+    p(f"\n⏸️ TESTING UNCHANGED PRICE UPDATES")
+    p("=" * 50)
+    
+    simulator = TradingSimulator(initial_balance=1.0, seed=4)
+    assert not simulator.update_current_price(200.0), "No position means nothing to update"
+    
+    simulator.simulate_trade("BUY", 0.2, 200.0)
+    simulator.simulate_trade("BUY", 0.2, 220.0)
+    position = simulator.position
+    fill = position.current_price
+    assert position.unrealized_pnl == pytest.approx((fill - position.entry_price) * 0.4)
+    
+    assert not simulator.update_current_price(fill), "Same price should short-circuit"
+    assert simulator.update_current_price(fill + 1.0), "A new price should be applied"
+    assert position.unrealized_pnl == pytest.approx((fill + 1.0 - position.entry_price) * 0.4)
+    
+    p(f"✅ Unchanged price test passed!")
 
 
 if __name__ == "__main__":
@@ -262,5 +387,11 @@ if __name__ == "__main__":
     test_insufficient_balance_handling()
     test_portfolio_simulation_integration()
     test_portfolio_status_and_export()
+    test_export_simulation_log_to_file(Path(tempfile.mkdtemp()))
+    test_batched_slippage_draws()
+    test_trade_log_columns()
+    test_running_cost_basis()
+    test_total_return_uses_usd_reference()
+    test_unchanged_price_skips_update()
     
     print(f"\n🎉 ALL SIMULATION TESTS PASSED!")
\ No newline at end of file
@@ -1,62 +1,72 @@
 import pytest
+import pytest_asyncio
 import asyncio
 import os
 from src.wallet import MultiWallet
 from src.config import settings
 
+# Salida de diagnóstico solo con VERBOSE_TESTS=1: por defecto no se escribe nada
+# (los argumentos de p(), f-strings incluidas, se siguen evaluando)
+VERBOSE = os.getenv("VERBOSE_TESTS") == "1"
+p = print if VERBOSE else (lambda *args, **kwargs: None)
 
-@pytest.mark.asyncio
-async def test_wallet_discovery():
-    """Test wallet discovery to find the correct account with funds."""
-    
+
+@pytest_asyncio.fixture(scope="module", loop_scope="module")
+async def multi_wallet():
+    """One MultiWallet (seed, derivations and RPC client) for every test in the module."""
     mnemonic = os.getenv('MNEMONIC', '')
     if not mnemonic:
         pytest.skip("MNEMONIC not configured in .env")
+    wallet = MultiWallet(mnemonic, settings.rpc_endpoint)
+    yield wallet
+    await wallet.close()
+
+
+@pytest.mark.asyncio(loop_scope="module")
+async def test_wallet_discovery(multi_wallet):
+    """Test wallet discovery to find the correct account with funds."""
     
     target_address = "6mEuN9tSB81o5XAnXzztG2Q9cWvMMeY51mSj4eKE5H8e"
+    wallet = multi_wallet
     
-    wallet = None
     try:
-        print(f"\n🔍 WALLET DISCOVERY TEST")
-        print(f"Target address: {target_address}")
-        print(f"Expected balance: ~1.48079 SOL")
-        print("=" * 60)
-        
-        # Create multi-wallet instance
-        wallet = MultiWallet(mnemonic, settings.rpc_endpoint)
+        p(f"\n🔍 WALLET DISCOVERY TEST")
+        p(f"Target address: {target_address}")
+        p(f"Expected balance: ~1.48079 SOL")
+        p("=" * 60)
         
         # Try to find account that matches target address
-        print("Searching for target address...")
+        p("Searching for target address...")
         target_account = await wallet.find_account_with_funds(target_address)
         
         if target_account:
-            print(f"\n🎉 FOUND TARGET ACCOUNT!")
+            p(f"\n🎉 FOUND TARGET ACCOUNT!")
             account_info = await wallet.get_account_info(target_account)
             
-            print(f"✅ Address: {account_info['address']}")
-            print(f"✅ Balance: {account_info['balance_sol']:.9f} SOL")
-            print(f"✅ Derivation: {account_info['derivation_method']}")
-            print(f"✅ Private key (first 5 bytes): {account_info['private_key_array']}")
+            p(f"✅ Address: {account_info['address']}")
+            p(f"✅ Balance: {account_info['balance_sol']:.9f} SOL")
+            p(f"✅ Derivation: {account_info['derivation_method']}")
+            p(f"✅ Private key (first 5 bytes): {account_info['private_key_array']}")
             
             # Verify it's the correct address
             assert account_info['address'] == target_address, f"Found address doesn't match target"
             assert account_info['balance_sol'] > 1.0, f"Expected ~1.48 SOL, got {account_info['balance_sol']}"
             
-            print(f"\n✅ SUCCESS: Found correct wallet derivation!")
+            p(f"\n✅ SUCCESS: Found correct wallet derivation!")
             return target_account
         else:
-            print(f"\n❌ Target address not found in any derivation")
+            p(f"\n❌ Target address not found in any derivation")
             
             # Let's find any accounts with funds as fallback
-            print("Searching for any accounts with funds...")
+            p("Searching for any accounts with funds...")
             funded_account = await wallet.find_account_with_funds()
             
             if funded_account:
                 account_info = await wallet.get_account_info(funded_account)
-                print(f"\n💰 FOUND FUNDED ACCOUNT (not target):")
-                print(f"   Address: {account_info['address']}")
-                print(f"   Balance: {account_info['balance_sol']:.9f} SOL")
-                print(f"   Derivation: {account_info['derivation_method']}")
+                p(f"\n💰 FOUND FUNDED ACCOUNT (not target):")
+                p(f"   Address: {account_info['address']}")
+                p(f"   Balance: {account_info['balance_sol']:.9f} SOL")
+                p(f"   Derivation: {account_info['derivation_method']}")
                 
                 pytest.fail(f"Target address {target_address} not found. Found funded account: {account_info['address']}")
             else:
@@ -64,61 +74,58 @@ async def test_wallet_discovery():
                 
     except Exception as e:
         pytest.fail(f"Wallet discovery failed: {e}")
-    finally:
-        if wallet:
-            await wallet.close()
 
 
-@pytest.mark.asyncio
-async def test_derivation_methods():
+@pytest.mark.asyncio(loop_scope="module")
+async def test_derivation_methods(multi_wallet):
     """Test different derivation methods independently."""
     
-    mnemonic = os.getenv('MNEMONIC', '')
-    if not mnemonic:
-        pytest.skip("MNEMONIC not configured in .env")
-    
-    wallet = None
+    wallet = multi_wallet
     try:
-        print(f"\n🧪 DERIVATION METHODS TEST")
-        print("=" * 50)
-        
-        wallet = MultiWallet(mnemonic, settings.rpc_endpoint)
+        p(f"\n🧪 DERIVATION METHODS TEST")
+        p("=" * 50)
         
         # Test standard derivation
-        print("1. Standard derivation:")
+        p("1. Standard derivation:")
         standard_account = wallet.derive_standard_account()
         info = await wallet.get_account_info(standard_account)
-        print(f"   Address: {info['address']}")
-        print(f"   Balance: {info.get('balance_sol', 0):.9f} SOL")
+        p(f"   Address: {info['address']}")
+        p(f"   Balance: {info.get('balance_sol', 0):.9f} SOL")
         
         # Test Phantom-style derivations (first 3 accounts)
-        print("\n2. Phantom-style derivations:")
+        p("\n2. Phantom-style derivations:")
         phantom_accounts = wallet.derive_phantom_style_accounts(max_accounts=3)
-        for account in phantom_accounts[:6]:  # Show first 6 variations
-            info = await wallet.get_account_info(account)
-            print(f"   {info['derivation_method']}: {info['address']}")
+        # Consultas RPC en paralelo: una ida y vuelta en vez de una por cuenta
+        infos = await asyncio.gather(*(wallet.get_account_info(a) for a in phantom_accounts[:6]))  # Show first 6 variations
+        for info in infos:
+            p(f"   {info['derivation_method']}: {info['address']}")
             if info.get('balance_sol', 0) > 0:
-                print(f"   💰 Balance: {info['balance_sol']:.9f} SOL")
+                p(f"   💰 Balance: {info['balance_sol']:.9f} SOL")
         
         # Test passphrase derivations
-        print("\n3. Passphrase derivations:")
+        p("\n3. Passphrase derivations:")
         passphrase_accounts = wallet.derive_with_passphrases(["", "phantom", "solana"])
-        for account in passphrase_accounts:
-            info = await wallet.get_account_info(account)
-            print(f"   {info['derivation_method']}: {info['address']}")
+        infos = await asyncio.gather(*(wallet.get_account_info(a) for a in passphrase_accounts))
+        for info in infos:
+            p(f"   {info['derivation_method']}: {info['address']}")
             if info.get('balance_sol', 0) > 0:
-                print(f"   💰 Balance: {info['balance_sol']:.9f} SOL")
+                p(f"   💰 Balance: {info['balance_sol']:.9f} SOL")
         
-        print(f"\n✅ Derivation methods test completed")
+        p(f"\n✅ Derivation methods test completed")
         
     except Exception as e:
         pytest.fail(f"Derivation methods test failed: {e}")
+
+
+async def _run_all():
+    wallet = MultiWallet(os.environ['MNEMONIC'], settings.rpc_endpoint)
+    try:
+        await test_derivation_methods(wallet)
+        await test_wallet_discovery(wallet)
     finally:
-        if wallet:
-            await wallet.close()
+        await wallet.close()
 
 
 if __name__ == "__main__":
-    # Run tests directly
-    asyncio.run(test_derivation_methods())
-    asyncio.run(test_wallet_discovery())
\ No newline at end of file
+    # Run tests directly (same wallet for both, like the fixture)
+    asyncio.run(_run_all())
\ No newline at end of file